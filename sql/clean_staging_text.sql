@@ -0,0 +1,28 @@
+-- Chuẩn hoá 1 lần text của staging_books đã nạp trước khi mọi đường nạp gộp khoảng trắng
+-- (dữ liệu cũ, file nạp bằng \copy): bỏ khoảng trắng đầu/cuối, gộp khoảng trắng liên tiếp.
+-- Cùng quy tắc với book_to_row / normalize.clean_text / clean_text_sql -> run_etl.py join không cần TRIM()
+UPDATE staging_books SET
+    title = btrim(regexp_replace(title, '\s+', ' ', 'g')),
+    author = btrim(regexp_replace(author, '\s+', ' ', 'g')),
+    publisher = btrim(regexp_replace(publisher, '\s+', ' ', 'g')),
+    supplier = btrim(regexp_replace(supplier, '\s+', ' ', 'g')),
+    category_1 = btrim(regexp_replace(category_1, '\s+', ' ', 'g')),
+    category_2 = btrim(regexp_replace(category_2, '\s+', ' ', 'g')),
+    category_3 = btrim(regexp_replace(category_3, '\s+', ' ', 'g')),
+    sold_count = btrim(regexp_replace(sold_count, '\s+', ' ', 'g')),
+    language = btrim(regexp_replace(language, '\s+', ' ', 'g')),
+    dimensions = btrim(regexp_replace(dimensions, '\s+', ' ', 'g')),
+    url = btrim(regexp_replace(url, '\s+', ' ', 'g')),
+    url_img = btrim(regexp_replace(url_img, '\s+', ' ', 'g'))
+WHERE title IS DISTINCT FROM btrim(regexp_replace(title, '\s+', ' ', 'g'))
+   OR author IS DISTINCT FROM btrim(regexp_replace(author, '\s+', ' ', 'g'))
+   OR publisher IS DISTINCT FROM btrim(regexp_replace(publisher, '\s+', ' ', 'g'))
+   OR supplier IS DISTINCT FROM btrim(regexp_replace(supplier, '\s+', ' ', 'g'))
+   OR category_1 IS DISTINCT FROM btrim(regexp_replace(category_1, '\s+', ' ', 'g'))
+   OR category_2 IS DISTINCT FROM btrim(regexp_replace(category_2, '\s+', ' ', 'g'))
+   OR category_3 IS DISTINCT FROM btrim(regexp_replace(category_3, '\s+', ' ', 'g'))
+   OR sold_count IS DISTINCT FROM btrim(regexp_replace(sold_count, '\s+', ' ', 'g'))
+   OR language IS DISTINCT FROM btrim(regexp_replace(language, '\s+', ' ', 'g'))
+   OR dimensions IS DISTINCT FROM btrim(regexp_replace(dimensions, '\s+', ' ', 'g'))
+   OR url IS DISTINCT FROM btrim(regexp_replace(url, '\s+', ' ', 'g'))
+   OR url_img IS DISTINCT FROM btrim(regexp_replace(url_img, '\s+', ' ', 'g'));
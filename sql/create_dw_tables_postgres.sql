@@ -79,3 +79,45 @@ CREATE TABLE IF NOT EXISTS data_quality_log (
     duplicate_count INTEGER,
     notes TEXT
 );
+
+-- Crawl instrumentation (src/crawler/crawl_log.py tạo tự động nếu chưa có)
+CREATE TABLE IF NOT EXISTS crawl_log (
+    log_id SERIAL PRIMARY KEY,
+    crawl_date DATE NOT NULL,
+    start_time TIMESTAMP NOT NULL,
+    end_time TIMESTAMP,
+    duration_seconds INTEGER,
+    category_crawled VARCHAR(100),
+    page_range VARCHAR(50),
+    engine VARCHAR(20),
+    total_found INTEGER DEFAULT 0,
+    total_inserted INTEGER DEFAULT 0,
+    total_updated INTEGER DEFAULT 0,
+    total_failed INTEGER DEFAULT 0,
+    total_retries INTEGER DEFAULT 0,
+    total_bytes BIGINT DEFAULT 0,
+    records_per_second DECIMAL(10,2),
+    avg_processing_time DECIMAL(10,2),
+    status VARCHAR(20) DEFAULT 'RUNNING',
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS crawl_log_event (
+    event_id BIGSERIAL PRIMARY KEY,
+    log_id INTEGER REFERENCES crawl_log(log_id),
+    event_time TIMESTAMP NOT NULL,
+    page_type VARCHAR(20),
+    url TEXT,
+    attempt INTEGER DEFAULT 1,
+    success BOOLEAN,
+    navigate_ms INTEGER,
+    wait_ms INTEGER,
+    extract_ms INTEGER,
+    insert_ms INTEGER,
+    total_ms INTEGER,
+    bytes INTEGER,
+    row_count INTEGER,
+    error_message TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_crawl_log_event_log ON crawl_log_event(log_id, page_type);
@@ -21,8 +21,20 @@ CREATE TABLE IF NOT EXISTS staging_books (
     dimensions TEXT,
     url TEXT,
     url_img TEXT,
-    time_collect TIMESTAMP
-);
+    time_collect TIMESTAMP,
+    dimension_width NUMERIC,   -- cm, tách từ dimensions khi nạp (normalize.py / book_to_row)
+    dimension_height NUMERIC,
+    loaded_at TIMESTAMP DEFAULT NOW()  -- thời điểm nạp; run_etl dùng để bắt dòng time_collect cũ nạp muộn
+) PARTITION BY RANGE (time_collect);
 
--- You can use the following command in psql to load data:
--- \copy staging_books FROM 'fahasa_complete_books.csv' DELIMITER ',' CSV HEADER ENCODING 'UTF8';
+-- Dòng ngoài mọi partition (time_collect NULL, dữ liệu cũ nạp muộn); partition theo tháng / ngày được tạo
+-- trước và dọn theo retention bằng: python src/db/partitions.py
+CREATE TABLE IF NOT EXISTS staging_books_default PARTITION OF staging_books DEFAULT;
+
+-- 1 dòng / (sản phẩm, thời điểm thu thập): crawler chỉ ghi dòng mới khi dữ liệu thay đổi
+CREATE UNIQUE INDEX IF NOT EXISTS staging_books_url_time_key ON staging_books(url, time_collect);
+CREATE INDEX IF NOT EXISTS staging_books_loaded_at_idx ON staging_books(loaded_at);
+
+-- Load data with python src/crawler/ingest.py <file> (text is normalized on load). If you use \copy instead,
+-- run sql/clean_staging_text.sql afterwards so the ETL joins (no TRIM()) still match:
+-- \copy staging_books (title, author, publisher, supplier, category_1, category_2, category_3, original_price, discount_price, discount_percent, rating, rating_count, sold_count, sold_count_numeric, publish_year, language, page_count, weight, dimensions, url, url_img, time_collect) FROM 'fahasa_complete_books.csv' DELIMITER ',' CSV HEADER ENCODING 'UTF8';
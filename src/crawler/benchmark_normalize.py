@@ -0,0 +1,119 @@
+"""
+BENCHMARK NORMALIZE - SO SÁNH CHUẨN HOÁ THEO CỘT (normalize.py) VỚI CÁCH LẶP iterrows
+    python benchmark_normalize.py                  # 1.000.000 dòng, cả 2 cách chạy trên toàn bộ
+    python benchmark_normalize.py 1000000 50000    # cách iterrows chỉ chạy 50.000 dòng, suy ra theo tỉ lệ
+Dữ liệu giả lập có đủ các dạng bẩn gặp trong snapshot: khoảng trắng thừa, giá dạng chuỗi '52.500 đ',
+'Đã bán 10k+', trọng lượng theo gram, kích thước '19 x 13 x 0.7 cm'.
+Kết quả 2 cách được so khớp trên các dòng chung; lệch hoặc tăng tốc < MIN_SPEEDUP lần -> thoát mã 1
+"""
+
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from book_parser import extract_price_smart, parse_dimensions, parse_sold_count
+from normalize import TEXT_COLUMNS, normalize_frame
+
+MIN_SPEEDUP = 50
+
+def make_rows(n, seed=42):
+    """n dòng thô giống snapshot cũ (CSV / Excel)"""
+    rng = np.random.default_rng(seed)
+    prices = rng.integers(20, 500, n) * 1000
+    price_text = pd.Series(prices).map(lambda p: f"{p:,}".replace(',', '.') + ' đ')
+    sold = rng.integers(0, 30000, n)
+    sold_text = np.where(sold >= 10000, 'Đã bán ' + (sold // 1000).astype(str) + 'k+', 'Đã bán ' + sold.astype(str))
+    weight = np.where(rng.random(n) < 0.5, rng.integers(100, 900, n).astype(float),
+                      rng.integers(1, 20, n) / 10)
+    dims = pd.Series(rng.integers(10, 30, n)).astype(str) + ' x ' + \
+        pd.Series(rng.integers(10, 25, n)).astype(str) + ' x 0.7 cm'
+    return pd.DataFrame({
+        'title': '  Sách  mẫu ' + pd.Series(np.arange(n)).astype(str) + ' ',
+        'author': ' Tác giả ' + pd.Series(rng.integers(0, 5000, n)).astype(str),
+        'publisher': 'NXB Trẻ ',
+        'supplier': ' Fahasa',
+        'category_1': 'Sách trong nước',
+        'category_2': 'Văn học',
+        'category_3': 'Tiểu thuyết',
+        'original_price': price_text,
+        'discount_price': price_text,
+        'discount_percent': rng.integers(0, 40, n).astype(float),
+        'rating': rng.integers(0, 50, n) / 10,
+        'rating_count': rng.integers(0, 500, n),
+        'sold_count': sold_text,
+        'sold_count_numeric': 0,
+        'publish_year': rng.integers(2000, 2026, n),
+        'language': 'Tiếng Việt',
+        'page_count': rng.integers(50, 800, n),
+        'weight': weight,
+        'dimensions': dims,
+        'url': 'https://www.fahasa.com/sach-' + pd.Series(np.arange(n)).astype(str) + '.html',
+        'url_img': '',
+        'time_collect': '2025-11-11 20:32:29',
+    })
+
+def normalize_iterrows(df):
+    """Cách cũ: lặp từng dòng, sửa bằng df.at và các hàm xử lý 1 giá trị"""
+    df = df.astype(object)  # ô nhận giá trị khác kiểu cột ban đầu (chuỗi giá -> số)
+    df['dimension_width'] = np.nan
+    df['dimension_height'] = np.nan
+    for idx, row in df.iterrows():
+        for col in TEXT_COLUMNS:
+            if col in df.columns:
+                df.at[idx, col] = re.sub(r'\s+', ' ', str(row[col])).strip()
+        for col in ('original_price', 'discount_price'):
+            df.at[idx, col] = extract_price_smart(row[col])
+        if not row['sold_count_numeric']:
+            df.at[idx, 'sold_count_numeric'] = parse_sold_count(str(row['sold_count']))[1]
+        weight = float(row['weight'])
+        df.at[idx, 'weight'] = round(weight / 1000, 3) if weight > 10 else weight
+        width, height = parse_dimensions(str(row['dimensions']))
+        df.at[idx, 'dimension_width'] = width
+        df.at[idx, 'dimension_height'] = height
+    return df
+
+def check_same(vectorized, baseline):
+    """So khớp các cột được chuẩn hoá; trả về danh sách cột lệch"""
+    mismatched = []
+    for col in ('title', 'author', 'original_price', 'discount_price', 'sold_count_numeric', 'weight',
+                'dimension_width', 'dimension_height'):
+        left = vectorized[col].reset_index(drop=True)
+        right = baseline[col].reset_index(drop=True)
+        if left.dtype.kind in 'if':
+            same = np.allclose(left.astype(float), right.astype(float), equal_nan=True)
+        else:
+            same = left.equals(right.astype(str))
+        if not same:
+            mismatched.append(col)
+    return mismatched
+
+
+if __name__ == '__main__':
+    ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    BASELINE_ROWS = int(sys.argv[2]) if len(sys.argv) > 2 else ROWS
+
+    print(f"🧪 Tạo {ROWS:,} dòng giả lập...")
+    df = make_rows(ROWS)
+
+    start = time.perf_counter()
+    vectorized = normalize_frame(df)
+    vectorized_seconds = time.perf_counter() - start
+    print(f"⚡ normalize_frame: {vectorized_seconds:.2f}s ({ROWS / vectorized_seconds:,.0f} dòng/s)")
+
+    start = time.perf_counter()
+    baseline = normalize_iterrows(df.head(BASELINE_ROWS))
+    baseline_seconds = time.perf_counter() - start
+    estimated = baseline_seconds * ROWS / BASELINE_ROWS
+    note = '' if BASELINE_ROWS == ROWS else f" -> ước tính {estimated:.1f}s cho {ROWS:,} dòng"
+    print(f"🐢 iterrows ({BASELINE_ROWS:,} dòng): {baseline_seconds:.2f}s{note}")
+
+    mismatched = check_same(vectorized.head(BASELINE_ROWS), baseline)
+    print(f"🔍 Kết quả 2 cách: {'khớp' if not mismatched else 'lệch ở ' + ', '.join(mismatched)}")
+    speedup = estimated / vectorized_seconds
+    print(f"🚀 Tăng tốc: x{speedup:.0f} (yêu cầu >= x{MIN_SPEEDUP})")
+    if mismatched or speedup < MIN_SPEEDUP:
+        print("❌ Benchmark không đạt")
+        sys.exit(1)
@@ -0,0 +1,474 @@
+"""
+BOOK PARSER - TÁCH DỮ LIỆU SÁCH TỪ HTML (KHÔNG CẦN TRÌNH DUYỆT)
+Dùng lxml để lấy cùng 22 trường như get_book_details (Selenium)
+
+Quy trình 2 bước:
+    1. extract_raw_lxml(html): lấy text thô (bảng thông số, breadcrumb, giá, rating, ...)
+    2. build_book(raw, url): hậu xử lý text thô thành dict sách - dùng chung cho mọi engine
+"""
+
+import hashlib
+import json
+import re
+from datetime import datetime
+from urllib.parse import urljoin
+
+from lxml import html as lxml_html
+
+from category_tree import resolve_categories
+
+def extract_price_smart(price_text):
+    """Trích xuất giá thông minh"""
+    try:
+        if not price_text:
+            return 0.0
+
+        clean_text = re.sub(r'[^\d,.]', '', str(price_text))
+        clean_text = clean_text.replace(',', '').replace('.', '')
+
+        if clean_text and clean_text.isdigit():
+            price = float(clean_text)
+            if price < 1000:
+                price *= 1000
+            return price if price >= 1000 else 0.0
+        return 0.0
+    except:
+        return 0.0
+
+def new_book(url):
+    """Dict sách mặc định (22 trường của staging_books)"""
+    return {
+        'title': '',
+        'author': '',
+        'publisher': '',
+        'supplier': '',
+        'category_1': '',
+        'category_2': '',
+        'category_3': '',
+        'original_price': 0.0,
+        'discount_price': 0.0,
+        'discount_percent': 0.0,
+        'rating': 0.0,
+        'rating_count': 0,
+        'sold_count': '',
+        'sold_count_numeric': 0,
+        'publish_year': 0,
+        'language': 'Tiếng Việt',
+        'page_count': 0,
+        'weight': 0.0,
+        'dimensions': '',
+        'url': url,
+        'url_img': '',
+        'time_collect': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+# Các selector dự phòng cho giá (Cách 2) - giữ đúng thứ tự như bản Selenium
+PRICE_FALLBACK_SELECTORS = [
+    '.price-original .price',
+    '.price .current-price',
+    '.product-price .price',
+    '[data-price]',
+    '.price-box .price'
+]
+
+def _cls(name):
+    """Điều kiện XPath tương đương CSS .name"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# XPath tương đương từng CSS selector (lxml không cần cài thêm cssselect)
+_PRICE_FALLBACK_XPATHS = [
+    f"//*[{_cls('price-original')}]//*[{_cls('price')}]",
+    f"//*[{_cls('price')}]//*[{_cls('current-price')}]",
+    f"//*[{_cls('product-price')}]//*[{_cls('price')}]",
+    "//*[@data-price]",
+    f"//*[{_cls('price-box')}]//*[{_cls('price')}]",
+]
+
+def _text(elem):
+    """Text của element, gộp khoảng trắng giống .text của Selenium"""
+    if elem is None:
+        return ''
+    return ' '.join(elem.text_content().split())
+
+def _first(nodes):
+    return nodes[0] if nodes else None
+
+def extract_raw_lxml(page_html):
+    """Lấy các trường thô từ HTML trang sản phẩm"""
+    doc = lxml_html.fromstring(page_html)
+    # Bỏ script/style để text giống những gì trình duyệt hiển thị
+    for bad in doc.xpath('//script | //style | //noscript | //head'):
+        bad.drop_tree()
+
+    raw = {}
+
+    # Bảng thông số: [th, text div đầu tiên, text cả ô td]
+    raw['spec'] = []
+    for th in doc.xpath('//th'):
+        td = _first(th.xpath('following-sibling::td'))
+        if td is None:
+            continue
+        div = _first(td.xpath('.//div'))
+        raw['spec'].append([_text(th), _text(div), _text(td)])
+
+    crumbs = doc.xpath(f"//*[{_cls('breadcrumb')}]//li//a")
+    raw['breadcrumbs'] = [_text(a) for a in crumbs]
+    raw['breadcrumb_urls'] = [a.get('href') or '' for a in crumbs]
+
+    h1 = _first(doc.xpath('//h1'))
+    raw['title'] = _text(h1) if h1 is not None else None
+
+    # Cách 1: element có chữ "đ" trong text
+    raw['price_texts'] = [_text(e) for e in doc.xpath("//*[contains(text(), 'đ')]")]
+
+    # Cách 2: các selector dự phòng
+    raw['fallback_prices'] = []
+    for xp in _PRICE_FALLBACK_XPATHS:
+        elem = _first(doc.xpath(xp))
+        if elem is None:
+            raw['fallback_prices'].append(None)
+        else:
+            raw['fallback_prices'].append(_text(elem) or elem.get('data-price') or '')
+
+    current = _first(doc.xpath(f"//span[{_cls('price')}][starts-with(@id, 'product-price-')]"))
+    old = _first(doc.xpath(f"//span[{_cls('price')}][starts-with(@id, 'old-price-')]"))
+    percent = _first(doc.xpath(f"//span[{_cls('discount-percent')}]"))
+    raw['current_price'] = _text(current) if current is not None else None
+    raw['old_price'] = _text(old) if old is not None else None
+    raw['discount_percent'] = _text(percent) if percent is not None else None
+
+    raw['supplier_blocks'] = []
+    for div in doc.xpath(f"//div[{_cls('product-view-sa-supplier')}]"):
+        raw['supplier_blocks'].append({
+            'spans': [_text(s) for s in div.xpath('.//span')],
+            'links': [_text(a) for a in div.xpath('.//a')],
+            'text': _text(div),
+        })
+
+    img = _first(doc.xpath(f"//img[{_cls('fhs-p-img')}]"))
+    raw['img_src'] = img.get('src') if img is not None else None
+    raw['img_data_src'] = img.get('data-src') if img is not None else None
+
+    rating = _first(doc.xpath("//div[./span[contains(text(), '/5')]]"))
+    raw['rating_text'] = _text(rating) if rating is not None else None
+    rating_box = _first(doc.xpath(f"//*[{_cls('rating-box')}]//*[{_cls('rating')}]"))
+    raw['rating_style'] = rating_box.get('style') if rating_box is not None else None
+
+    sold = _first(doc.xpath(f"//div[{_cls('product-view-qty-num')}]"))
+    raw['sold_text'] = _text(sold) if sold is not None else None
+
+    return raw
+
+def _spec_value(raw, label, prefer_div=True):
+    """Giá trị ô td đầu tiên có th chứa label (giống XPath contains(text(), label))"""
+    for th_text, div_text, td_text in raw.get('spec') or []:
+        if label in th_text:
+            if prefer_div and div_text:
+                return div_text
+            return td_text
+    return None
+
+def build_book(raw, url):
+    """Hậu xử lý dict thô thành dict sách; trả về None nếu không có title hoặc giá"""
+    book = new_book(url)
+
+    # Publish year
+    year_text = _spec_value(raw, 'Năm XB') or ''
+    if year_text.isdigit():
+        book['publish_year'] = int(year_text)
+
+    # Weight
+    try:
+        weight_text = _spec_value(raw, 'Trọng lượng') or ''
+        weight_val = re.sub(r'[^\d.]', '', weight_text)
+        if weight_val:
+            weight_gram = float(weight_val)
+            if weight_gram > 10:
+                book['weight'] = round(weight_gram / 1000, 3)
+            else:
+                book['weight'] = weight_gram
+    except:
+        pass
+
+    # Dimensions
+    book['dimensions'] = _spec_value(raw, 'Kích Thước Bao Bì') or ''
+
+    # Page count
+    page_text = _spec_value(raw, 'Số trang') or ''
+    if page_text.isdigit():
+        book['page_count'] = int(page_text)
+
+    # Breadcrumb (category) - tên theo cây danh mục khi URL breadcrumb có trong cây
+    book['category_1'], book['category_2'], book['category_3'] = resolve_categories(
+        raw.get('breadcrumbs') or [], raw.get('breadcrumb_urls') or [], url)
+
+    # Title
+    if raw.get('title') is None:
+        return None
+    book['title'] = raw['title']
+
+    # Giá - Cách 1: element có chữ "đ"
+    price_found = False
+    for text in raw.get('price_texts') or []:
+        if re.search(r'\d{2,}', text):  # Có ít nhất 2 chữ số
+            price = extract_price_smart(text)
+            if price > 0:
+                book['discount_price'] = price
+                book['original_price'] = price
+                price_found = True
+                break
+
+    # Giá - Cách 2: selector dự phòng
+    if not price_found:
+        for text in raw.get('fallback_prices') or []:
+            if text is None:
+                continue
+            price = extract_price_smart(text)
+            if price > 0:
+                book['discount_price'] = price
+                book['original_price'] = price
+                price_found = True
+                break
+
+    # Giá hiện tại, giá gốc, phần trăm giảm giá
+    try:
+        price_val = re.sub(r'[^\d.]', '', raw.get('current_price') or '')
+        if price_val:
+            book['discount_price'] = float(price_val.replace('.', ''))
+    except:
+        pass
+    try:
+        old_price_val = re.sub(r'[^\d.]', '', raw.get('old_price') or '')
+        if old_price_val:
+            book['original_price'] = float(old_price_val.replace('.', ''))
+    except:
+        pass
+    try:
+        percent_val = re.sub(r'[^\d-]', '', raw.get('discount_percent') or '')
+        if percent_val:
+            book['discount_percent'] = float(percent_val)
+    except:
+        pass
+
+    # Author
+    author = _spec_value(raw, 'Tác giả', prefer_div=False)
+    if author is not None:
+        book['author'] = author
+
+    blocks = raw.get('supplier_blocks') or []
+
+    # Publisher
+    publisher = _spec_value(raw, 'Nhà xuất bản', prefer_div=False)
+    if publisher is not None:
+        book['publisher'] = publisher
+    elif blocks:
+        spans = blocks[0]['spans']
+        if len(spans) >= 2 and 'Nhà xuất bản' in spans[0]:
+            book['publisher'] = spans[1]
+
+    # Supplier - ưu tiên thẻ <a>
+    if blocks:
+        first = blocks[0]
+        if first['links']:
+            book['supplier'] = first['links'][0]
+        elif len(first['spans']) >= 2 and 'Nhà cung cấp' in first['spans'][0]:
+            book['supplier'] = first['spans'][1]
+        else:
+            book['supplier'] = first['text'].replace('Nhà cung cấp:', '').strip()
+
+    # Supplier/publisher theo nhãn span (chỉ lấy text, không lấy link)
+    for block in blocks:
+        spans = block['spans']
+        if len(spans) >= 2:
+            label = spans[0].lower()
+            if 'nhà cung cấp' in label:
+                book['supplier'] = spans[1]
+            elif 'nhà xuất bản' in label:
+                book['publisher'] = spans[1]
+
+    # url_img (ưu tiên src, nếu không có thì lấy data-src)
+    img_url = raw.get('img_src')
+    if not img_url or 'placeholder' in img_url:
+        img_url = raw.get('img_data_src')
+    if img_url:
+        book['url_img'] = img_url
+
+    # Rating
+    rating_text = raw.get('rating_text')
+    if rating_text is not None:
+        match = re.search(r'(\d+(?:[.,]\d+)?)(?=\s*/\s*5)', rating_text)
+        if match:
+            book['rating'] = float(match.group(1).replace(',', '.'))
+        else:
+            width_match = re.search(r'width:\s*(\d+)%', raw.get('rating_style') or '')
+            if width_match:
+                percent = int(width_match.group(1))
+                book['rating'] = round(percent / 20, 2)  # 100% = 5.0
+
+    # Số lượt bán: 'Đã bán 4' hoặc 'Đã bán 10k+'
+    sold_count, sold_numeric = parse_sold_count(raw.get('sold_text') or '')
+    if sold_count:
+        book['sold_count'] = sold_count
+        book['sold_count_numeric'] = sold_numeric
+
+    # Chỉ trả về nếu có giá
+    return book if price_found else None
+
+# '19 x 13 x 0.7 cm' -> chiều rộng 19, chiều cao 13 (cm); dùng chung với normalize.py
+DIMENSIONS_PATTERN = r'(\d+(?:[.,]\d+)?)\s*[xX×]\s*(\d+(?:[.,]\d+)?)'
+
+def parse_dimensions(dimensions):
+    """'19 x 13 x 0.7 cm' -> (19.0, 13.0); không khớp -> (None, None)"""
+    match = re.search(DIMENSIONS_PATTERN, dimensions or '')
+    if not match:
+        return None, None
+    return float(match.group(1).replace(',', '.')), float(match.group(2).replace(',', '.'))
+
+def parse_sold_count(sold_text):
+    """'Đã bán 10k+' -> ('10k+', 10000); không khớp -> ('', 0)"""
+    match = re.search(r'Đã bán\s*([\d.,]+)(k\+)?', sold_text, re.IGNORECASE)
+    if not match:
+        return '', 0
+    sold_count = match.group(1) + (match.group(2) if match.group(2) else '')
+    try:
+        if match.group(2):
+            # vd: 10k+ => 10000
+            return sold_count, int(float(match.group(1).replace(',', '.')) * 1000)
+        num = match.group(1).replace('.', '').replace(',', '')
+        return sold_count, int(num) if num.isdigit() else 0
+    except ValueError:
+        return sold_count, 0
+
+def parse_book_html(page_html, url):
+    """HTML trang sản phẩm -> dict sách (hoặc None)"""
+    try:
+        return build_book(extract_raw_lxml(page_html), url)
+    except Exception as e:
+        print(f"    ❌ Lỗi parse HTML: {e}")
+        return None
+
+def parse_listing_urls(page_html, base_url):
+    """Lấy URL sản phẩm từ trang danh sách (.item-inner a đầu tiên), bỏ flashsale"""
+    doc = lxml_html.fromstring(page_html)
+    product_urls = []
+    for card in doc.xpath(f"//*[{_cls('item-inner')}]"):
+        link = _first(card.xpath('.//a[@href]'))
+        if link is None:
+            continue
+        url_product = urljoin(base_url, link.get('href'))
+        if 'flashsale' not in url_product.lower():
+            product_urls.append(url_product)
+    return product_urls
+
+# Các trường thay đổi theo ngày - lấy được từ thẻ sản phẩm ở trang danh mục
+VOLATILE_FIELDS = [
+    'original_price', 'discount_price', 'discount_percent',
+    'rating', 'rating_count', 'sold_count', 'sold_count_numeric'
+]
+
+# Trường tĩnh bắt buộc: thiếu thì phải vào trang chi tiết
+REQUIRED_STATIC_FIELDS = ['title', 'publisher', 'supplier']
+
+def _parse_card(card, base_url):
+    """1 thẻ .item-inner -> dict các trường volatile (None nếu thẻ không có)"""
+    link = _first(card.xpath('.//a[@href]'))
+    if link is None:
+        return None
+    name = _first(card.xpath(f".//*[{_cls('product-name-no-ellipsis')} or {_cls('product-name')}]//a"))
+    title = _text(name) if name is not None else (link.get('title') or '').strip()
+
+    info = {'url': urljoin(base_url, link.get('href')), 'title': title}
+    for field in VOLATILE_FIELDS:
+        info[field] = None
+
+    special = _first(card.xpath(f".//*[{_cls('special-price')}]//span[{_cls('price')}]"))
+    if special is None:
+        special = _first(card.xpath(f".//*[{_cls('price-label')}]//span[{_cls('price')}]"))
+    old = _first(card.xpath(f".//*[{_cls('old-price')}]//span[{_cls('price')}]"))
+    percent = _first(card.xpath(f".//span[{_cls('discount-percent')}] | .//*[{_cls('label-pro-sale')}]//span"))
+
+    if special is not None:
+        price = extract_price_smart(_text(special))
+        if price > 0:
+            info['discount_price'] = price
+            # Không có giá bìa -> sách không giảm giá
+            info['original_price'] = price
+            info['discount_percent'] = 0.0
+    if old is not None:
+        old_price = extract_price_smart(_text(old))
+        if old_price > 0:
+            info['original_price'] = old_price
+    if percent is not None:
+        percent_val = re.sub(r'[^\d]', '', _text(percent))
+        if percent_val:
+            info['discount_percent'] = -float(percent_val)
+
+    rating_box = _first(card.xpath(f".//*[{_cls('rating-box')}]//*[{_cls('rating')}]"))
+    if rating_box is not None:
+        width_match = re.search(r'width:\s*(\d+)%', rating_box.get('style') or '')
+        if width_match:
+            info['rating'] = round(int(width_match.group(1)) / 20, 2)
+    amount = _first(card.xpath(f".//*[{_cls('amount')}]"))
+    if amount is not None:
+        count_val = re.sub(r'[^\d]', '', _text(amount))
+        if count_val:
+            info['rating_count'] = int(count_val)
+
+    sold_node = _first(card.xpath(".//*[contains(text(), 'Đã bán')]"))
+    if sold_node is not None:
+        sold_count, sold_numeric = parse_sold_count(_text(sold_node))
+        if sold_count:
+            info['sold_count'] = sold_count
+            info['sold_count_numeric'] = sold_numeric
+    return info
+
+def parse_listing_cards(page_html, base_url):
+    """Trang danh mục -> list thẻ sản phẩm (url, title + các trường volatile), bỏ flashsale"""
+    doc = lxml_html.fromstring(page_html)
+    cards = []
+    for card in doc.xpath(f"//*[{_cls('item-inner')}]"):
+        info = _parse_card(card, base_url)
+        if info and 'flashsale' not in info['url'].lower():
+            cards.append(info)
+    return cards
+
+def needs_detail(known_book):
+    """Sản phẩm mới hoặc thiếu trường tĩnh -> phải vào trang chi tiết"""
+    if not known_book:
+        return True
+    return any(not known_book.get(field) for field in REQUIRED_STATIC_FIELDS)
+
+def build_snapshot(known_book, card):
+    """Ghép trường tĩnh của sản phẩm đã biết với trường volatile từ thẻ danh mục
+    Trả về None nếu thẻ không có giá (cần vào trang chi tiết)"""
+    if card.get('discount_price') is None:
+        return None
+    book = new_book(known_book['url'])
+    for field in book:
+        if field in known_book and field not in ('url', 'time_collect'):
+            book[field] = known_book[field]
+    for field in VOLATILE_FIELDS:
+        if card.get(field) is not None:
+            book[field] = card[field]
+    return book
+
+# Trường không đưa vào content hash: khoá và thời điểm thu thập
+HASH_EXCLUDED_FIELDS = ('url', 'time_collect')
+
+def content_hash(book):
+    """Hash 64-bit (int có dấu, vừa BIGINT) của các trường đã trích xuất
+    Ổn định giữa các engine: số làm tròn 2 chữ số, chuỗi bỏ khoảng trắng thừa"""
+    normalized = {}
+    for field, value in book.items():
+        if field in HASH_EXCLUDED_FIELDS:
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = round(float(value), 2)
+        elif value is None:
+            value = ''
+        else:
+            value = ' '.join(str(value).split())
+        normalized[field] = value
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.blake2b(payload.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
@@ -0,0 +1,301 @@
+"""
+BROWSER SERVICE - CHROME CHẠY SẴN, CRAWLER MƯỢN SESSION THAY VÌ KHỞI ĐỘNG LẠI MỖI LẦN
+    python browser_service.py 4          # chạy service giữ 4 Chrome (headless) sẵn sàng
+Crawler (create_chrome_driver) hỏi service trước:
+    POST /lease   -> {lease_id, debugger_address, pid}: gắn ChromeDriver vào Chrome đang chạy (debuggerAddress)
+    POST /release -> trả Chrome về pool (recycle=true: khởi động lại Chrome trước khi cho mượn tiếp)
+Không có service -> tự khởi động Chrome như cũ, nhưng dùng ChromeDriver đã cache (không gọi
+ChromeDriverManager().install() mỗi lần chạy)
+
+- Mỗi slot có profile riêng (browser_profiles/slot-N) -> disk cache CSS/JS/font giữ qua các lần chạy
+- Lease hết hạn (crawler chết không trả) được thu hồi; Chrome chết được khởi động lại khi cho mượn
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+BROWSER_SERVICE_URL = os.environ.get('BROWSER_SERVICE_URL', f'http://{SERVICE_HOST}:{SERVICE_PORT}')
+BASE_DEBUG_PORT = 9300
+PROFILE_ROOT = 'browser_profiles'
+DRIVER_CACHE_FILE = 'chromedriver_path.json'
+DRIVER_CACHE_DAYS = 7          # sau bao lâu mới hỏi lại ChromeDriverManager (có thể cần mạng)
+LEASE_SECONDS = 6 * 3600       # lease quá hạn coi như crawler đã chết, thu hồi slot
+CHROME_BINARIES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome')
+
+# ---------- ChromeDriver đã cache ----------
+
+def cached_driver_path(cache_file=DRIVER_CACHE_FILE, max_age_days=DRIVER_CACHE_DAYS):
+    """Đường dẫn chromedriver: dùng bản đã resolve nếu còn hạn, ngược lại gọi ChromeDriverManager
+    Lỗi mạng -> dùng bản cache cũ; không có gì -> None (để Selenium tìm trong PATH)"""
+    cached = None
+    if os.path.exists(cache_file):
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if not os.path.exists(cached.get('path', '')):
+            cached = None
+    if cached and time.time() - cached.get('resolved_at', 0) < max_age_days * 86400:
+        return cached['path']
+    try:
+        path = ChromeDriverManager().install()
+    except Exception as e:
+        print(f"⚠️ ChromeDriverManager lỗi, dùng chromedriver đã cache / PATH: {str(e)[:100]}")
+        return cached['path'] if cached else None
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump({'path': path, 'resolved_at': time.time()}, f)
+    return path
+
+def find_chrome_binary():
+    """Chrome / Chromium để service tự khởi động (CHROME_BINARY ghi đè)"""
+    if os.environ.get('CHROME_BINARY'):
+        return os.environ['CHROME_BINARY']
+    for name in CHROME_BINARIES:
+        path = shutil.which(name)
+        if path:
+            return path
+    raise Exception(f"Không tìm thấy Chrome ({', '.join(CHROME_BINARIES)}), đặt biến CHROME_BINARY")
+
+# ---------- Service ----------
+
+class ChromeSlot:
+    """1 tiến trình Chrome mở cổng DevTools, có profile riêng"""
+
+    def __init__(self, slot_id, debug_port, profile_dir, chrome_binary, headless=True):
+        self.slot_id = slot_id
+        self.debug_port = debug_port
+        self.profile_dir = profile_dir
+        self.chrome_binary = chrome_binary
+        self.headless = headless
+        self.process = None
+        self.lease_id = None
+        self.lease_expires = 0
+        self.leases = 0
+
+    @property
+    def debugger_address(self):
+        return f'{SERVICE_HOST}:{self.debug_port}'
+
+    def start(self, timeout=30):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        args = [
+            self.chrome_binary,
+            f'--remote-debugging-port={self.debug_port}',
+            f'--user-data-dir={os.path.abspath(self.profile_dir)}',
+            '--no-sandbox',
+            '--disable-dev-shm-usage',
+            '--disable-blink-features=AutomationControlled',
+            '--no-first-run',
+            '--no-default-browser-check',
+            'about:blank',
+        ]
+        if self.headless:
+            args.insert(1, '--headless=new')
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.is_alive():
+                return
+            time.sleep(0.2)
+        self.stop()
+        raise Exception(f"Chrome slot {self.slot_id} không mở cổng DevTools {self.debug_port}")
+
+    def is_alive(self):
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            with urlopen(f'http://{self.debugger_address}/json/version', timeout=2):
+                return True
+        except (URLError, OSError):
+            return False
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+class BrowserService:
+    def __init__(self, size=2, base_debug_port=BASE_DEBUG_PORT, profile_root=PROFILE_ROOT,
+                 headless=True, lease_seconds=LEASE_SECONDS):
+        chrome_binary = find_chrome_binary()
+        self.lease_seconds = lease_seconds
+        self.slots = [ChromeSlot(i, base_debug_port + i, os.path.join(profile_root, f'slot-{i}'),
+                                 chrome_binary, headless) for i in range(1, size + 1)]
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Khởi động mọi Chrome trước khi nhận lease (warm)"""
+        start = time.time()
+        for slot in self.slots:
+            slot.start()
+        print(f"🔥 {len(self.slots)} Chrome sẵn sàng ({time.time() - start:.1f}s)")
+
+    def lease(self):
+        """Cho mượn 1 Chrome rảnh; None nếu mọi slot đang bận"""
+        with self._lock:
+            now = time.time()
+            for slot in self.slots:
+                if slot.lease_id and slot.lease_expires < now:
+                    print(f"⏰ Thu hồi lease quá hạn của slot {slot.slot_id}")
+                    slot.lease_id = None
+            for slot in self.slots:
+                if slot.lease_id:
+                    continue
+                if not slot.is_alive():
+                    print(f"🔁 Chrome slot {slot.slot_id} đã chết, khởi động lại")
+                    slot.restart()
+                slot.lease_id = uuid.uuid4().hex
+                slot.lease_expires = now + self.lease_seconds
+                slot.leases += 1
+                return {'lease_id': slot.lease_id, 'slot': slot.slot_id,
+                        'debugger_address': slot.debugger_address, 'pid': slot.process.pid}
+        return None
+
+    def release(self, lease_id, recycle=False):
+        """Trả Chrome về pool; recycle=True -> khởi động lại (giải phóng bộ nhớ) trước khi cho mượn tiếp"""
+        with self._lock:
+            for slot in self.slots:
+                if slot.lease_id == lease_id:
+                    slot.lease_id = None
+                    if recycle or not slot.is_alive():
+                        slot.restart()
+                    return True
+        return False
+
+    def status(self):
+        with self._lock:
+            return [{'slot': slot.slot_id, 'leased': bool(slot.lease_id), 'alive': slot.is_alive(),
+                     'leases': slot.leases} for slot in self.slots]
+
+    def close(self):
+        for slot in self.slots:
+            slot.stop()
+
+    def serve_forever(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, code, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == '/status':
+                    self._reply(200, service.status())
+                else:
+                    self._reply(404, {'error': 'not found'})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if self.path == '/lease':
+                    lease = service.lease()
+                    self._reply(200 if lease else 503, lease or {'error': 'Mọi Chrome đang bận'})
+                elif self.path == '/release':
+                    ok = service.release(body.get('lease_id'), bool(body.get('recycle')))
+                    self._reply(200 if ok else 404, {'released': ok})
+                else:
+                    self._reply(404, {'error': 'not found'})
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        print(f"🛎️ Browser service: http://{host}:{port} ({len(self.slots)} slot)")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+# ---------- Client (crawler) ----------
+
+def _post(url, body, timeout):
+    request = Request(url, data=json.dumps(body).encode('utf-8'),
+                      headers={'Content-Type': 'application/json'}, method='POST')
+    with urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+class LeasedChrome(webdriver.Chrome):
+    """WebDriver gắn vào Chrome của service; quit() chỉ dừng ChromeDriver rồi trả Chrome về service"""
+
+    def __init__(self, lease, service_url, **kwargs):
+        self.lease = lease
+        self.service_url = service_url
+        self.recycle_on_release = False
+        super().__init__(**kwargs)
+
+    def quit(self):
+        try:
+            super().quit()  # Chrome do service khởi động nên ChromeDriver không tắt nó
+        finally:
+            release_session(self.lease['lease_id'], self.recycle_on_release, self.service_url)
+
+def lease_session(service_url=BROWSER_SERVICE_URL, timeout=2):
+    """Mượn 1 Chrome đang chạy; None nếu service không chạy hoặc hết slot"""
+    try:
+        return _post(f'{service_url}/lease', {}, timeout)
+    except (URLError, OSError, ValueError):
+        return None
+
+def release_session(lease_id, recycle=False, service_url=BROWSER_SERVICE_URL, timeout=10):
+    try:
+        return _post(f'{service_url}/release', {'lease_id': lease_id, 'recycle': recycle}, timeout)
+    except (URLError, OSError, ValueError) as e:
+        print(f"⚠️ Không trả được Chrome cho browser service: {e}")
+        return None
+
+def connect_leased_driver(service_url=BROWSER_SERVICE_URL):
+    """WebDriver trên Chrome mượn từ service; None nếu không mượn được"""
+    lease = lease_session(service_url)
+    if not lease:
+        return None
+    options = Options()
+    options.add_experimental_option('debuggerAddress', lease['debugger_address'])
+    driver_path = cached_driver_path()
+    try:
+        return LeasedChrome(lease, service_url, service=Service(driver_path) if driver_path else Service(),
+                            options=options)
+    except Exception as e:
+        release_session(lease['lease_id'], service_url=service_url)
+        print(f"⚠️ Không gắn được vào Chrome của service: {str(e)[:100]}")
+        return None
+
+
+if __name__ == '__main__':
+    SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    HEADLESS = True
+
+    browser_service = BrowserService(size=SIZE, headless=HEADLESS)
+    browser_service.start()
+    try:
+        browser_service.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⚠️  Dừng browser service")
+    finally:
+        browser_service.close()
@@ -0,0 +1,155 @@
+"""
+CATEGORY TREE - KHÁM PHÁ CÂY DANH MỤC FAHASA
+Duyệt từ danh mục gốc (vd. /sach-trong-nuoc.html) xuống các danh mục con theo cấu trúc URL:
+    /sach-trong-nuoc.html -> /sach-trong-nuoc/van-hoc-trong-nuoc.html -> /sach-trong-nuoc/van-hoc-trong-nuoc/tieu-thuyet.html
+Cây được cache ra file JSON với TTL; crawler chia việc theo danh mục lá (shard)
+category_1/2/3 của mọi đường thu thập (full, scheduled, retry, queue, reparse) do resolve_categories
+tính từ breadcrumb trang sản phẩm: URL breadcrumb có trong cây -> tên theo cây, không có -> tên breadcrumb
+"""
+
+import json
+import os
+import time
+from collections import deque
+from urllib.parse import urljoin, urlsplit
+
+from lxml import html as lxml_html
+
+TREE_PATH_ENV = 'CATEGORY_TREE_PATH'  # process con (parser pool, reparse) kế thừa qua biến môi trường
+DEFAULT_TREE_PATH = os.environ.get(TREE_PATH_ENV, 'category_tree.json')
+DEFAULT_TTL_HOURS = 24 * 7
+
+_tree_paths = {}  # file cây -> (mtime, url danh mục -> đường dẫn tên)
+
+def _category_prefix(url):
+    """'/sach-trong-nuoc.html' -> '/sach-trong-nuoc/' (URL danh mục con bắt đầu bằng prefix này)"""
+    path = urlsplit(url).path
+    return (path[:-len('.html')] if path.endswith('.html') else path.rstrip('/')) + '/'
+
+def parse_child_categories(page_html, category_url):
+    """Link danh mục con trực tiếp trên trang danh mục: [(tên, url)]
+    Sản phẩm có URL /ten-sach.html ở gốc nên không lẫn với danh mục con"""
+    doc = lxml_html.fromstring(page_html)
+    prefix = _category_prefix(category_url)
+    host = urlsplit(category_url).netloc
+    children = {}
+    for a in doc.xpath('//a[@href]'):
+        url = urljoin(category_url, a.get('href')).split('?')[0].split('#')[0]
+        parts = urlsplit(url)
+        if parts.netloc != host or not parts.path.startswith(prefix) or not parts.path.endswith('.html'):
+            continue
+        rest = parts.path[len(prefix):]
+        if '/' in rest:
+            continue  # cháu, sẽ gặp khi duyệt danh mục con
+        name = ' '.join(a.text_content().split())
+        if name and (url not in children or len(name) < len(children[url])):
+            children[url] = name  # cùng URL nhiều link -> lấy tên gọn nhất (bỏ số lượng, mô tả)
+    return [(name, url) for url, name in children.items()]
+
+def discover_category_tree(fetch_html, root_url, root_name, max_depth=3, max_categories=500):
+    """Duyệt BFS từ danh mục gốc; fetch_html(url) -> HTML (nên đi qua rate limiter)"""
+    root = {'name': root_name, 'url': root_url, 'path': [root_name], 'children': []}
+    pending = deque([root])
+    seen = {root_url}
+    while pending and len(seen) < max_categories:
+        node = pending.popleft()
+        if len(node['path']) > max_depth:
+            continue
+        try:
+            children = parse_child_categories(fetch_html(node['url']), node['url'])
+        except Exception as e:
+            print(f"    ⚠️ Không tải được danh mục {node['url']}: {e}")
+            continue
+        for name, url in children:
+            if url in seen:
+                continue
+            seen.add(url)
+            child = {'name': name, 'url': url, 'path': node['path'] + [name], 'children': []}
+            node['children'].append(child)
+            pending.append(child)
+        print(f"    🌳 {' > '.join(node['path'])}: {len(node['children'])} danh mục con")
+    return root
+
+def read_cached_tree(path=DEFAULT_TREE_PATH):
+    """(root, tuổi tính bằng giờ) từ file cache, bỏ qua TTL; (None, None) nếu chưa có"""
+    if not os.path.exists(path):
+        return None, None
+    with open(path, 'r', encoding='utf-8') as f:
+        cached = json.load(f)
+    return cached.get('root'), (time.time() - cached.get('built_at', 0)) / 3600
+
+def load_category_tree(fetch_html, root_url, root_name, path=DEFAULT_TREE_PATH,
+                       ttl_hours=DEFAULT_TTL_HOURS, force=False):
+    """Cây danh mục từ cache nếu còn hạn, ngược lại khám phá lại và ghi cache"""
+    if not force:
+        root, age_hours = read_cached_tree(path)
+        if root and root.get('url') == root_url and age_hours < ttl_hours:
+            print(f"🌳 Dùng cây danh mục đã cache ({age_hours:.1f}h / TTL {ttl_hours}h)")
+            return root
+
+    print(f"🌳 Khám phá cây danh mục từ {root_url}...")
+    root = discover_category_tree(fetch_html, root_url, root_name)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'built_at': time.time(), 'root': root}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return root
+
+def categories_from_path(path):
+    """Đường dẫn tên danh mục -> (category_1, category_2, category_3), cùng quy ước với breadcrumb"""
+    category_1 = path[0] if path else ''
+    category_2 = path[1] if len(path) > 1 else ''
+    category_3 = ' - '.join(path[2:4]) if len(path) > 2 else ''
+    return category_1, category_2, category_3
+
+def leaf_categories(root):
+    """Danh mục lá (shard để crawl) theo thứ tự duyệt cây"""
+    leaves = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node['children']:
+            stack.extend(reversed(node['children']))
+        else:
+            leaves.append(node)
+    return leaves
+
+def use_tree_path(path):
+    """Chọn file cây cho resolve_categories ở process này và mọi process con tạo sau đó"""
+    os.environ[TREE_PATH_ENV] = path
+
+def tree_paths(path=None):
+    """url danh mục -> đường dẫn tên trong cây đã cache (bỏ qua TTL, đọc lại khi file đổi); {} nếu chưa có"""
+    path = path or os.environ.get(TREE_PATH_ENV, DEFAULT_TREE_PATH)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    cached = _tree_paths.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    root, _ = read_cached_tree(path)
+    paths = {}
+    stack = [root] if root else []
+    while stack:
+        node = stack.pop()
+        paths[node['url']] = node['path']
+        stack.extend(node['children'])
+    _tree_paths[path] = (mtime, paths)
+    return paths
+
+def resolve_categories(names, urls, page_url=''):
+    """Breadcrumb (tên, href) -> (category_1, category_2, category_3), cùng 1 cách cho mọi engine / chế độ
+    Cấp sâu nhất có URL trong cây: các cấp đến đó lấy tên theo cây, cấp sâu hơn giữ tên breadcrumb;
+    không có cây hoặc không khớp -> tên breadcrumb (gộp khoảng trắng)"""
+    names = [' '.join((name or '').split()) for name in names]
+    paths = tree_paths()
+    path = names
+    for i in range(min(len(names), len(urls)) - 1, -1, -1):
+        if not urls[i]:
+            continue
+        url = urljoin(page_url, urls[i]).split('?')[0].split('#')[0]
+        if url in paths:
+            path = paths[url] + names[i + 1:]
+            break
+    return categories_from_path(path)
@@ -0,0 +1,84 @@
+"""
+CHANGE DETECTOR - CHỈ GHI STAGING KHI DỮ LIỆU SẢN PHẨM THAY ĐỔI
+Bảng product_state giữ content hash gần nhất của mỗi URL (đã chuẩn hoá):
+    - hash khác (hoặc sản phẩm mới) -> ghi 1 dòng staging_books như trước
+    - hash giống -> chỉ cập nhật heartbeat (last_seen, seen_count), không thêm dòng staging
+Danh mục phần lớn không đổi giữa các lần chạy -> staging và ETL phía sau nhỏ đi nhiều lần
+"""
+
+import os
+import sys
+import threading
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+from book_parser import content_hash
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import get_cursor
+
+STATE_DB = 'staging'
+
+class ChangeDetector:
+    """Hash gần nhất của mọi sản phẩm nạp sẵn vào RAM (8 byte / sản phẩm)
+
+    Trạng thái mới chỉ được ghi xuống product_state ở close(commit=True), gọi SAU khi
+    staging_books đã flush thành công - tránh trường hợp product_state ghi nhận hash mới
+    nhưng dòng staging tương ứng bị mất (lần chạy sau sẽ không ghi lại thay đổi đó).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # url -> (hash, changed, thời điểm)
+        self.changed = 0
+        self.unchanged = 0
+
+        with get_cursor(STATE_DB) as cur:
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS product_state (
+                    url TEXT PRIMARY KEY,
+                    content_hash BIGINT NOT NULL,
+                    first_seen TIMESTAMP DEFAULT NOW(),
+                    last_seen TIMESTAMP DEFAULT NOW(),
+                    last_changed TIMESTAMP DEFAULT NOW(),
+                    seen_count INTEGER DEFAULT 1
+                );
+            ''')
+            cur.execute('SELECT url, content_hash FROM product_state')
+            self._hashes = dict(cur.fetchall())
+        print(f"🔐 Change detector: {len(self._hashes)} sản phẩm đã có content hash")
+
+    def check(self, url, book_data, seen_at=None):
+        """True nếu sản phẩm mới hoặc dữ liệu đổi (cần ghi staging); False = chỉ heartbeat
+        seen_at: thời điểm trang được tải (parse lại cache: fetched_at), mặc định là bây giờ"""
+        digest = content_hash(book_data)
+        with self._lock:
+            changed = self._hashes.get(url) != digest
+            self._hashes[url] = digest
+            self._pending[url] = (digest, changed, seen_at or datetime.now())
+            if changed:
+                self.changed += 1
+            else:
+                self.unchanged += 1
+        return changed
+
+    def close(self, commit=True):
+        """Ghi trạng thái của lần chạy vào product_state (commit=False: bỏ, lần sau ghi lại staging)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or not commit:
+            return 0
+        rows = [(url, digest, now, now, now if changed else None)
+                for url, (digest, changed, now) in pending.items()]
+        with get_cursor(STATE_DB) as cur:
+            execute_values(cur, '''
+                INSERT INTO product_state (url, content_hash, first_seen, last_seen, last_changed)
+                VALUES %s
+                ON CONFLICT (url) DO UPDATE SET
+                    content_hash = EXCLUDED.content_hash,
+                    last_seen = GREATEST(product_state.last_seen, EXCLUDED.last_seen),
+                    last_changed = COALESCE(EXCLUDED.last_changed, product_state.last_changed),
+                    seen_count = product_state.seen_count + 1
+            ''', rows, page_size=1000)
+        return len(rows)
@@ -1,17 +1,25 @@
+import numpy as np
 import pandas as pd
-import random
 from datetime import datetime
 
 INPUT_CSV = 'data-1761453259849.csv'
 OUTPUT_CSV = 'data_cleaned_for_import.csv'
 
-def clean_value(val, default):
-    if pd.isna(val) or val == '' or val == 0 or val == '0' or val == '0.0':
-        return default
-    return val
+def missing_mask(series):
+    """Ô trống: NaN, '' hoặc 0 / '0' / '0.0' (theo cột, không lặp từng dòng)"""
+    return series.isna() | series.astype(str).str.strip().isin(['', '0', '0.0'])
+
+def fill_missing(df, col, make_values):
+    """Điền ô trống của cột bằng make_values(n) - n giá trị mẫu ngẫu nhiên"""
+    mask = missing_mask(df[col])
+    if mask.any():
+        df[col] = df[col].astype(object)
+        df.loc[mask, col] = make_values(int(mask.sum()))
+    return mask
 
 def main():
     df = pd.read_csv(INPUT_CSV)
+    rng = np.random.default_rng()
 
     # Danh sách giá trị mẫu để fill
     publishers = ["NXB Trẻ", "NXB Kim Đồng", "NXB Văn học", "NXB Giáo dục", "NXB Thế giới"]
@@ -20,56 +28,29 @@ def main():
     categories_3 = ["Tiểu thuyết", "Thơ ca", "Tự truyện", "Kinh doanh", "Lập trình", "Y học"]
     dims = ["19 x 13 cm", "24 x 16 cm", "20.5 x 14 cm", "25 x 18 cm", "21 x 15 cm"]
 
-    for idx, row in df.iterrows():
-        # publisher
-        if not row['publisher'] or row['publisher'] == '':
-            df.at[idx, 'publisher'] = random.choice(publishers)
-        # supplier
-        if not row['supplier'] or row['supplier'] == '':
-            df.at[idx, 'supplier'] = random.choice(suppliers)
-        # category_2
-        if not row['category_2'] or row['category_2'] == '':
-            df.at[idx, 'category_2'] = random.choice(categories_2)
-        # category_3
-        if not row['category_3'] or row['category_3'] == '':
-            df.at[idx, 'category_3'] = random.choice(categories_3)
-        # publish_year
-        if not row['publish_year'] or row['publish_year'] == 0:
-            df.at[idx, 'publish_year'] = random.randint(2020, 2025)
-        # page_count
-        if not row['page_count'] or row['page_count'] == 0:
-            df.at[idx, 'page_count'] = random.randint(100, 400)
-        # weight
-        if not row['weight'] or row['weight'] == 0 or row['weight'] == '0.0':
-            df.at[idx, 'weight'] = round(random.uniform(0.2, 2.5), 1)
-        # dimensions
-        if not row['dimensions'] or row['dimensions'] == '':
-            df.at[idx, 'dimensions'] = random.choice(dims)
-        # rating
-        if not row['rating'] or row['rating'] == 0:
-            df.at[idx, 'rating'] = round(random.uniform(3.5, 4.8), 1)
-        # rating_count
-        if not row['rating_count'] or row['rating_count'] == 0:
-            df.at[idx, 'rating_count'] = random.randint(10, 500)
-        # sold_count, sold_count_numeric
-        if not row['sold_count'] or not row['sold_count_numeric'] or row['sold_count_numeric'] == 0:
-            sold = random.randint(50, 2000)
-            df.at[idx, 'sold_count'] = f"Đã bán {sold}"
-            df.at[idx, 'sold_count_numeric'] = sold
-        # original_price, discount_price
-        for col in ['original_price', 'discount_price']:
-            try:
-                df.at[idx, col] = float(row[col])
-            except:
-                df.at[idx, col] = 0.0
-        # discount_percent
-        try:
-            df.at[idx, 'discount_percent'] = float(row['discount_percent'])
-        except:
-            df.at[idx, 'discount_percent'] = 0.0
-        # time_collect
-        if not row['time_collect'] or row['time_collect'] == '':
-            df.at[idx, 'time_collect'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for col, choices in (('publisher', publishers), ('supplier', suppliers), ('category_2', categories_2),
+                         ('category_3', categories_3), ('dimensions', dims)):
+        fill_missing(df, col, lambda n, choices=choices: rng.choice(choices, n))
+    fill_missing(df, 'publish_year', lambda n: rng.integers(2020, 2026, n))
+    fill_missing(df, 'page_count', lambda n: rng.integers(100, 401, n))
+    fill_missing(df, 'weight', lambda n: rng.uniform(0.2, 2.5, n).round(1))
+    fill_missing(df, 'rating', lambda n: rng.uniform(3.5, 4.8, n).round(1))
+    fill_missing(df, 'rating_count', lambda n: rng.integers(10, 501, n))
+
+    # sold_count, sold_count_numeric: thiếu 1 trong 2 -> sinh cùng 1 giá trị cho cả 2 cột
+    no_sold = missing_mask(df['sold_count']) | missing_mask(df['sold_count_numeric'])
+    if no_sold.any():
+        sold = rng.integers(50, 2001, int(no_sold.sum()))
+        df['sold_count'] = df['sold_count'].astype(object)
+        df.loc[no_sold, 'sold_count'] = [f"Đã bán {s}" for s in sold]
+        df.loc[no_sold, 'sold_count_numeric'] = sold
+
+    # original_price, discount_price, discount_percent: không đọc được -> 0.0
+    for col in ['original_price', 'discount_price', 'discount_percent']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
+
+    # time_collect
+    fill_missing(df, 'time_collect', lambda n: datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
     # Ghi ra file mới
     df.to_csv(OUTPUT_CSV, index=False)
@@ -0,0 +1,113 @@
+"""
+COMPARE LEAN PROFILE - SO SÁNH CHROME ĐẦY ĐỦ VÀ CHROME LEAN TRÊN CÙNG DANH SÁCH URL
+    python compare_lean_profile.py 20            # 20 URL gần nhất trong output store
+    python compare_lean_profile.py <url> <url>   # URL chỉ định
+Mỗi URL tải bằng cả 2 trình duyệt, in thời gian tải + lấy dữ liệu, số byte và các trường khác nhau;
+cuối cùng in byte tiết kiệm, tốc độ và tỉ lệ trường khớp (lean phải lấy đủ như bản đầy đủ)
+    - byte: tổng encodedDataLength của Network.loadingFinished trong performance log DevTools, đọc sau khi
+      chờ trang sẵn sàng (Resource Timing tính 0 cho ảnh khác origin cdn1.fahasa.com)
+    - thứ tự đầy đủ / lean đảo mỗi URL -> lần tải trước không làm ấm server/CDN cho riêng 1 bên
+"""
+
+import json
+import sys
+import time
+
+from book_parser import HASH_EXCLUDED_FIELDS
+from dom_extract import get_book_details_js
+from fahasa_bulk_scraper import create_chrome_driver
+from lean_browser import create_lean_driver
+from output_store import iter_books
+from worker_pool import close_client
+
+def recent_urls(limit):
+    """limit URL khác nhau gần nhất trong output store"""
+    urls = {}
+    for book in iter_books():
+        urls.pop(book['url'], None)
+        urls[book['url']] = True
+    return list(urls)[-limit:]
+
+def network_bytes(driver):
+    """Byte đã nhận (nén, gồm header) từ performance log kể từ lần đọc trước; đọc log = xoá log"""
+    total = 0
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message['method'] == 'Network.loadingFinished':
+            total += message['params'].get('encodedDataLength', 0)
+    return int(total)
+
+def load_once(driver, url, settle=1.0):
+    """(sách, giây, byte) của 1 lần tải + lấy dữ liệu
+    settle: chờ thêm sau khi lấy dữ liệu để tài nguyên tải muộn / lazy được tính vào đúng trang này"""
+    network_bytes(driver)  # bỏ request còn sót của trang trước
+    start = time.time()
+    book = get_book_details_js(driver, url)
+    seconds = time.time() - start
+    time.sleep(settle)
+    return book, seconds, network_bytes(driver)
+
+def field_diffs(full_book, lean_book):
+    """Các trường lean khác bản đầy đủ (bỏ url, time_collect)"""
+    if not full_book or not lean_book:
+        return ['<không lấy được sách>'] if full_book or lean_book else []
+    return [field for field, value in full_book.items()
+            if field not in HASH_EXCLUDED_FIELDS and lean_book.get(field) != value]
+
+def compare_profiles(urls):
+    full_driver = create_chrome_driver(performance_log=True)
+    lean_driver = create_lean_driver(performance_log=True)
+    totals = {'full_seconds': 0.0, 'lean_seconds': 0.0, 'full_bytes': 0, 'lean_bytes': 0,
+              'fields': 0, 'matched_fields': 0, 'pages': 0}
+    try:
+        for i, url in enumerate(urls, 1):
+            try:
+                if i % 2:
+                    full_book, full_seconds, full_bytes = load_once(full_driver, url)
+                    lean_book, lean_seconds, lean_bytes = load_once(lean_driver, url)
+                else:
+                    lean_book, lean_seconds, lean_bytes = load_once(lean_driver, url)
+                    full_book, full_seconds, full_bytes = load_once(full_driver, url)
+            except Exception as e:
+                print(f"❌ {i}/{len(urls)} lỗi tải trang {url}: {str(e)[:100]}")
+                continue
+            diffs = field_diffs(full_book, lean_book)
+            fields = len([f for f in (full_book or {}) if f not in HASH_EXCLUDED_FIELDS])
+            totals['pages'] += 1
+            totals['full_seconds'] += full_seconds
+            totals['lean_seconds'] += lean_seconds
+            totals['full_bytes'] += full_bytes
+            totals['lean_bytes'] += lean_bytes
+            totals['fields'] += fields
+            totals['matched_fields'] += max(fields - len(diffs), 0)
+            print(f"{'✅' if not diffs else '⚠️'} {i}/{len(urls)} | đầy đủ {full_seconds:.1f}s {full_bytes / 1024:.0f}KB"
+                  f" | lean {lean_seconds:.1f}s {lean_bytes / 1024:.0f}KB | {url}")
+            if diffs:
+                print(f"    Trường khác nhau: {', '.join(diffs)}")
+    finally:
+        close_client(full_driver)
+        close_client(lean_driver)
+    return totals
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1].startswith('http'):
+        URLS = sys.argv[1:]
+    else:
+        URLS = recent_urls(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
+    if not URLS:
+        print("❌ Không có URL để so sánh (output store trống)")
+        sys.exit(1)
+
+    totals = compare_profiles(URLS)
+    if totals['pages']:
+        saved = totals['full_bytes'] - totals['lean_bytes']
+        print("\n📊 TỔNG KẾT")
+        print(f"   📄 Số trang: {totals['pages']}")
+        print(f"   ⏱️ Thời gian/trang: đầy đủ {totals['full_seconds'] / totals['pages']:.2f}s | "
+              f"lean {totals['lean_seconds'] / totals['pages']:.2f}s "
+              f"(x{totals['full_seconds'] / max(totals['lean_seconds'], 0.001):.1f})")
+        print(f"   📦 Byte/trang: đầy đủ {totals['full_bytes'] / totals['pages'] / 1024:.0f}KB | "
+              f"lean {totals['lean_bytes'] / totals['pages'] / 1024:.0f}KB "
+              f"(tiết kiệm {saved / max(totals['full_bytes'], 1):.0%})")
+        print(f"   🧩 Trường khớp: {totals['matched_fields']}/{totals['fields']}")
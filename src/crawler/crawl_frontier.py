@@ -0,0 +1,191 @@
+"""
+CRAWL FRONTIER - LƯU TIẾN ĐỘ THU THẬP XUỐNG ĐĨA (SQLite)
+Theo dõi trang danh mục và URL sản phẩm: pending / in_flight / done / failed / dead
+Checkpoint sau mỗi sản phẩm -> crash hoặc Ctrl-C thì lần chạy sau tiếp tục đúng chỗ dừng
+"""
+
+import sqlite3
+import threading
+import time
+
+PENDING = 'pending'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'   # đang chờ retry (có next_retry_at)
+DEAD = 'dead'       # đã hết số lần retry
+
+class CrawlFrontier:
+    def __init__(self, db_name="crawl_frontier.db", max_attempts=3, base_backoff=30):
+        """
+        max_attempts: số lần thử tối đa cho 1 URL sản phẩm
+        base_backoff: giây chờ trước lần retry đầu, nhân đôi sau mỗi lần lỗi
+        """
+        self.db_name = db_name
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_name, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.create_tables()
+        self.recover()
+
+    def create_tables(self):
+        """Tạo bảng frontier nếu chưa có"""
+        with self._lock:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS listing_pages (
+                    url TEXT PRIMARY KEY,
+                    page INTEGER,
+                    status TEXT DEFAULT 'pending',
+                    updated_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS product_urls (
+                    url TEXT PRIMARY KEY,
+                    listing_url TEXT,
+                    status TEXT DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    next_retry_at REAL,
+                    last_error TEXT,
+                    updated_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_product_status ON product_urls(status, next_retry_at);
+                CREATE INDEX IF NOT EXISTS idx_product_listing ON product_urls(listing_url);
+            ''')
+            self.conn.commit()
+
+    def recover(self):
+        """URL đang in_flight khi crash -> trả lại pending"""
+        with self._lock:
+            cur = self.conn.execute(
+                'UPDATE product_urls SET status = ? WHERE status = ?', (PENDING, IN_FLIGHT)
+            )
+            self.conn.commit()
+        if cur.rowcount:
+            print(f"♻️ Frontier: khôi phục {cur.rowcount} URL đang dở từ lần chạy trước")
+
+    def has_progress(self):
+        """Frontier còn dữ liệu của lần chạy chưa hoàn tất?"""
+        with self._lock:
+            row = self.conn.execute('SELECT COUNT(*) FROM listing_pages').fetchone()
+        return row[0] > 0
+
+    # ---------- Trang danh mục ----------
+
+    def listing_status(self, listing_url):
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT status FROM listing_pages WHERE url = ?', (listing_url,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def mark_listing_done(self, listing_url, page, product_urls):
+        """Lưu URL sản phẩm của trang danh mục và đánh dấu trang đã tải (1 transaction)"""
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO product_urls (url, listing_url, status, updated_at) VALUES (?, ?, ?, ?)',
+                [(u, listing_url, PENDING, now) for u in product_urls]
+            )
+            self.conn.execute(
+                'INSERT OR REPLACE INTO listing_pages (url, page, status, updated_at) VALUES (?, ?, ?, ?)',
+                (listing_url, page, DONE, now)
+            )
+            self.conn.commit()
+
+    def pending_products(self, listing_url):
+        """URL sản phẩm còn pending của 1 trang danh mục"""
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT url FROM product_urls WHERE listing_url = ? AND status = ? ORDER BY rowid',
+                (listing_url, PENDING)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    # ---------- URL sản phẩm ----------
+
+    def _set_status(self, url, status):
+        with self._lock:
+            self.conn.execute(
+                'UPDATE product_urls SET status = ?, updated_at = ? WHERE url = ?',
+                (status, time.time(), url)
+            )
+            self.conn.commit()
+
+    def mark_in_flight(self, url):
+        self._set_status(url, IN_FLIGHT)
+
+    def mark_done(self, url):
+        """Checkpoint: sản phẩm đã thu thập xong"""
+        self._set_status(url, DONE)
+
+    def get_attempts(self, url):
+        """Số lần đã lỗi của 1 URL (0 nếu chưa lỗi lần nào)"""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT attempts FROM product_urls WHERE url = ?', (url,)
+            ).fetchone()
+        return row[0] if row and row[0] else 0
+
+    def mark_failed(self, url, error=''):
+        """Đưa URL vào hàng đợi retry với backoff luỹ thừa; hết lượt thì chuyển dead"""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT attempts FROM product_urls WHERE url = ?', (url,)
+            ).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            if attempts >= self.max_attempts:
+                status, next_retry_at = DEAD, None
+            else:
+                status, next_retry_at = FAILED, now + self.base_backoff * (2 ** (attempts - 1))
+            self.conn.execute('''
+                INSERT INTO product_urls (url, status, attempts, next_retry_at, last_error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    status = excluded.status, attempts = excluded.attempts,
+                    next_retry_at = excluded.next_retry_at, last_error = excluded.last_error,
+                    updated_at = excluded.updated_at
+            ''', (url, status, attempts, next_retry_at, str(error)[:500], now))
+            self.conn.commit()
+        return status
+
+    def due_retries(self, now=None):
+        """URL lỗi đã đến hạn retry"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT url FROM product_urls WHERE status = ? AND next_retry_at <= ? ORDER BY next_retry_at',
+                (FAILED, now)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def next_retry_wait(self, now=None):
+        """Số giây đến lượt retry gần nhất (None nếu không còn URL chờ retry)"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT MIN(next_retry_at) FROM product_urls WHERE status = ?', (FAILED,)
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - now)
+
+    # ---------- Thống kê / dọn dẹp ----------
+
+    def get_statistics(self):
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT status, COUNT(*) FROM product_urls GROUP BY status'
+            ).fetchall()
+        return dict(rows)
+
+    def reset(self):
+        """Xoá toàn bộ tiến độ (bắt đầu lần chạy mới)"""
+        with self._lock:
+            self.conn.execute('DELETE FROM product_urls')
+            self.conn.execute('DELETE FROM listing_pages')
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
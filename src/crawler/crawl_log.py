@@ -0,0 +1,325 @@
+"""
+CRAWL LOG - GHI LẠI THỜI GIAN TỪNG GIAI ĐOẠN THU THẬP VÀO POSTGRESQL
+    crawl_log        : 1 dòng / lần chạy (theo table_designs/08_crawl_log.xlsx + engine, retry, bytes)
+    crawl_log_event  : 1 dòng / trang (danh mục hoặc sản phẩm) với thời gian từng giai đoạn:
+                       navigate (tải trang), wait (chờ render), extract (lấy dữ liệu)
+                       + 1 dòng / lô ghi staging_books (page_type 'batch'): insert_ms, row_count
+
+Cách đo (không cần truyền tham số qua các hàm fetch):
+    logger.begin('product', url)       # mở bản ghi của luồng hiện tại
+    with stage('navigate'): ...        # cộng thời gian vào giai đoạn tương ứng (no-op nếu chưa begin)
+    add_bytes(len(response.content))
+    logger.end(success=True)           # đưa vào hàng đợi, luồng nền ghi theo lô
+    record = logger.detach()           # trang xử lý tiếp ở luồng khác: logger.attach(record) rồi end(...)
+    logger.log_batch(rows, ms)         # StagingWriter.flush: thời gian ghi thật của 1 lô (add() chỉ vào buffer)
+
+Báo cáo p50/p95 từng giai đoạn: python crawl_log.py [log_id]
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import acquire, get_cursor, release
+
+LOG_DB = 'dw'
+
+LISTING = 'listing'
+PRODUCT = 'product'
+BATCH = 'batch'
+
+STAGES = ['navigate', 'wait', 'extract', 'insert']
+
+EVENT_COLUMNS = ['log_id', 'event_time', 'page_type', 'url', 'attempt', 'success',
+                 'navigate_ms', 'wait_ms', 'extract_ms', 'insert_ms', 'total_ms',
+                 'bytes', 'error_message', 'row_count']
+
+CREATE_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS crawl_log (
+    log_id SERIAL PRIMARY KEY,
+    crawl_date DATE NOT NULL,
+    start_time TIMESTAMP NOT NULL,
+    end_time TIMESTAMP,
+    duration_seconds INTEGER,
+    category_crawled VARCHAR(100),
+    page_range VARCHAR(50),
+    engine VARCHAR(20),
+    total_found INTEGER DEFAULT 0,
+    total_inserted INTEGER DEFAULT 0,
+    total_updated INTEGER DEFAULT 0,
+    total_failed INTEGER DEFAULT 0,
+    total_retries INTEGER DEFAULT 0,
+    total_bytes BIGINT DEFAULT 0,
+    records_per_second DECIMAL(10,2),
+    avg_processing_time DECIMAL(10,2),
+    status VARCHAR(20) DEFAULT 'RUNNING',
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS crawl_log_event (
+    event_id BIGSERIAL PRIMARY KEY,
+    log_id INTEGER REFERENCES crawl_log(log_id),
+    event_time TIMESTAMP NOT NULL,
+    page_type VARCHAR(20),
+    url TEXT,
+    attempt INTEGER DEFAULT 1,
+    success BOOLEAN,
+    navigate_ms INTEGER,
+    wait_ms INTEGER,
+    extract_ms INTEGER,
+    insert_ms INTEGER,
+    total_ms INTEGER,
+    bytes INTEGER,
+    error_message TEXT
+);
+ALTER TABLE crawl_log_event ADD COLUMN IF NOT EXISTS row_count INTEGER;
+CREATE INDEX IF NOT EXISTS idx_crawl_log_event_log ON crawl_log_event(log_id, page_type);
+"""
+
+# Bản ghi đang đo của từng luồng (worker)
+_current = threading.local()
+
+@contextmanager
+def stage(name):
+    """Đo thời gian 1 giai đoạn, cộng dồn vào bản ghi đang mở của luồng hiện tại"""
+    record = getattr(_current, 'record', None)
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record[f'{name}_ms'] = record.get(f'{name}_ms', 0) + (time.perf_counter() - start) * 1000
+
+def add_bytes(n):
+    """Cộng số byte đã tải vào bản ghi đang mở"""
+    record = getattr(_current, 'record', None)
+    if record is not None and n:
+        record['bytes'] = record.get('bytes', 0) + int(n)
+
+class CrawlLogger:
+    """Ghi crawl_log / crawl_log_event không chặn luồng thu thập
+
+    - begin()/end() chỉ thao tác trên dict và queue (vài micro giây)
+    - luồng nền gom sự kiện, ghi bằng execute_values mỗi batch_size dòng hoặc flush_interval giây
+    - queue đầy (DB chậm) -> bỏ sự kiện và đếm dropped thay vì làm chậm crawler
+    """
+
+    def __init__(self, engine, category='', page_range='', batch_size=200,
+                 flush_interval=5.0, max_queue=10000):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.start_time = datetime.now()
+        self.dropped = 0
+        self._counts = {'found': 0, 'inserted': 0, 'updated': 0, 'failed': 0,
+                        'retries': 0, 'bytes': 0, 'product_ms': 0.0}
+        self._counts_lock = threading.Lock()
+
+        with get_cursor(LOG_DB) as cur:
+            cur.execute(CREATE_TABLES_SQL)
+            cur.execute('''
+                INSERT INTO crawl_log (crawl_date, start_time, category_crawled, page_range, engine)
+                VALUES (%s, %s, %s, %s, %s) RETURNING log_id
+            ''', (self.start_time.date(), self.start_time, category[:100], page_range[:50], engine))
+            self.log_id = cur.fetchone()[0]
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name='crawl-log-writer')
+        self._writer.start()
+
+    # ---------- Đo từng trang ----------
+
+    def begin(self, page_type, url, attempt=1):
+        """Mở bản ghi cho trang đang xử lý ở luồng hiện tại"""
+        _current.record = {'page_type': page_type, 'url': url, 'attempt': attempt,
+                           'start': time.perf_counter()}
+
+    def detach(self):
+        """Lấy bản ghi đang mở ra khỏi luồng hiện tại (trang được xử lý tiếp ở luồng khác)"""
+        record = getattr(_current, 'record', None)
+        _current.record = None
+        return record
+
+    def attach(self, record):
+        """Tiếp tục bản ghi đã detach ở luồng hiện tại (None -> không có bản ghi mở)"""
+        _current.record = record
+
+    def end(self, success, error=None, found=0, page_type=None):
+        """Đóng bản ghi của luồng hiện tại và đưa vào hàng đợi ghi
+        Không có begin, hoặc bản ghi đang mở khác page_type (nếu truyền) -> bỏ qua"""
+        record = getattr(_current, 'record', None)
+        if record is None or (page_type and record['page_type'] != page_type):
+            return
+        _current.record = None
+        total_ms = (time.perf_counter() - record['start']) * 1000
+
+        with self._counts_lock:
+            self._counts['found'] += found
+            self._counts['bytes'] += record.get('bytes', 0)
+            if record['attempt'] > 1:
+                self._counts['retries'] += 1
+            if record['page_type'] == PRODUCT:
+                self._counts['inserted' if success else 'failed'] += 1
+                self._counts['product_ms'] += total_ms
+
+        row = (self.log_id, datetime.now(), record['page_type'], record['url'], record['attempt'],
+               bool(success),
+               *(round(record[f'{s}_ms']) if f'{s}_ms' in record else None for s in STAGES),
+               round(total_ms), record.get('bytes'), str(error)[:500] if error else None, None)
+        self._enqueue(row)
+
+    def log_batch(self, rows, insert_ms, success=True, error=None):
+        """Ghi 1 lô staging_books (gọi từ StagingWriter.flush, luồng bất kỳ): thời gian ghi của cả lô"""
+        self._enqueue((self.log_id, datetime.now(), BATCH, None, 1, bool(success), None, None, None,
+                       round(insert_ms), round(insert_ms), None, str(error)[:500] if error else None, rows))
+
+    def _enqueue(self, row):
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def add_counts(self, **counts):
+        """Cộng thêm số liệu không gắn với 1 trang (vd. updated=snapshot ở chế độ refresh)"""
+        with self._counts_lock:
+            for key, value in counts.items():
+                self._counts[key] += value
+
+    # ---------- Ghi nền ----------
+
+    def _write_loop(self):
+        conn = None
+        stopping = False
+        while not stopping:
+            rows = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                rows.append(row)
+            if not rows:
+                continue
+            try:
+                if conn is None:
+                    conn = acquire(LOG_DB)
+                with conn.cursor() as cur:
+                    execute_values(cur, f"INSERT INTO crawl_log_event ({', '.join(EVENT_COLUMNS)}) VALUES %s",
+                                   rows, page_size=len(rows))
+                conn.commit()
+            except Exception as e:
+                print(f"    🔴 Lỗi ghi crawl_log_event ({len(rows)} dòng bị bỏ): {e}")
+                if conn is not None:
+                    release(conn, LOG_DB)
+                    conn = None
+        if conn is not None:
+            release(conn, LOG_DB)
+
+    def close(self, status=None, error_message=None):
+        """Ghi nốt sự kiện và cập nhật dòng crawl_log của lần chạy (SUCCESS / PARTIAL / FAILED)"""
+        self._queue.put(None)
+        self._writer.join()
+
+        end_time = datetime.now()
+        duration = (end_time - self.start_time).total_seconds()
+        with self._counts_lock:
+            counts = dict(self._counts)
+        done = counts['inserted'] + counts['updated']
+        if status is None:
+            if error_message or (counts['failed'] and not done):
+                status = 'FAILED'
+            elif counts['failed']:
+                status = 'PARTIAL'
+            else:
+                status = 'SUCCESS'
+        if self.dropped:
+            print(f"⚠️ crawl_log: bỏ {self.dropped} sự kiện do hàng đợi đầy")
+
+        with get_cursor(LOG_DB) as cur:
+            cur.execute('''
+                UPDATE crawl_log SET
+                    end_time = %s, duration_seconds = %s,
+                    total_found = %s, total_inserted = %s, total_updated = %s, total_failed = %s,
+                    total_retries = %s, total_bytes = %s,
+                    records_per_second = %s, avg_processing_time = %s,
+                    status = %s, error_message = %s
+                WHERE log_id = %s
+            ''', (end_time, int(duration),
+                  counts['found'], counts['inserted'], counts['updated'], counts['failed'],
+                  counts['retries'], counts['bytes'],
+                  round(done / duration, 2) if duration else 0,
+                  round(counts['product_ms'] / 1000 / (counts['inserted'] + counts['failed']), 2)
+                  if counts['inserted'] + counts['failed'] else 0,
+                  status, error_message, self.log_id))
+        return status
+
+# ---------- Báo cáo ----------
+
+STAGE_SUMMARY_SQL = """
+SELECT e.page_type, s.stage,
+       COUNT(s.ms) AS samples,
+       ROUND(percentile_cont(0.5) WITHIN GROUP (ORDER BY s.ms)::numeric) AS p50_ms,
+       ROUND(percentile_cont(0.95) WITHIN GROUP (ORDER BY s.ms)::numeric) AS p95_ms,
+       ROUND(SUM(s.ms) / 1000.0, 1) AS total_s
+FROM crawl_log_event e
+CROSS JOIN LATERAL (VALUES
+    (1, 'navigate', e.navigate_ms), (2, 'wait', e.wait_ms), (3, 'extract', e.extract_ms),
+    (4, 'insert', e.insert_ms), (5, 'total', e.total_ms)
+) AS s(ord, stage, ms)
+WHERE e.log_id = %s AND s.ms IS NOT NULL
+GROUP BY e.page_type, s.ord, s.stage
+ORDER BY e.page_type, s.ord
+"""
+
+def stage_summary(log_id=None):
+    """p50/p95 thời gian từng giai đoạn của 1 lần chạy (mặc định lần chạy gần nhất);
+    (None, []) nếu crawl_log trống / không có log_id"""
+    with get_cursor(LOG_DB, commit=False) as cur:
+        if log_id is None:
+            cur.execute('SELECT MAX(log_id) FROM crawl_log')
+            log_id = cur.fetchone()[0]
+        cur.execute('SELECT * FROM crawl_log WHERE log_id = %s', (log_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None, []
+        run = dict(zip([d[0] for d in cur.description], row))
+        cur.execute(STAGE_SUMMARY_SQL, (log_id,))
+        stages = cur.fetchall()
+        # Thời gian ghi staging chia đều cho mỗi dòng của các lô
+        cur.execute('SELECT SUM(insert_ms)::float / NULLIF(SUM(row_count), 0) FROM crawl_log_event '
+                    'WHERE log_id = %s AND page_type = %s', (log_id, BATCH))
+        run['insert_ms_per_row'] = cur.fetchone()[0]
+    return run, stages
+
+
+if __name__ == '__main__':
+    run, stages = stage_summary(int(sys.argv[1]) if len(sys.argv) > 1 else None)
+    if not run:
+        print("❌ Chưa có dữ liệu crawl_log")
+        sys.exit(1)
+    print(f"📋 CRAWL LOG #{run['log_id']} | {run['start_time']} | ⚙️ {run['engine']} | {run['status']}")
+    print(f"   ⏱️  {run['duration_seconds']}s | ✅ {run['total_inserted']} mới, 🔄 {run['total_updated']} cập nhật, "
+          f"❌ {run['total_failed']} lỗi, 🔁 {run['total_retries']} retry | 📦 {run['total_bytes'] or 0:,} bytes")
+    print(f"\n{'Loại trang':<10} {'Giai đoạn':<10} {'Mẫu':>6} {'p50 (ms)':>10} {'p95 (ms)':>10} {'Tổng (s)':>10}")
+    print("-" * 60)
+    for page_type, stage_name, samples, p50, p95, total_s in stages:
+        print(f"{page_type:<10} {stage_name:<10} {samples:>6} {p50:>10} {p95:>10} {total_s:>10}")
+    if run['insert_ms_per_row'] is not None:
+        print(f"\n💾 Ghi staging_books: {run['insert_ms_per_row']:.2f} ms / dòng (theo lô)")
@@ -0,0 +1,142 @@
+"""
+CRAWL SCHEDULER - ƯU TIÊN CẬP NHẬT SẢN PHẨM THAY ĐỔI NHANH
+Mọi sản phẩm đã biết (product_state + staging_books) được gán chu kỳ cập nhật theo tốc độ thay đổi
+trong lịch sử staging_books:
+    - lượt bán tăng nhanh / giá đổi thường xuyên -> chu kỳ ngắn (tối thiểu MIN_INTERVAL_HOURS)
+    - gần như không đổi -> chu kỳ dài (tối đa MAX_INTERVAL_HOURS)
+Mỗi lần chạy lấy các sản phẩm quá hạn nhiều nhất (giờ từ lần thu thập cuối / chu kỳ) bằng priority
+queue cho đến khi hết ngân sách request -> request dồn vào nơi dữ liệu thực sự thay đổi
+"""
+
+import heapq
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import get_cursor
+
+HISTORY_DAYS = 30             # cửa sổ lịch sử dùng để tính tốc độ
+MIN_INTERVAL_HOURS = 6
+MAX_INTERVAL_HOURS = 24 * 14
+DEFAULT_INTERVAL_HOURS = 72   # sản phẩm mới có < 2 lần thu thập, chưa tính được tốc độ
+# Chu kỳ = MAX_INTERVAL_HOURS / (1 + bán/ngày / SOLD_PER_DAY_REF + đổi giá/ngày / PRICE_CHANGES_PER_DAY_REF)
+# vd. 5 lượt bán/ngày -> còn 1/2 chu kỳ tối đa; đổi giá 1 lần/10 ngày cũng -> 1/2
+SOLD_PER_DAY_REF = 5.0
+PRICE_CHANGES_PER_DAY_REF = 0.1
+
+# Tốc độ trong HISTORY_DAYS ngày gần nhất, tính trên các dòng staging (1 dòng / lần dữ liệu thay đổi)
+VELOCITY_CTE = """
+WITH history AS (
+    SELECT url, time_collect, sold_count_numeric, discount_price,
+           LAG(discount_price) OVER (PARTITION BY url ORDER BY time_collect) AS prev_price
+    FROM staging_books
+    WHERE url IS NOT NULL AND time_collect >= NOW() - make_interval(days => %s)
+), velocity AS (
+    SELECT url,
+           MIN(time_collect) AS first_seen,
+           MAX(time_collect) AS last_collected,
+           COUNT(*) AS observations,
+           MAX(sold_count_numeric) - MIN(sold_count_numeric) AS sold_delta,
+           COUNT(*) FILTER (WHERE prev_price IS NOT NULL AND discount_price <> prev_price) AS price_changes
+    FROM history
+    GROUP BY url
+)
+"""
+
+VELOCITY_SQL = VELOCITY_CTE + """
+SELECT url, first_seen, last_collected, observations, sold_delta, price_changes, NULL::timestamp
+FROM velocity
+"""
+
+# Ứng viên = mọi sản phẩm đã biết trong product_state (sản phẩm không đổi chỉ có heartbeat, không có dòng
+# staging mới - vẫn phải được cập nhật định kỳ) + sản phẩm chỉ có trong staging; ghép tốc độ nếu có
+CANDIDATES_SQL = VELOCITY_CTE + """
+SELECT COALESCE(ps.url, v.url), v.first_seen, v.last_collected, COALESCE(v.observations, 0),
+       v.sold_delta, COALESCE(v.price_changes, 0), ps.last_seen
+FROM product_state ps
+FULL JOIN velocity v ON v.url = ps.url
+"""
+
+def refresh_interval_hours(sold_per_day, price_changes_per_day):
+    """Chu kỳ cập nhật (giờ) theo tốc độ bán và tốc độ đổi giá"""
+    speed = sold_per_day / SOLD_PER_DAY_REF + price_changes_per_day / PRICE_CHANGES_PER_DAY_REF
+    return max(MIN_INTERVAL_HOURS, MAX_INTERVAL_HOURS / (1 + speed))
+
+def load_product_velocity(history_days=HISTORY_DAYS):
+    """url -> {sold_per_day, price_changes_per_day, interval_hours, last_seen}"""
+    with get_cursor('staging', commit=False) as cur:
+        cur.execute("SELECT to_regclass('product_state') IS NOT NULL")
+        has_state = cur.fetchone()[0]
+        cur.execute(CANDIDATES_SQL if has_state else VELOCITY_SQL, (history_days,))
+        rows = cur.fetchall()
+
+    products = {}
+    for url, first_seen, last_collected, observations, sold_delta, price_changes, last_seen in rows:
+        if observations == 0:
+            # Không có thay đổi nào trong HISTORY_DAYS ngày -> sản phẩm chậm nhất, chu kỳ tối đa
+            sold_per_day = price_changes_per_day = 0.0
+            interval = refresh_interval_hours(0.0, 0.0)
+        elif observations < 2 or last_collected <= first_seen:
+            sold_per_day = price_changes_per_day = 0.0
+            interval = DEFAULT_INTERVAL_HOURS
+        else:
+            days = (last_collected - first_seen).total_seconds() / 86400
+            sold_per_day = max(sold_delta or 0, 0) / days
+            price_changes_per_day = price_changes / days
+            interval = refresh_interval_hours(sold_per_day, price_changes_per_day)
+        products[url] = {
+            'sold_per_day': round(sold_per_day, 2),
+            'price_changes_per_day': round(price_changes_per_day, 3),
+            'interval_hours': round(interval, 1),
+            # Heartbeat của change detector: lần thấy gần nhất, kể cả khi dữ liệu không đổi
+            'last_seen': max((t for t in (last_collected, last_seen) if t is not None), default=datetime.min),
+        }
+    return products
+
+def build_crawl_plan(budget, products=None, now=None):
+    """Chọn tối đa budget URL quá hạn, quá hạn nhiều nhất trước
+
+    Độ ưu tiên = số giờ từ lần thu thập cuối / chu kỳ cập nhật; chỉ lấy sản phẩm có ưu tiên >= 1.
+    """
+    products = products if products is not None else load_product_velocity()
+    now = now or datetime.now()
+    heap = []
+    for url, info in products.items():
+        age_hours = (now - info['last_seen']).total_seconds() / 3600
+        priority = age_hours / info['interval_hours']
+        if priority >= 1:
+            heap.append((-priority, url))
+    heapq.heapify(heap)
+    plan = []
+    while heap and len(plan) < budget:
+        _, url = heapq.heappop(heap)
+        plan.append(url)
+    return plan, len(heap) + len(plan)
+
+def summarize(products):
+    """Phân bố chu kỳ cập nhật (để in báo cáo)"""
+    buckets = {'<= 12h': 0, '<= 2 ngày': 0, '<= 7 ngày': 0, '> 7 ngày': 0}
+    for info in products.values():
+        hours = info['interval_hours']
+        if hours <= 12:
+            buckets['<= 12h'] += 1
+        elif hours <= 48:
+            buckets['<= 2 ngày'] += 1
+        elif hours <= 168:
+            buckets['<= 7 ngày'] += 1
+        else:
+            buckets['> 7 ngày'] += 1
+    return buckets
+
+
+if __name__ == '__main__':
+    BUDGET = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    products = load_product_velocity()
+    plan, due = build_crawl_plan(BUDGET, products)
+    print(f"📈 {len(products)} sản phẩm | chu kỳ cập nhật: {summarize(products)}")
+    print(f"🗓️ {due} sản phẩm đến hạn, kế hoạch lần chạy này: {len(plan)}/{BUDGET} request")
+    fastest = sorted(products.items(), key=lambda kv: kv[1]['interval_hours'])[:10]
+    for url, info in fastest:
+        print(f"   ⚡ {info['interval_hours']:>6}h | bán {info['sold_per_day']}/ngày | "
+              f"đổi giá {info['price_changes_per_day']}/ngày | {url}")
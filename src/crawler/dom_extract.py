@@ -0,0 +1,137 @@
+"""
+DOM EXTRACT - LẤY TOÀN BỘ TRƯỜNG TRONG 1 LẦN GỌI JAVASCRIPT
+Thay ~30 lần gọi WebDriver (find_element, .text, get_attribute) bằng 1 lần execute_script
+JS trả về cùng dict thô như book_parser.extract_raw_lxml, Python chỉ hậu xử lý bằng build_book
+"""
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from book_parser import PRICE_FALLBACK_SELECTORS, build_book
+from crawl_log import add_bytes, stage
+from html_cache import cache_enabled, cache_page, stamp_time_collect
+
+# Trang sẵn sàng khi đã có title và ít nhất 1 vùng giá/thông số mà ta cần
+# (không chờ cả trang load xong như WebDriverWait(h1) + sleep)
+READY_JS = """
+if (!document.querySelector('h1')) return false;
+return !!(document.querySelector('span.price[id^="product-price-"]')
+          || document.querySelector('.product-view-sa-supplier')
+          || document.querySelector('th')
+          || document.readyState === 'complete');
+"""
+
+# Số byte tải về của document chính + mọi tài nguyên đã tải tới lúc gọi (ảnh, CSS, JS, font, ...)
+# theo Navigation / Resource Timing API, 0 nếu trình duyệt không hỗ trợ
+TRANSFER_SIZE_JS = """
+const entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+return entries.reduce((total, e) => total + (e.transferSize || e.encodedBodySize || 0), 0);
+"""
+
+EXTRACT_BOOK_JS = """
+const norm = (s) => (s || '').replace(/\\s+/g, ' ').trim();
+const text = (el) => el ? norm(el.innerText !== undefined ? el.innerText : el.textContent) : null;
+const first = (sel, root) => (root || document).querySelector(sel);
+const xpathAll = (xp) => {
+    const snap = document.evaluate(xp, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const out = [];
+    for (let i = 0; i < snap.snapshotLength; i++) out.push(snap.snapshotItem(i));
+    return out;
+};
+const raw = {};
+
+// Bảng thông số: [th, text div đầu tiên, text cả ô td]
+raw.spec = [];
+document.querySelectorAll('th').forEach((th) => {
+    let td = th.nextElementSibling;
+    while (td && td.tagName !== 'TD') td = td.nextElementSibling;
+    if (!td) return;
+    const div = td.querySelector('div');
+    raw.spec.push([text(th), div ? text(div) : '', text(td)]);
+});
+
+const crumbs = Array.from(document.querySelectorAll('.breadcrumb li a'));
+raw.breadcrumbs = crumbs.map(text);
+raw.breadcrumb_urls = crumbs.map((a) => a.getAttribute('href') || '');
+raw.title = text(first('h1'));
+
+// Cách 1: element có chữ "đ" - lọc sẵn text có >= 2 chữ số, giới hạn số lượng trả về
+raw.price_texts = [];
+for (const el of xpathAll("//body//*[contains(text(), 'đ')]")) {
+    const t = text(el);
+    if (/\\d{2,}/.test(t)) raw.price_texts.push(t);
+    if (raw.price_texts.length >= 50) break;
+}
+
+// Cách 2: selector dự phòng (cùng thứ tự với book_parser.PRICE_FALLBACK_SELECTORS)
+raw.fallback_prices = arguments[0].map((sel) => {
+    const el = first(sel);
+    if (!el) return null;
+    return text(el) || el.getAttribute('data-price') || '';
+});
+
+const cur = first('span.price[id^="product-price-"]');
+const old = first('span.price[id^="old-price-"]');
+const pct = first('span.discount-percent');
+raw.current_price = cur ? text(cur) : null;
+raw.old_price = old ? text(old) : null;
+raw.discount_percent = pct ? text(pct) : null;
+
+raw.supplier_blocks = Array.from(document.querySelectorAll('div.product-view-sa-supplier')).map((div) => ({
+    spans: Array.from(div.querySelectorAll('span')).map(text),
+    links: Array.from(div.querySelectorAll('a')).map(text),
+    text: text(div),
+}));
+
+const img = first('img.fhs-p-img');
+raw.img_src = img ? img.getAttribute('src') : null;
+raw.img_data_src = img ? img.getAttribute('data-src') : null;
+
+const rating = xpathAll("//div[./span[contains(text(), '/5')]]")[0];
+raw.rating_text = rating ? text(rating) : null;
+const ratingBox = first('.rating-box .rating');
+raw.rating_style = ratingBox ? ratingBox.getAttribute('style') : null;
+
+const sold = first('div.product-view-qty-num');
+raw.sold_text = sold ? text(sold) : null;
+
+return raw;
+"""
+
+def wait_until_ready(driver, timeout=10):
+    """Chờ đến khi các selector cần thiết xuất hiện"""
+    WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+        lambda d: d.execute_script(READY_JS)
+    )
+
+def extract_raw_js(driver):
+    """1 round trip: chạy EXTRACT_BOOK_JS, trả về dict thô"""
+    return driver.execute_script(EXTRACT_BOOK_JS, PRICE_FALLBACK_SELECTORS)
+
+def page_transfer_size(driver):
+    """Số byte của trang vừa tải, gồm tài nguyên con (ước lượng cho crawl_log - Resource Timing:
+    tài nguyên khác origin không có Timing-Allow-Origin, vd. ảnh cdn1.fahasa.com, tính 0 byte;
+    số byte chính xác: compare_lean_profile.py đọc performance log của DevTools)"""
+    try:
+        return driver.execute_script(TRANSFER_SIZE_JS) or 0
+    except Exception:
+        return 0
+
+def get_book_details_js(driver, url):
+    """Lấy chi tiết sách bằng 1 lần execute_script (cùng đầu ra với get_book_details)"""
+    with stage('navigate'):
+        driver.get(url)  # lỗi tải trang được raise cho rate limiter
+    add_bytes(page_transfer_size(driver))
+    try:
+        try:
+            with stage('wait'):
+                wait_until_ready(driver)
+        except TimeoutException:
+            pass  # vẫn thử lấy dữ liệu - build_book sẽ trả None nếu thiếu title/giá
+        fetched_at = cache_page(url, driver.page_source) if cache_enabled() else None
+        with stage('extract'):
+            book = build_book(extract_raw_js(driver), url)
+        return stamp_time_collect(book, fetched_at)
+    except Exception as e:
+        print(f"    ❌ Lỗi khi lấy chi tiết: {e}")
+        return None
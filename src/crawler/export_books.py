@@ -0,0 +1,67 @@
+"""
+EXPORT BOOKS - XUẤT EXCEL/CSV TỪ OUTPUT STORE (CHẠY KHI CẦN)
+Đọc các file JSONL theo manifest, giữ bản ghi mới nhất của mỗi URL và xuất ra Excel hoặc CSV
+Không còn chạy sau mỗi lần thu thập như trước
+"""
+
+import csv
+import os
+
+import pandas as pd
+
+from book_parser import new_book
+from output_store import DEFAULT_OUTPUT_DIR, import_legacy_json, iter_books, read_manifest
+
+BOOK_COLUMNS = list(new_book('').keys())
+
+def latest_books(root=DEFAULT_OUTPUT_DIR, since=None, until=None):
+    """Bản ghi mới nhất của mỗi URL (các lần chạy sau ghi đè lần chạy trước)"""
+    latest = {}
+    for book in iter_books(root, since, until):
+        latest[book.get('url', '')] = book
+    return list(latest.values())
+
+def export_csv(output_file, root=DEFAULT_OUTPUT_DIR, since=None, until=None, latest_only=True):
+    """Xuất CSV; latest_only=False ghi nối tiếp mọi dòng (bộ nhớ không phụ thuộc lịch sử)"""
+    rows = latest_books(root, since, until) if latest_only else iter_books(root, since, until)
+    count = 0
+    with open(output_file, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=BOOK_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for book in rows:
+            writer.writerow(book)
+            count += 1
+    return count
+
+def export_excel(output_file, root=DEFAULT_OUTPUT_DIR, since=None, until=None):
+    """Xuất Excel (bản ghi mới nhất của mỗi URL)"""
+    df = pd.DataFrame(latest_books(root, since, until))
+    df = df.reindex(columns=BOOK_COLUMNS + [c for c in df.columns if c not in BOOK_COLUMNS])
+    df.to_excel(output_file, index=False, engine='openpyxl')
+    return len(df)
+
+
+if __name__ == "__main__":
+    # CẤU HÌNH XUẤT
+    OUTPUT_DIR = DEFAULT_OUTPUT_DIR
+    LEGACY_JSON = 'fahasa_all_books.json'  # dữ liệu cũ trước khi có output store
+    SINCE = None  # 'YYYY-MM-DD' hoặc None
+    UNTIL = None
+
+    if not read_manifest(OUTPUT_DIR) and os.path.exists(LEGACY_JSON):
+        entry = import_legacy_json(LEGACY_JSON, OUTPUT_DIR)
+        if entry:
+            print(f"📂 Đã chuyển {entry['rows']} sách từ {LEGACY_JSON} vào {OUTPUT_DIR}/")
+
+    runs = read_manifest(OUTPUT_DIR)
+    print(f"📂 Output store: {len(runs)} lần chạy, {sum(r['rows'] for r in runs)} dòng")
+
+    choice = input("💾 Xuất (1) Excel, (2) CSV: ").strip()
+    if choice == '1':
+        n = export_excel('fahasa_all_books.xlsx', OUTPUT_DIR, SINCE, UNTIL)
+        print(f"✅ Đã xuất {n} sách: fahasa_all_books.xlsx")
+    elif choice == '2':
+        n = export_csv('fahasa_all_books.csv', OUTPUT_DIR, SINCE, UNTIL)
+        print(f"✅ Đã xuất {n} sách: fahasa_all_books.csv")
+    else:
+        print("❌ Hủy bỏ")
@@ -7,487 +7,911 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 import time
-import random
-import json
-import pandas as pd
 from datetime import datetime
-import json
 import re
 import os
-from insert_staging_book import insert_book_staging
+import sys
+from insert_staging_book import StagingWriter, load_known_products
+from change_detector import ChangeDetector
+from crawl_scheduler import build_crawl_plan
+from book_parser import build_snapshot, extract_price_smart, needs_detail, new_book, parse_listing_cards
+from dom_extract import get_book_details_js, page_transfer_size
+from crawl_log import LISTING, PRODUCT, CrawlLogger, add_bytes, stage
+from html_cache import HtmlCache, cache_enabled, cache_page, capture_page, set_active_cache, stamp_time_collect
+from crawl_frontier import CrawlFrontier, DONE, FAILED, PENDING
+from rate_limiter import AdaptiveRateLimiter
+from http_engine import (create_http_session, fetch_book_page_http, fetch_html, get_book_details_http,
+                         get_listing_cards_http, get_product_urls_http)
+from category_tree import (DEFAULT_TREE_PATH, DEFAULT_TTL_HOURS, leaf_categories, load_category_tree,
+                           resolve_categories, use_tree_path)
+from seen_index import SeenIndex
+from output_store import DEFAULT_OUTPUT_DIR, RunWriter
+from worker_pool import BrowserWorkerPool, close_client
+from fetch_pipeline import FetchParsePipeline
+from browser_service import cached_driver_path, connect_leased_driver
+from session_manager import ManagedSession
+from lean_browser import PERFORMANCE_LOG_PREFS, create_lean_driver
 
-def extract_price_smart(price_text):
-    """Trích xuất giá thông minh"""
-    try:
-        if not price_text:
-            return 0.0
-        
-        clean_text = re.sub(r'[^\d,.]', '', str(price_text))
-        clean_text = clean_text.replace(',', '').replace('.', '')
-        
-        if clean_text and clean_text.isdigit():
-            price = float(clean_text)
-            if price < 1000:
-                price *= 1000
-            return price if price >= 1000 else 0.0
-        return 0.0
-    except:
-        return 0.0
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.url_utils import canonicalize_url
 
 def get_book_details(driver, url):
     """Lấy chi tiết sách từ URL"""
+    with stage('navigate'):
+        driver.get(url)  # lỗi tải trang (timeout, mất kết nối) được raise cho rate limiter
+    add_bytes(page_transfer_size(driver))
     try:
-        driver.get(url)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "h1"))
-        )
-        # Khởi tạo dữ liệu
-        book = {
-            'title': '',
-            'author': '',
-            'publisher': '',
-            'supplier': '',
-            'category_1': 'Sách trong nước',
-            'category_2': '',
-            'category_3': '',
-            'original_price': 0.0,
-            'discount_price': 0.0,
-            'discount_percent': 0.0,
-            'rating': 0.0,
-            'rating_count': 0,
-            'sold_count': '',
-            'sold_count_numeric': 0,
-            'publish_year': 0,
-            'language': 'Tiếng Việt',
-            'page_count': 0,
-            'weight': 0.0,
-            'dimensions': '',
-            'url': url,
-            'url_img': '',
-            'time_collect': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        # Publish year
-        try:
-            year_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Năm XB')]/following-sibling::td")
-            divs = year_elem.find_elements(By.TAG_NAME, 'div')
-            year_text = ''
-            if divs and divs[0].text.strip():
-                year_text = divs[0].text.strip()
-            elif year_elem.text.strip():
-                year_text = year_elem.text.strip()
-            if year_text.isdigit():
-                book['publish_year'] = int(year_text)
-        except:
-            pass
-        # Weight
-        try:
-            weight_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Trọng lượng')]/following-sibling::td")
-            divs = weight_elem.find_elements(By.TAG_NAME, 'div')
-            weight_text = ''
-            if divs and divs[0].text.strip():
-                weight_text = divs[0].text.strip()
-            elif weight_elem.text.strip():
-                weight_text = weight_elem.text.strip()
-            weight_val = re.sub(r'[^\d.]', '', weight_text)
-            if weight_val:
-                weight_gram = float(weight_val)
-                if weight_gram > 10:
-                    book['weight'] = round(weight_gram / 1000, 3)
-                else:
-                    book['weight'] = weight_gram
-        except:
-            pass
-        # Dimensions
-        try:
-            dim_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Kích Thước Bao Bì')]/following-sibling::td")
-            divs = dim_elem.find_elements(By.TAG_NAME, 'div')
-            if divs and divs[0].text.strip():
-                book['dimensions'] = divs[0].text.strip()
-            elif dim_elem.text.strip():
-                book['dimensions'] = dim_elem.text.strip()
-        except:
-            pass
-        # Page count
-        try:
-            page_count_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Số trang')]/following-sibling::td")
-            divs = page_count_elem.find_elements(By.TAG_NAME, 'div')
-            if divs and divs[0].text.strip().isdigit():
-                book['page_count'] = int(divs[0].text.strip())
-            elif page_count_elem.text.strip().isdigit():
-                book['page_count'] = int(page_count_elem.text.strip())
-        except:
-            pass
-        
-        # Lấy breadcrumb (category)
-        try:
-            breadcrumbs = driver.find_elements(By.CSS_SELECTOR, '.breadcrumb li a')
-            if len(breadcrumbs) >= 2:
-                book['category_2'] = breadcrumbs[1].text.strip() if len(breadcrumbs) > 1 else ''
-                if len(breadcrumbs) == 4:
-                    # Ghép mục 3 và 4
-                    book['category_3'] = f"{breadcrumbs[2].text.strip()} - {breadcrumbs[3].text.strip()}"
-                elif len(breadcrumbs) > 2:
-                    book['category_3'] = breadcrumbs[2].text.strip()
-        except:
-            pass
-        
-        # Lấy title
-        try:
-            title_elem = driver.find_element(By.TAG_NAME, 'h1')
-            book['title'] = title_elem.text.strip()
-        except:
-            return None
-        
-        # Lấy giá - thử nhiều cách
-        price_found = False
-        
-        # Cách 1: Tìm trong element có chữ "đ"
-        try:
-            price_elements = driver.find_elements(By.XPATH, "//*[contains(text(), 'đ')]")
-            for elem in price_elements:
-                text = elem.text.strip()
-                if re.search(r'\d{2,}', text):  # Có ít nhất 2 chữ số
-                    price = extract_price_smart(text)
-                    if price > 0:
-                        book['discount_price'] = price
-                        book['original_price'] = price
-                        price_found = True
-                        break
-        except:
-            pass
-        
-        # Cách 2: Tìm trong CSS selector
-        if not price_found:
-            selectors = [
-                '.price-original .price',
-                '.price .current-price', 
-                '.product-price .price',
-                '[data-price]',
-                '.price-box .price'
-            ]
-            
-            for selector in selectors:
-                try:
-                    elem = driver.find_element(By.CSS_SELECTOR, selector)
-                    text = elem.text.strip() or elem.get_attribute('data-price') or ''
-                    price = extract_price_smart(text)
-                    if price > 0:
-                        book['discount_price'] = price
-                        book['original_price'] = price
-                        price_found = True
-                        break
-                except:
-                    continue
-        
-        # Lấy giá hiện tại, giá gốc, phần trăm giảm giá
-        try:
-            # Giá hiện tại
-            price_elem = driver.find_element(By.CSS_SELECTOR, 'span.price[id^="product-price-"]')
-            price_text = price_elem.text.strip()
-            price_val = re.sub(r'[^\d.]', '', price_text)
-            if price_val:
-                book['discount_price'] = float(price_val.replace('.', ''))
-        except:
-            pass
-        try:
-            # Giá gốc
-            old_price_elem = driver.find_element(By.CSS_SELECTOR, 'span.price[id^="old-price-"]')
-            old_price_text = old_price_elem.text.strip()
-            old_price_val = re.sub(r'[^\d.]', '', old_price_text)
-            if old_price_val:
-                book['original_price'] = float(old_price_val.replace('.', ''))
-        except:
-            pass
-        try:
-            # Phần trăm giảm giá
-            percent_elem = driver.find_element(By.CSS_SELECTOR, 'span.discount-percent')
-            percent_text = percent_elem.text.strip()
-            percent_val = re.sub(r'[^\d-]', '', percent_text)
-            if percent_val:
-                book['discount_percent'] = float(percent_val)
-        except:
-            pass
+        with stage('wait'):
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.TAG_NAME, "h1"))
+            )
+        fetched_at = cache_page(url, driver.page_source) if cache_enabled() else None
+        with stage('extract'):
+            book = extract_book_selenium(driver, url)
+        return stamp_time_collect(book, fetched_at)
+    except Exception as e:
+        print(f"    ❌ Lỗi khi lấy chi tiết: {e}")
+        return None
 
-        # Lấy thông tin khác
-        try:
-            # Author
-            author_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Tác giả')]/following-sibling::td")
-            book['author'] = author_elem.text.strip()
-        except:
-            pass
+def fetch_book_page(driver, url):
+    """Chỉ tải trang chi tiết và lấy page_source, không parse (fetch pipeline): -> (html, fetched_at)"""
+    with stage('navigate'):
+        driver.get(url)
+    add_bytes(page_transfer_size(driver))
+    try:
+        with stage('wait'):
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.TAG_NAME, "h1"))
+            )
+    except TimeoutException:
+        pass  # vẫn lấy page_source - parser trả None nếu thiếu title/giá
+    html = driver.page_source
+    return html, capture_page(url, html)
 
-        # Publisher
-        try:
-            pub_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Nhà xuất bản')]/following-sibling::td")
-            book['publisher'] = pub_elem.text.strip()
-        except:
+def extract_book_selenium(driver, url):
+    """Lấy dữ liệu sách từ trang chi tiết đã tải xong (find_element từng trường)
+    reparse_cache.py không chạy lại hàm này - sửa selector ở đây thì sửa cả book_parser.extract_raw_lxml"""
+    # Khởi tạo dữ liệu
+    book = new_book(url)
+    # Publish year
+    try:
+        year_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Năm XB')]/following-sibling::td")
+        divs = year_elem.find_elements(By.TAG_NAME, 'div')
+        year_text = ''
+        if divs and divs[0].text.strip():
+            year_text = divs[0].text.strip()
+        elif year_elem.text.strip():
+            year_text = year_elem.text.strip()
+        if year_text.isdigit():
+            book['publish_year'] = int(year_text)
+    except:
+        pass
+    # Weight
+    try:
+        weight_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Trọng lượng')]/following-sibling::td")
+        divs = weight_elem.find_elements(By.TAG_NAME, 'div')
+        weight_text = ''
+        if divs and divs[0].text.strip():
+            weight_text = divs[0].text.strip()
+        elif weight_elem.text.strip():
+            weight_text = weight_elem.text.strip()
+        weight_val = re.sub(r'[^\d.]', '', weight_text)
+        if weight_val:
+            weight_gram = float(weight_val)
+            if weight_gram > 10:
+                book['weight'] = round(weight_gram / 1000, 3)
+            else:
+                book['weight'] = weight_gram
+    except:
+        pass
+    # Dimensions
+    try:
+        dim_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Kích Thước Bao Bì')]/following-sibling::td")
+        divs = dim_elem.find_elements(By.TAG_NAME, 'div')
+        if divs and divs[0].text.strip():
+            book['dimensions'] = divs[0].text.strip()
+        elif dim_elem.text.strip():
+            book['dimensions'] = dim_elem.text.strip()
+    except:
+        pass
+    # Page count
+    try:
+        page_count_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Số trang')]/following-sibling::td")
+        divs = page_count_elem.find_elements(By.TAG_NAME, 'div')
+        if divs and divs[0].text.strip().isdigit():
+            book['page_count'] = int(divs[0].text.strip())
+        elif page_count_elem.text.strip().isdigit():
+            book['page_count'] = int(page_count_elem.text.strip())
+    except:
+        pass
+    
+    # Lấy breadcrumb (category)
+    try:
+        breadcrumbs = driver.find_elements(By.CSS_SELECTOR, '.breadcrumb li a')
+        book['category_1'], book['category_2'], book['category_3'] = resolve_categories(
+            [a.text for a in breadcrumbs], [a.get_attribute('href') or '' for a in breadcrumbs], url)
+    except:
+        pass
+    
+    # Lấy title
+    try:
+        title_elem = driver.find_element(By.TAG_NAME, 'h1')
+        book['title'] = title_elem.text.strip()
+    except:
+        return None
+    
+    # Lấy giá - thử nhiều cách
+    price_found = False
+    
+    # Cách 1: Tìm trong element có chữ "đ"
+    try:
+        price_elements = driver.find_elements(By.XPATH, "//*[contains(text(), 'đ')]")
+        for elem in price_elements:
+            text = elem.text.strip()
+            if re.search(r'\d{2,}', text):  # Có ít nhất 2 chữ số
+                price = extract_price_smart(text)
+                if price > 0:
+                    book['discount_price'] = price
+                    book['original_price'] = price
+                    price_found = True
+                    break
+    except:
+        pass
+    
+    # Cách 2: Tìm trong CSS selector
+    if not price_found:
+        selectors = [
+            '.price-original .price',
+            '.price .current-price', 
+            '.product-price .price',
+            '[data-price]',
+            '.price-box .price'
+        ]
+        
+        for selector in selectors:
             try:
-                pub_div = driver.find_element(By.CSS_SELECTOR, 'div.product-view-sa-supplier')
-                spans = pub_div.find_elements(By.TAG_NAME, 'span')
-                if len(spans) >= 2 and 'Nhà xuất bản' in spans[0].text:
-                    book['publisher'] = spans[1].text.strip()
+                elem = driver.find_element(By.CSS_SELECTOR, selector)
+                text = elem.text.strip() or elem.get_attribute('data-price') or ''
+                price = extract_price_smart(text)
+                if price > 0:
+                    book['discount_price'] = price
+                    book['original_price'] = price
+                    price_found = True
+                    break
             except:
-                pass
+                continue
+    
+    # Lấy giá hiện tại, giá gốc, phần trăm giảm giá
+    try:
+        # Giá hiện tại
+        price_elem = driver.find_element(By.CSS_SELECTOR, 'span.price[id^="product-price-"]')
+        price_text = price_elem.text.strip()
+        price_val = re.sub(r'[^\d.]', '', price_text)
+        if price_val:
+            book['discount_price'] = float(price_val.replace('.', ''))
+    except:
+        pass
+    try:
+        # Giá gốc
+        old_price_elem = driver.find_element(By.CSS_SELECTOR, 'span.price[id^="old-price-"]')
+        old_price_text = old_price_elem.text.strip()
+        old_price_val = re.sub(r'[^\d.]', '', old_price_text)
+        if old_price_val:
+            book['original_price'] = float(old_price_val.replace('.', ''))
+    except:
+        pass
+    try:
+        # Phần trăm giảm giá
+        percent_elem = driver.find_element(By.CSS_SELECTOR, 'span.discount-percent')
+        percent_text = percent_elem.text.strip()
+        percent_val = re.sub(r'[^\d-]', '', percent_text)
+        if percent_val:
+            book['discount_percent'] = float(percent_val)
+    except:
+        pass
 
-        # Supplier
-        try:
-            sup_div = driver.find_element(By.CSS_SELECTOR, 'div.product-view-sa-supplier')
-            # Ưu tiên lấy supplier từ thẻ <a>
-            a_tags = sup_div.find_elements(By.TAG_NAME, 'a')
-            if a_tags:
-                supplier_text = a_tags[0].text.strip()
-                book['supplier'] = supplier_text
-            else:
-                # Nếu không có thẻ <a>, lấy text sau span
-                spans = sup_div.find_elements(By.TAG_NAME, 'span')
-                if len(spans) >= 2 and 'Nhà cung cấp' in spans[0].text:
-                    book['supplier'] = spans[1].text.strip()
-                else:
-                    # fallback: lấy toàn bộ text trừ label
-                    text = sup_div.text.replace('Nhà cung cấp:', '').strip()
-                    book['supplier'] = text
-        except:
-            pass
-        
-        # Lấy supplier (chỉ lấy text, không lấy link)
-        try:
-            sup_divs = driver.find_elements(By.CSS_SELECTOR, 'div.product-view-sa-supplier')
-            for div in sup_divs:
-                spans = div.find_elements(By.TAG_NAME, 'span')
-                if len(spans) >= 2:
-                    label = spans[0].text.strip().lower()
-                    value = spans[1].text.strip()
-                    if 'nhà cung cấp' in label:
-                        book['supplier'] = value
-                    elif 'nhà xuất bản' in label:
-                        book['publisher'] = value
-        except:
-            pass
+    # Lấy thông tin khác
+    try:
+        # Author
+        author_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Tác giả')]/following-sibling::td")
+        book['author'] = author_elem.text.strip()
+    except:
+        pass
 
-        # Lấy url_img (ưu tiên src, nếu không có thì lấy data-src)
+    # Publisher
+    try:
+        pub_elem = driver.find_element(By.XPATH, "//th[contains(text(), 'Nhà xuất bản')]/following-sibling::td")
+        book['publisher'] = pub_elem.text.strip()
+    except:
         try:
-            img_elem = driver.find_element(By.CSS_SELECTOR, 'img.fhs-p-img')
-            img_url = img_elem.get_attribute('src')
-            if not img_url or 'placeholder' in img_url:
-                img_url = img_elem.get_attribute('data-src')
-            book['url_img'] = img_url
+            pub_div = driver.find_element(By.CSS_SELECTOR, 'div.product-view-sa-supplier')
+            spans = pub_div.find_elements(By.TAG_NAME, 'span')
+            if len(spans) >= 2 and 'Nhà xuất bản' in spans[0].text:
+                book['publisher'] = spans[1].text.strip()
         except:
             pass
-        
-        # Lấy rating và rating_count
-        try:
-            # Lấy điểm rating, ví dụ: "5/5"
-            rating_elem = driver.find_element(By.XPATH, "//div[./span[contains(text(), '/5')]]")
-            rating_text = rating_elem.text.strip()
-            match = re.search(r'(\d+(?:[.,]\d+)?)(?=\s*/\s*5)', rating_text)
-            if match:
-                book['rating'] = float(match.group(1).replace(',', '.'))
+
+    # Supplier
+    try:
+        sup_div = driver.find_element(By.CSS_SELECTOR, 'div.product-view-sa-supplier')
+        # Ưu tiên lấy supplier từ thẻ <a>
+        a_tags = sup_div.find_elements(By.TAG_NAME, 'a')
+        if a_tags:
+            supplier_text = a_tags[0].text.strip()
+            book['supplier'] = supplier_text
+        else:
+            # Nếu không có thẻ <a>, lấy text sau span
+            spans = sup_div.find_elements(By.TAG_NAME, 'span')
+            if len(spans) >= 2 and 'Nhà cung cấp' in spans[0].text:
+                book['supplier'] = spans[1].text.strip()
             else:
-                # Nếu không có text, thử lấy width style trong .rating
-                rating_box = driver.find_element(By.CSS_SELECTOR, '.rating-box .rating')
-                style = rating_box.get_attribute('style')
-                width_match = re.search(r'width:\s*(\d+)%', style)
-                if width_match:
-                    percent = int(width_match.group(1))
-                    book['rating'] = round(percent / 20, 2)  # 100% = 5.0
-        except:
-            pass
-        
-        # Lấy số lượt bán (sold_count, sold_count_numeric)
-        try:
-            sold_elem = driver.find_element(By.CSS_SELECTOR, 'div.product-view-qty-num')
-            sold_text = sold_elem.text.strip()
-            # sold_text ví dụ: 'Đã bán 4' hoặc 'Đã bán 10k+'
-            match = re.search(r'Đã bán\s*([\d.,]+)(k\+)?', sold_text, re.IGNORECASE)
-            if match:
-                book['sold_count'] = match.group(1) + (match.group(2) if match.group(2) else '')
-                # Xử lý số lượt bán dạng số hoặc k+
-                if match.group(2):
-                    # vd: 10k+ => 10000
-                    num = float(match.group(1).replace(',', '.')) * 1000
-                    book['sold_count_numeric'] = int(num)
-                else:
-                    num = match.group(1).replace('.', '').replace(',', '')
-                    if num.isdigit():
-                        book['sold_count_numeric'] = int(num)
-        except:
-            pass
+                # fallback: lấy toàn bộ text trừ label
+                text = sup_div.text.replace('Nhà cung cấp:', '').strip()
+                book['supplier'] = text
+    except:
+        pass
+    
+    # Lấy supplier (chỉ lấy text, không lấy link)
+    try:
+        sup_divs = driver.find_elements(By.CSS_SELECTOR, 'div.product-view-sa-supplier')
+        for div in sup_divs:
+            spans = div.find_elements(By.TAG_NAME, 'span')
+            if len(spans) >= 2:
+                label = spans[0].text.strip().lower()
+                value = spans[1].text.strip()
+                if 'nhà cung cấp' in label:
+                    book['supplier'] = value
+                elif 'nhà xuất bản' in label:
+                    book['publisher'] = value
+    except:
+        pass
 
-        # Chỉ trả về nếu có giá
-        if price_found:
-            return book
+    # Lấy url_img (ưu tiên src, nếu không có thì lấy data-src)
+    try:
+        img_elem = driver.find_element(By.CSS_SELECTOR, 'img.fhs-p-img')
+        img_url = img_elem.get_attribute('src')
+        if not img_url or 'placeholder' in img_url:
+            img_url = img_elem.get_attribute('data-src')
+        book['url_img'] = img_url
+    except:
+        pass
+    
+    # Lấy rating và rating_count
+    try:
+        # Lấy điểm rating, ví dụ: "5/5"
+        rating_elem = driver.find_element(By.XPATH, "//div[./span[contains(text(), '/5')]]")
+        rating_text = rating_elem.text.strip()
+        match = re.search(r'(\d+(?:[.,]\d+)?)(?=\s*/\s*5)', rating_text)
+        if match:
+            book['rating'] = float(match.group(1).replace(',', '.'))
         else:
-            return None
-            
-    except Exception as e:
-        print(f"    ❌ Lỗi khi lấy chi tiết: {e}")
+            # Nếu không có text, thử lấy width style trong .rating
+            rating_box = driver.find_element(By.CSS_SELECTOR, '.rating-box .rating')
+            style = rating_box.get_attribute('style')
+            width_match = re.search(r'width:\s*(\d+)%', style)
+            if width_match:
+                percent = int(width_match.group(1))
+                book['rating'] = round(percent / 20, 2)  # 100% = 5.0
+    except:
+        pass
+    
+    # Lấy số lượt bán (sold_count, sold_count_numeric)
+    try:
+        sold_elem = driver.find_element(By.CSS_SELECTOR, 'div.product-view-qty-num')
+        sold_text = sold_elem.text.strip()
+        # sold_text ví dụ: 'Đã bán 4' hoặc 'Đã bán 10k+'
+        match = re.search(r'Đã bán\s*([\d.,]+)(k\+)?', sold_text, re.IGNORECASE)
+        if match:
+            book['sold_count'] = match.group(1) + (match.group(2) if match.group(2) else '')
+            # Xử lý số lượt bán dạng số hoặc k+
+            if match.group(2):
+                # vd: 10k+ => 10000
+                num = float(match.group(1).replace(',', '.')) * 1000
+                book['sold_count_numeric'] = int(num)
+            else:
+                num = match.group(1).replace('.', '').replace(',', '')
+                if num.isdigit():
+                    book['sold_count_numeric'] = int(num)
+    except:
+        pass
+
+    # Chỉ trả về nếu có giá
+    if price_found:
+        return book
+    else:
         return None
 
-def scrape_fahasa_bulk(max_pages=1, books_per_page=3):
-    """Thu thập Fahasa quy mô lớn với pagination"""
-    print("🚀 FAHASA BULK SCRAPER - THU THẬP QUY MÔ LỚN")
-    print("=" * 60)
-    print(f"📊 Mục tiêu: {max_pages} trang x {books_per_page} sách = tối đa {max_pages * books_per_page} sách")
-    print("=" * 60)
+def get_product_urls(driver, listing_url):
+    """Lấy danh sách URL sản phẩm của 1 trang danh mục (Selenium)"""
+    with stage('navigate'):
+        driver.get(listing_url)
+    add_bytes(page_transfer_size(driver))
+    
+    # Tìm tất cả sản phẩm trong trang
+    try:
+        with stage('wait'):
+            products = WebDriverWait(driver, 15).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, '.item-inner'))
+            )
+        print(f"📚 Tìm thấy {len(products)} sản phẩm trong trang")
+    except:
+        return []
     
-    # Chrome setup với multiple fallback options
+    # Lấy URL tất cả sản phẩm trong trang
+    product_urls = []
+    with stage('extract'):
+        for product in products:
+            try:
+                link = product.find_element(By.TAG_NAME, 'a')
+                url_product = link.get_attribute('href')
+                if url_product and 'flashsale' not in url_product.lower():
+                    product_urls.append(url_product)
+            except:
+                continue
+    return product_urls
+
+def get_listing_cards(driver, listing_url):
+    """Lấy thẻ sản phẩm (URL + giá, rating, lượt bán) của 1 trang danh mục (Selenium)"""
+    with stage('navigate'):
+        driver.get(listing_url)
+    add_bytes(page_transfer_size(driver))
+    try:
+        with stage('wait'):
+            WebDriverWait(driver, 15).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, '.item-inner'))
+            )
+    except:
+        return []
+    with stage('extract'):
+        return parse_listing_cards(driver.page_source, listing_url)
+
+def create_chrome_driver(performance_log=False):
+    """Khởi tạo ChromeDriver với nhiều phương án dự phòng
+    performance_log: bật performance log DevTools để đo byte (compare_lean_profile.py) - luôn tự khởi động
+    Chrome mới, không mượn Chrome đã ấm cache của browser service"""
+    # Method 0: mượn Chrome đang chạy sẵn của browser service (không phải khởi động trình duyệt)
+    driver = None if performance_log else connect_leased_driver()
+    if driver is not None:
+        print(f"🔥 Dùng Chrome của browser service (slot {driver.lease['slot']})")
+        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        driver.set_page_load_timeout(30)
+        return driver
+
     chrome_options = Options()
     chrome_options.add_argument('--no-sandbox')
     chrome_options.add_argument('--disable-dev-shm-usage')
     chrome_options.add_argument('--disable-blink-features=AutomationControlled')
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
     chrome_options.add_experimental_option('useAutomationExtension', False)
+    if performance_log:
+        chrome_options.set_capability('goog:loggingPrefs', PERFORMANCE_LOG_PREFS)
+
+    # Thử method 1: ChromeDriver đã cache (chỉ gọi ChromeDriverManager khi cache hết hạn)
+    try:
+        driver_path = cached_driver_path()
+        if not driver_path:
+            raise Exception("Chưa có chromedriver trong cache")
+        driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+    except Exception as e1:
+        print(f"⚠️ Method 1 failed: {str(e1)[:100]}...")
+
+        # Thử method 2: System PATH
+        try:
+            driver = webdriver.Chrome(options=chrome_options)
+        except Exception as e2:
+            print(f"⚠️ Method 2 failed: {str(e2)[:100]}...")
+            raise Exception("Không thể khởi tạo ChromeDriver")
+
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    driver.set_page_load_timeout(30)
+    return driver
+
+# Engine thu thập: (hàm tạo client, hàm lấy URL trang danh mục, hàm lấy thẻ sản phẩm trang danh mục,
+#                   hàm lấy chi tiết sách)
+# - selenium: Chrome thật, dùng cho trang cần JavaScript
+# - selenium_js: Chrome thật, lấy mọi trường trong 1 lần execute_script (nhanh hơn nhiều)
+# - selenium_lean: như selenium_js trên Chrome headless chặn ảnh/font/tracker (lean_browser.py)
+# - http: requests + lxml, không cần trình duyệt
+ENGINES = {
+    'selenium': (create_chrome_driver, get_product_urls, get_listing_cards, get_book_details),
+    'selenium_js': (create_chrome_driver, get_product_urls, get_listing_cards, get_book_details_js),
+    'selenium_lean': (create_lean_driver, get_product_urls, get_listing_cards, get_book_details_js),
+    'http': (create_http_session, get_product_urls_http, get_listing_cards_http, get_book_details_http),
+}
+
+# Chỉ tải trang chi tiết (không parse) - dùng cho FetchParsePipeline, parse bằng lxml ở process riêng
+PAGE_FETCHERS = {
+    'selenium': fetch_book_page,
+    'selenium_js': fetch_book_page,
+    'selenium_lean': fetch_book_page,
+    'http': fetch_book_page_http,
+}
+
+# Tạo lại trình duyệt sau SESSION_MAX_PAGES trang hoặc khi RSS vượt SESSION_MAX_RSS_MB (session_manager.py)
+SESSION_MAX_PAGES = 200
+SESSION_MAX_RSS_MB = 1500
+
+# Chờ tối đa bao lâu (giây) cho URL lỗi đến hạn retry trước khi kết thúc lần chạy;
+# URL chưa đến hạn được giữ lại trong frontier cho lần chạy sau
+MAX_RETRY_WAIT = 120
+
+CATEGORY_URL = "https://www.fahasa.com/sach-trong-nuoc.html"
+CATEGORY_NAME = "Sách trong nước"
+
+def listing_page_url(page, books_per_page, category_url=CATEGORY_URL):
+    """URL trang danh mục thứ page (sắp xếp theo lượt bán)"""
+    return f"{category_url}?order=num_orders&limit={books_per_page}&p={page}"
+
+def filter_new_urls(product_urls, seen):
+    """Chuẩn hoá URL, bỏ trùng trong trang và bỏ URL đã thu thập còn mới (seen index)"""
+    new_urls = []
+    page_urls = set()
+    for product_url in product_urls:
+        canonical = canonicalize_url(product_url)
+        if canonical in page_urls:
+            continue
+        page_urls.add(canonical)
+        if seen is not None and seen.is_fresh(canonical):
+            continue
+        new_urls.append(canonical)
+    return new_urls
+
+def scrape_fahasa_bulk(max_pages=1, books_per_page=3, num_workers=1, engine='selenium',
+                       resume=True, frontier_path='crawl_frontier.db',
+                       skip_seen=True, seen_path='seen_urls.tsv', fresh_hours=24, mode='full',
+                       output_dir=DEFAULT_OUTPUT_DIR, detect_changes=True,
+                       html_cache_dir='html_cache', parse_processes=0, category_url=CATEGORY_URL,
+                       category_name=CATEGORY_NAME, discover_categories=False,
+                       category_tree_path=DEFAULT_TREE_PATH, category_ttl_hours=DEFAULT_TTL_HOURS,
+                       landing_dir='landing'):
+    """Thu thập Fahasa quy mô lớn với pagination
+
+    num_workers > 1: chạy song song nhiều worker (BrowserWorkerPool) cho trang chi tiết;
+    tốc độ request của mọi worker do 1 AdaptiveRateLimiter dùng chung điều phối.
+    engine: 'selenium', 'selenium_js', 'selenium_lean' (Chrome) hoặc 'http' (requests + lxml) - xem ENGINES.
+    resume: tiếp tục từ frontier (SQLite) nếu lần chạy trước bị dừng; False = chạy lại từ đầu.
+    skip_seen: bỏ qua URL đã thu thập trong fresh_hours giờ gần nhất (seen index trên đĩa).
+    mode: 'full' - vào trang chi tiết của mọi sách;
+          'refresh' - lấy giá/rating/lượt bán từ thẻ ở trang danh mục cho sách đã có trong staging,
+          chỉ vào trang chi tiết cho sách mới hoặc thiếu thông tin tĩnh;
+          'scheduled' - không duyệt trang danh mục, cập nhật max_pages * books_per_page sản phẩm
+          quá hạn nhất theo chu kỳ tính từ tốc độ bán / đổi giá (crawl_scheduler.py).
+    output_dir: thư mục output store (JSONL theo ngày + manifest) - xem output_store.py.
+    detect_changes: chỉ ghi staging_books khi content hash của sách thay đổi (ChangeDetector).
+    html_cache_dir: lưu HTML trang chi tiết để parse lại offline (reparse_cache.py); None = tắt.
+    parse_processes > 0: tách tải trang và parse (FetchParsePipeline) - num_workers thread chỉ tải
+          page source, parse_processes process lxml parse song song; 0 = tải + parse trong cùng worker.
+    category_url / category_name: danh mục gốc cần thu thập.
+    discover_categories: khám phá cây danh mục con (category_tree.py, cache category_tree_path trong
+          category_ttl_hours giờ) rồi crawl xoay vòng từng danh mục lá - trang p của mọi danh mục
+          trước trang p + 1; max_pages tính cho mỗi danh mục. category_1/2/3 của mọi chế độ lấy tên theo
+          cây category_tree_path qua URL breadcrumb (resolve_categories), có cây hay không không phụ thuộc shard.
+    landing_dir: landing zone Parquet (nén zstd, chia thư mục theo ngày thu thập) - xem parquet_store.py;
+          None = tắt.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Engine không hợp lệ: {engine} (chọn: {', '.join(ENGINES)})")
+    if mode not in ('full', 'refresh', 'scheduled'):
+        raise ValueError(f"Mode không hợp lệ: {mode} (chọn: full, refresh, scheduled)")
+    create_client, fetch_listing, fetch_cards, fetch_book = ENGINES[engine]
+    use_tree_path(category_tree_path)  # parser (kể cả process con) gán category theo cùng 1 cây
+
+    def new_session():
+        """Client có quản lý vòng đời (mỗi worker / fetcher 1 session)"""
+        return ManagedSession(create_client, max_pages=SESSION_MAX_PAGES, max_rss_mb=SESSION_MAX_RSS_MB).start()
+
+    print("🚀 FAHASA BULK SCRAPER - THU THẬP QUY MÔ LỚN")
+    print("=" * 60)
+    print(f"📊 Mục tiêu: {max_pages} trang x {books_per_page} sách = tối đa {max_pages * books_per_page} sách"
+          f"{' / danh mục' if discover_categories else ''}")
+    print(f"👷 Số worker: {num_workers} | ⚙️ Engine: {engine} | 🔄 Mode: {mode}")
+    print("=" * 60)
     
-    # Thử setup ChromeDriver với error handling
-    driver = None
+    # Frontier: checkpoint sau mỗi sản phẩm để chạy tiếp khi bị dừng giữa chừng
+    frontier = CrawlFrontier(frontier_path)
+    if not resume:
+        frontier.reset()
+    elif frontier.has_progress():
+        print(f"♻️ Tiếp tục lần chạy trước: {frontier.get_statistics()}")
+
+    # Rate limiter dùng chung cho mọi worker (thay cho sleep ngẫu nhiên cố định)
+    limiter = AdaptiveRateLimiter(initial_rate=0.5, min_rate=0.1, max_rate=2.0)
+
+    # Seen index: URL (đã chuẩn hoá) thu thập gần đây, kiểm tra trước khi tải trang
+    seen = SeenIndex(seen_path, fresh_hours=fresh_hours) if skip_seen else None
+
+    # Chế độ refresh: sản phẩm đã biết (bản ghi mới nhất trong staging_books)
+    known_products = {}
+    if mode == 'refresh':
+        try:
+            for known_url, known_book in load_known_products().items():
+                known_book['url'] = canonicalize_url(known_url)
+                known_products[known_book['url']] = known_book
+            print(f"📚 Refresh: {len(known_products)} sản phẩm đã có trong staging_books")
+        except Exception as e:
+            print(f"⚠️ Không đọc được staging_books, mọi sách sẽ vào trang chi tiết: {e}")
+
+    # Ghi staging_books theo lô trên 1 kết nối (thay cho connect/insert từng sách)
     try:
-        print("🔧 Đang setup ChromeDriver...")
-        
-        # Thử method 1: ChromeDriverManager
+        staging_writer = StagingWriter(batch_size=100, flush_interval=10.0)
+    except Exception as e:
+        print(f"🔴 Không kết nối được staging_books, chỉ lưu ra file: {e}")
+        staging_writer = None
+
+    # Content hash từng sản phẩm: dữ liệu không đổi -> chỉ heartbeat, không thêm dòng staging
+    change_detector = None
+    if staging_writer and detect_changes:
         try:
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-        except Exception as e1:
-            print(f"⚠️ Method 1 failed: {str(e1)[:100]}...")
-            
-            # Thử method 2: System PATH
-            try:
-                driver = webdriver.Chrome(options=chrome_options)
-            except Exception as e2:
-                print(f"⚠️ Method 2 failed: {str(e2)[:100]}...")
-                raise Exception("Không thể khởi tạo ChromeDriver")
-        
-        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        driver.set_page_load_timeout(30)
-        print("✅ ChromeDriver setup thành công!")
+            change_detector = ChangeDetector()
+        except Exception as e:
+            print(f"⚠️ Không đọc được product_state, ghi staging mọi sách: {e}")
+
+    # Thời gian từng giai đoạn / trang -> crawl_log, crawl_log_event (ghi nền theo lô)
+    try:
+        crawl_logger = CrawlLogger(engine, category=category_url.rsplit('/', 1)[-1],
+                                   page_range=f"1-{max_pages}")
+    except Exception as e:
+        print(f"⚠️ Không ghi được crawl_log, bỏ qua instrumentation: {e}")
+        crawl_logger = None
+    if staging_writer:
+        staging_writer.crawl_logger = crawl_logger  # thời gian ghi staging đo theo lô trong flush()
+
+    # Kết quả ghi nối tiếp ra file JSONL của lần chạy này (xuất Excel: export_books.py)
+    run_writer = RunWriter(output_dir)
+    # Cùng dữ liệu, dạng cột có kiểu cho ETL / báo cáo đọc trực tiếp
+    landing_writer = None
+    if landing_dir:
+        from parquet_store import ParquetRunWriter  # pyarrow chỉ cần khi bật landing zone
+        landing_writer = ParquetRunWriter(landing_dir, run_id=run_writer.run_id)
+
+    # HTML thô của trang chi tiết -> sửa selector xong chỉ cần parse lại, không phải crawl lại
+    html_cache = HtmlCache(html_cache_dir) if html_cache_dir else None
+    set_active_cache(html_cache)
+
+    total_collected = 0
+    page_success = 0
+    run_status, run_error = None, None
+
+    # Danh mục (shard) đang crawl; URL sản phẩm -> shard để gán category và đếm tiến độ
+    shard = {'url': category_url, 'path': [category_name], 'collected': 0}
+    url_shards = {}
+
+    def assign_shard(urls):
+        for book_url in urls:
+            url_shards[book_url] = shard
+
+    def handle_book(book_url, book_data):
+        """Xử lý kết quả 1 sách (dùng chung cho chế độ tuần tự và worker pool)"""
+        nonlocal total_collected, page_success
+        book_shard = url_shards.get(book_url)
+        if book_data:
+            print(f"    ✅ {book_data['title'][:50]}...")
+            print(f"    💰 Giá: {book_data['discount_price']:,.0f} VNĐ")
+            if change_detector and not change_detector.check(book_url, book_data):
+                print("    💤 Không đổi so với lần trước, chỉ cập nhật heartbeat")
+            elif staging_writer:
+                try:
+                    staging_writer.add(book_data)
+                    print("    🟢 Đã đưa vào hàng đợi ghi staging_books (PostgreSQL)")
+                except Exception as e:
+                    print(f"    🔴 Lỗi insert staging_books: {e}")
+            run_writer.write(book_data)
+            if landing_writer:
+                landing_writer.write(book_data)
+            if crawl_logger:
+                crawl_logger.end(success=True, page_type=PRODUCT)
+            total_collected += 1
+            page_success += 1
+            if book_shard:
+                book_shard['collected'] += 1
+                del url_shards[book_url]  # chỉ giữ URL chưa xong -> bộ nhớ không tăng theo số sách
+            frontier.mark_done(book_url)
+            if seen is not None:
+                seen.add(book_url)
+        else:
+            if crawl_logger:
+                crawl_logger.end(success=False, error='Không lấy được dữ liệu hoặc không có giá',
+                                 page_type=PRODUCT)
+            status = frontier.mark_failed(book_url, 'Không lấy được dữ liệu hoặc không có giá')
+            print(f"    ❌ Không lấy được dữ liệu hoặc không có giá: {book_url} ({status})")
+
+    def fetch_book_limited(worker_session, book_url):
+        """Lấy chi tiết sách qua rate limiter; lỗi tải trang -> None
+        Bản ghi crawl_log mở ở đây được đóng trong handle_book (cùng luồng)"""
+        if crawl_logger:
+            crawl_logger.begin(PRODUCT, book_url, attempt=frontier.get_attempts(book_url) + 1)
+        try:
+            return limiter.call(worker_session.call, fetch_book, book_url)
+        except Exception as e:
+            print(f"    ❌ Lỗi tải trang: {str(e)[:100]}")
+            if crawl_logger:
+                crawl_logger.end(success=False, error=e, page_type=PRODUCT)
+            return None
+
+    # Pipeline: bản ghi crawl_log của trang đã tải, chờ kết quả parse (thread writer) để đóng
+    pending_records = {}
+
+    def fetch_page_limited(worker_session, book_url):
+        """Pipeline: chỉ tải trang qua rate limiter (parse ở process riêng); lỗi -> None
+        Tải được -> bản ghi crawl_log chuyển sang handle_parsed, đóng theo kết quả parse"""
+        if crawl_logger:
+            crawl_logger.begin(PRODUCT, book_url, attempt=frontier.get_attempts(book_url) + 1)
+        try:
+            page = limiter.call(worker_session.call, PAGE_FETCHERS[engine], book_url)
+        except Exception as e:
+            print(f"    ❌ Lỗi tải trang: {str(e)[:100]}")
+            if crawl_logger:
+                crawl_logger.end(success=False, error=e, page_type=PRODUCT)
+            return None
+        if crawl_logger:
+            pending_records[book_url] = crawl_logger.detach()
+        return page
+
+    def handle_parsed(book_url, book_data):
+        """Pipeline (thread writer): đóng bản ghi crawl_log của trang theo kết quả parse thật"""
+        if crawl_logger:
+            crawl_logger.attach(pending_records.pop(book_url, None))
+        handle_book(book_url, book_data)
+
+    def refresh_from_cards(cards):
+        """Chế độ refresh: ghi snapshot từ thẻ danh mục, trả về URL cần vào trang chi tiết"""
+        detail_urls = []
+        snapshots = 0
+        for card in cards:
+            card_url = canonicalize_url(card['url'])
+            if seen is not None and seen.is_fresh(card_url):
+                continue
+            known_book = known_products.get(card_url)
+            url_shards[card_url] = shard
+            snapshot = None if needs_detail(known_book) else build_snapshot(known_book, card)
+            if snapshot:
+                handle_book(card_url, snapshot)
+                snapshots += 1
+            else:
+                detail_urls.append(card_url)
+        if crawl_logger:
+            crawl_logger.add_counts(updated=snapshots)
+        print(f"⚡ Refresh: {snapshots} snapshot từ thẻ danh mục, {len(detail_urls)} sách cần vào trang chi tiết")
+        return detail_urls
+
+    def crawl_urls(urls, label):
+        """Thu thập danh sách URL sản phẩm (tuần tự hoặc qua worker pool)"""
+        if pool:
+            # Song song: đẩy toàn bộ URL vào hàng đợi chung của worker pool
+            for book_url in urls:
+                frontier.mark_in_flight(book_url)
+                pool.submit(book_url)
+            pool.join()
+        else:
+            for i, book_url in enumerate(urls, 1):
+                print(f"\n📖 Sách {i}/{len(urls)} ({label}):")
+                frontier.mark_in_flight(book_url)
+                book_data = fetch_book_limited(client, book_url)
+                handle_book(book_url, book_data)
+    
+    # Thử setup client (ChromeDriver / HTTP session) với error handling
+    client = None
+    pool = None
+    try:
+        print(f"🔧 Đang setup {engine}...")
+        client = new_session()
+        print(f"✅ {engine} setup thành công!")
+
+        if parse_processes > 0:
+            pool = FetchParsePipeline(new_session, fetch_page_limited,
+                                      lambda book_url, book, fid: handle_parsed(book_url, book),
+                                      num_fetchers=num_workers, num_parsers=parse_processes)
+            pool.start()
+        elif num_workers > 1:
+            pool = BrowserWorkerPool(new_session, fetch_book_limited, num_workers=num_workers,
+                                     delay_range=(0, 0), on_result=lambda book_url, book, wid: handle_book(book_url, book))
+            pool.start()
         
     except Exception as e:
-        print(f"❌ Lỗi ChromeDriver: {e}")
-        print("💡 Giải pháp:")
-        print("   1. Chạy: python quick_test.py (test không cần Chrome)")
-        print("   2. Restart máy tính và thử lại")
-        print("   3. Cập nhật Chrome browser")
-        print("   4. Kiểm tra antivirus không block chromedriver")
+        print(f"❌ Lỗi {engine}: {e}")
+        if engine != 'http':
+            print("💡 Giải pháp:")
+            print("   1. Chạy với engine='http' (không cần Chrome)")
+            print("   2. Restart máy tính và thử lại")
+            print("   3. Cập nhật Chrome browser")
+            print("   4. Kiểm tra antivirus không block chromedriver")
+        if client:
+            close_client(client)
+        if staging_writer:
+            staging_writer.close()
+        if crawl_logger:
+            crawl_logger.close(error_message=f"Lỗi {engine}: {e}")
+        run_writer.close()
+        if landing_writer:
+            landing_writer.close()
+        if html_cache:
+            set_active_cache(None)
+            html_cache.close()
+        frontier.close()
+        if seen is not None:
+            seen.close()
         return
     
-    books_data = []
-    total_collected = 0
-    
     try:
-        for page in range(1, max_pages + 1):
-            print(f"\n📄 TRANG {page}/{max_pages}")
-            print("-" * 40)
-            
-            # URL với pagination
-            url = f"https://www.fahasa.com/sach-trong-nuoc.html?order=num_orders&limit={books_per_page}&p={page}"
-            print(f"🌐 Truy cập: {url}")
-            
-            driver.get(url)
-            time.sleep(random.uniform(3, 5))  # Random delay
-            
-            # Tìm tất cả sản phẩm trong trang
+        if mode == 'scheduled':
+            # Kế hoạch theo tốc độ thay đổi; ngân sách = số request của max_pages trang
+            plan_url = f"scheduled://{datetime.now():%Y-%m-%d}"
+            if frontier.listing_status(plan_url) != DONE:
+                budget = max_pages * books_per_page
+                plan, due = build_crawl_plan(budget)
+                print(f"🗓️ Scheduler: {due} sản phẩm đến hạn, cập nhật {len(plan)}/{budget}")
+                frontier.mark_listing_done(plan_url, 0, plan)
+            plan_urls = frontier.pending_products(plan_url)
+            if plan_urls:
+                crawl_urls(plan_urls, "Theo lịch")
+                print(f"📈 TỔNG CỘNG: {total_collected} sách | 🚦 Rate limiter: {limiter.metrics()}")
+            max_pages = 0  # không duyệt trang danh mục
+
+        # Shard = danh mục lá của cây (discover_categories) hoặc chỉ danh mục gốc
+        shards = [shard]
+        if discover_categories and max_pages > 0:
+            tree_session = create_http_session()
             try:
-                products = WebDriverWait(driver, 15).until(
-                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, '.item-inner'))
-                )
-                print(f"📚 Tìm thấy {len(products)} sản phẩm trong trang")
-            except:
-                print("❌ Không tìm thấy sản phẩm, bỏ qua trang này")
-                continue
-            
-            # Lấy URL tất cả sản phẩm trong trang
-            product_urls = []
-            for product in products:
-                try:
-                    link = product.find_element(By.TAG_NAME, 'a')
-                    url_product = link.get_attribute('href')
-                    if url_product and 'flashsale' not in url_product.lower():
-                        product_urls.append(url_product)
-                except:
-                    continue
-            
-            print(f"🔗 Sẽ thu thập {len(product_urls)} sách từ trang {page}")
-            
-            # Thu thập từng sách
-            page_success = 0
-            for i, book_url in enumerate(product_urls, 1):
-                print(f"\n📖 Sách {i}/{len(product_urls)} (Trang {page}):")
-                
-                book_data = get_book_details(driver, book_url)
-                if book_data:
-                    print(f"    ✅ {book_data['title'][:50]}...")
-                    print(f"    💰 Giá: {book_data['discount_price']:,.0f} VNĐ")
+                tree = load_category_tree(lambda tree_url: limiter.call(fetch_html, tree_session, tree_url),
+                                          category_url, category_name, category_tree_path, category_ttl_hours)
+                shards = [{'url': leaf['url'], 'path': leaf['path'], 'collected': 0}
+                          for leaf in leaf_categories(tree)]
+                print(f"🌳 {len(shards)} danh mục lá, crawl xoay vòng {max_pages} trang / danh mục")
+            except Exception as e:
+                print(f"⚠️ Không khám phá được cây danh mục, chỉ crawl danh mục gốc: {e}")
+            finally:
+                tree_session.close()
+
+        # Xoay vòng: trang p của mọi danh mục còn sách trước khi sang trang p + 1
+        active_shards = list(shards)
+        for page in range(1, max_pages + 1):
+            if not active_shards:
+                break
+            for shard in list(active_shards):
+                label = ' > '.join(shard['path'])
+                print(f"\n📄 TRANG {page}/{max_pages} | 🗂️ {label}")
+                print("-" * 40)
+
+                # URL với pagination
+                url = listing_page_url(page, books_per_page, shard['url'])
+                print(f"🌐 Truy cập: {url}")
+                # Đếm từ trước khi tải trang danh mục: snapshot ở chế độ refresh cũng là sách thành công
+                page_success = 0
+
+                if frontier.listing_status(url) == DONE:
+                    print("♻️ Trang danh mục đã tải ở lần chạy trước, lấy URL từ frontier")
+                else:
+                    if crawl_logger:
+                        crawl_logger.begin(LISTING, url)
+                    listing_error = None
                     try:
-                        insert_book_staging(book_data)
-                        print("    🟢 Đã insert vào staging_books (PostgreSQL)")
+                        if mode == 'refresh':
+                            cards = limiter.call(client.call, fetch_cards, url)
+                            product_urls = refresh_from_cards(cards) if cards else None
+                        else:
+                            product_urls = limiter.call(client.call, fetch_listing, url)
                     except Exception as e:
-                        print(f"    🔴 Lỗi insert staging_books: {e}")
-                    books_data.append(book_data)
-                    total_collected += 1
-                    page_success += 1
-                    time.sleep(random.uniform(2, 4))
-                else:
-                    print(f"    ❌ Không lấy được dữ liệu hoặc không có giá")
-            
-            print(f"\n📊 KẾT QUẢ TRANG {page}: {page_success}/{len(product_urls)} sách thành công")
-            print(f"📈 TỔNG CỘNG: {total_collected} sách")
-            
-            # Break nếu không thu thập được gì
-            if page_success == 0:
-                print("⚠️  Không thu thập được sách nào, có thể hết dữ liệu")
+                        print(f"❌ Lỗi tải trang danh mục: {e}")
+                        product_urls = None
+                        listing_error = e
+                    if crawl_logger:
+                        crawl_logger.end(success=bool(product_urls) or (mode == 'refresh' and product_urls is not None),
+                                         error=listing_error, found=len(product_urls or []))
+                    if product_urls is None or (mode == 'full' and not product_urls):
+                        print("❌ Không tìm thấy sản phẩm, bỏ qua trang này")
+                        continue
+                    new_urls = filter_new_urls(product_urls, seen)
+                    if len(new_urls) < len(product_urls):
+                        print(f"👁️ Bỏ qua {len(product_urls) - len(new_urls)} URL trùng hoặc đã thu thập gần đây")
+                    frontier.mark_listing_done(url, page, new_urls)
+
+                product_urls = frontier.pending_products(url)
+                if not product_urls:
+                    print("✅ Không còn sách mới cần thu thập ở trang này")
+                    continue
+
+                print(f"🔗 Sẽ thu thập {len(product_urls)} sách từ trang {page}")
+
+                # Thu thập từng sách
+                snapshot_success = page_success
+                assign_shard(product_urls)
+                crawl_urls(product_urls, f"Trang {page}")
+
+                print(f"\n📊 KẾT QUẢ TRANG {page}: {page_success - snapshot_success}/{len(product_urls)} sách thành công"
+                      + (f" (+{snapshot_success} snapshot)" if snapshot_success else ""))
+                print(f"🗂️ {label}: {shard['collected']} sách")
+                print(f"📈 TỔNG CỘNG: {total_collected} sách")
+                print(f"🚦 Rate limiter: {limiter.metrics()}")
+
+                # Danh mục không thu thập được gì -> có thể hết dữ liệu, bỏ khỏi vòng xoay
+                if page_success == 0:
+                    print("⚠️  Không thu thập được sách nào, có thể hết dữ liệu ở danh mục này")
+                    active_shards.remove(shard)
+
+            if len(shards) > 1:
+                print(f"\n🌳 Sau trang {page}: {len(active_shards)}/{len(shards)} danh mục còn sách")
+                for done_shard in shards:
+                    print(f"   🗂️ {' > '.join(done_shard['path'])}: {done_shard['collected']} sách")
+
+        # Retry các URL lỗi khi đến hạn backoff
+        while True:
+            wait = frontier.next_retry_wait()
+            if wait is None or wait > MAX_RETRY_WAIT:
                 break
-            
-            # Delay giữa các trang
-            if page < max_pages:
-                delay = random.uniform(5, 8)
-                print(f"⏳ Chờ {delay:.1f}s trước trang tiếp theo...")
-                time.sleep(delay)
-        
-        # Xuất dữ liệu
-        if books_data:
-            # Gộp với dữ liệu cũ nếu có
-            output_file_json = 'fahasa_all_books.json'
-            output_file_excel = 'fahasa_all_books.xlsx'
-            
-            existing_data = []
-            if os.path.exists(output_file_json):
-                try:
-                    with open(output_file_json, 'r', encoding='utf-8') as f:
-                        existing_data = json.load(f)
-                    print(f"📂 Đã có {len(existing_data)} sách cũ")
-                except:
-                    pass
-            
-            # Gộp dữ liệu (tránh duplicate)
-            existing_urls = {book.get('url', '') for book in existing_data}
-            new_books = [book for book in books_data if book.get('url', '') not in existing_urls]
-            
-            all_books = existing_data + new_books
-            
-            # Lưu JSON
-            with open(output_file_json, 'w', encoding='utf-8') as f:
-                json.dump(all_books, f, ensure_ascii=False, indent=2)
-            
-            # Lưu Excel
-            import pandas as pd
-            df = pd.DataFrame(all_books)
-            df.to_excel(output_file_excel, index=False, engine='openpyxl')
-            
-            print(f"\n🎉 HOÀN TẤT!")
-            print(f"📊 Thu thập mới: {len(new_books)} sách")
-            print(f"📂 Tổng cộng: {len(all_books)} sách")
-            print(f"💾 Đã lưu: {output_file_json}, {output_file_excel}")
+            if wait > 0:
+                print(f"⏳ Chờ {wait:.0f}s để retry URL lỗi...")
+                time.sleep(wait)
+            retry_urls = frontier.due_retries()
+            print(f"\n🔁 RETRY {len(retry_urls)} URL lỗi")
+            crawl_urls(retry_urls, "Retry")
+
+        # Hoàn tất lần chạy: xoá frontier, trừ khi còn URL chờ retry cho lần sau
+        stats = frontier.get_statistics()
+        if stats.get(PENDING) or stats.get(FAILED):
+            print(f"💾 Frontier giữ lại tiến độ cho lần chạy sau: {stats}")
+        else:
+            frontier.reset()
         
+        print(f"\n🎉 HOÀN TẤT!")
+        print(f"📊 Thu thập mới: {total_collected} sách")
+
     except KeyboardInterrupt:
         print("\n⚠️  Người dùng dừng chương trình")
+        run_status, run_error = 'PARTIAL', 'Người dùng dừng chương trình'
     except Exception as e:
         print(f"\n❌ Lỗi: {e}")
+        run_status, run_error = 'FAILED', str(e)
     finally:
-        driver.quit()
+        if pool:
+            pool.close()
+        if client is not None:
+            print(f"🧠 Session: {client.stats}")
+            close_client(client)
+        if staging_writer:
+            staging_ok = False
+            try:
+                staging_writer.close()
+                staging_ok = True
+                print(f"🟢 staging_books: đã ghi {staging_writer.total_written} dòng")
+            except Exception as e:
+                print(f"🔴 Lỗi flush staging_books: {e}")
+            if change_detector:
+                try:
+                    change_detector.close(commit=staging_ok)
+                    print(f"🔐 Thay đổi: {change_detector.changed} | Không đổi (heartbeat): {change_detector.unchanged}")
+                except Exception as e:
+                    print(f"🔴 Lỗi ghi product_state: {e}")
+        if crawl_logger:
+            try:
+                status = crawl_logger.close(run_status, run_error)
+                print(f"📋 crawl_log #{crawl_logger.log_id}: {status} (báo cáo: python crawl_log.py {crawl_logger.log_id})")
+            except Exception as e:
+                print(f"🔴 Lỗi ghi crawl_log: {e}")
+        if html_cache:
+            set_active_cache(None)
+            try:
+                deleted, removed = html_cache.evict()
+                print(f"📦 HTML cache: {html_cache.get_statistics()} (xoá {deleted} bản cũ, {removed} blob)")
+            except Exception as e:
+                print(f"🔴 Lỗi dọn HTML cache: {e}")
+            html_cache.close()
+        entry = run_writer.close(engine=engine, mode=mode)
+        if entry:
+            print(f"💾 Đã lưu {entry['rows']} sách: {os.path.join(output_dir, entry['path'])}")
+        if landing_writer:
+            try:
+                landing_paths = landing_writer.close()
+                if landing_paths:
+                    print(f"🪂 Landing Parquet: {landing_writer.rows} sách -> {', '.join(landing_paths)}")
+            except Exception as e:
+                print(f"🔴 Lỗi ghi landing Parquet: {e}")
+        frontier.close()
+        if seen is not None:
+            seen.close()
         print("🔚 Đóng trình duyệt")
 
 
@@ -495,15 +919,26 @@ if __name__ == "__main__":
     # CẤU HÌNH THU THẬP
     MAX_PAGES = 1
     BOOKS_PER_PAGE = 3
+    NUM_WORKERS = 1  # Số trình duyệt song song (khuyến nghị <= 8 trên 1 máy)
+    ENGINE = 'selenium'  # 'selenium', 'selenium_js', 'selenium_lean' hoặc 'http'
+    MODE = 'full'  # 'full', 'refresh' (giá/lượt bán từ trang danh mục) hoặc 'scheduled' (theo tốc độ thay đổi)
+    PARSE_PROCESSES = 0  # > 0: worker chỉ tải trang, parse bằng N process (FetchParsePipeline)
+    DISCOVER_CATEGORIES = False  # True: crawl xoay vòng mọi danh mục lá (MAX_PAGES trang / danh mục)
 
     print("⚙️  CẤU HÌNH:")
     print(f"   📄 Số trang: {MAX_PAGES}")
     print(f"   📚 Sách/trang: {BOOKS_PER_PAGE}")
     print(f"   🎯 Tối đa: {MAX_PAGES * BOOKS_PER_PAGE} sách")
+    print(f"   👷 Worker: {NUM_WORKERS}")
+    print(f"   ⚙️  Engine: {ENGINE}")
+    print(f"   🔄 Mode: {MODE}")
+    print(f"   🏭 Parse process: {PARSE_PROCESSES or 'trong worker'}")
+    print(f"   🌳 Theo danh mục lá: {DISCOVER_CATEGORIES}")
     print()
     
     choice = input("🚀 Bắt đầu test thu thập? (y/n): ").lower()
     if choice == 'y':
-        scrape_fahasa_bulk(MAX_PAGES, BOOKS_PER_PAGE)
+        scrape_fahasa_bulk(MAX_PAGES, BOOKS_PER_PAGE, NUM_WORKERS, ENGINE, mode=MODE,
+                           parse_processes=PARSE_PROCESSES, discover_categories=DISCOVER_CATEGORIES)
     else:
         print("❌ Hủy bỏ")
\ No newline at end of file
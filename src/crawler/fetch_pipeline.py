@@ -0,0 +1,181 @@
+"""
+FETCH PIPELINE - TÁCH TẢI TRANG VÀ PARSE THÀNH CÁC GIAI ĐOẠN RIÊNG
+    fetch (thread, mỗi thread 1 client)  ->  hàng đợi HTML giới hạn  ->
+    parse (multiprocessing.Pool, lxml)   ->  writer (1 thread, gọi on_result tuần tự)
+
+- Trình duyệt / HTTP session chỉ tải trang rồi lấy trang tiếp, không chờ Python parse
+- Parse chạy trên nhiều nhân CPU, không bị GIL và không phải chờ mạng
+- Parser process tạo bằng 'spawn': process gọi đã có thread (StagingWriter, CrawlLogger...), fork lúc đó
+  có thể chép lock đang bị giữ sang process con và treo
+- Backpressure: hàng đợi HTML có max_pending chỗ, và tối đa max_pending trang đang parse/chờ ghi;
+  parse chậm -> fetch tự chờ, bộ nhớ không tăng theo số URL
+Cùng API với BrowserWorkerPool (start / submit / join / close) nên dùng thay thế trực tiếp
+"""
+
+import multiprocessing
+import queue
+import threading
+
+from book_parser import parse_book_html
+from html_cache import stamp_time_collect
+from worker_pool import close_client
+
+def parse_book_page(page):
+    """Chạy trong process parser: (url, html, fetched_at) -> (url, sách hoặc None, lỗi)"""
+    url, html, fetched_at = page
+    try:
+        return url, stamp_time_collect(parse_book_html(html, url), fetched_at), None
+    except Exception as e:
+        return url, None, str(e)
+
+class FetchParsePipeline:
+    def __init__(self, client_factory, fetch_fn, on_result, num_fetchers=2, num_parsers=2,
+                 max_pending=32):
+        """
+        client_factory: hàm tạo client (WebDriver / HTTP session), gọi trong thread fetch
+        fetch_fn: fetch_fn(client, url) -> (html, fetched_at) hoặc None nếu lỗi
+        on_result: on_result(url, book hoặc None, fetcher_id), gọi tuần tự trong thread writer
+        max_pending: số trang tối đa nằm giữa fetch và writer (giới hạn bộ nhớ)
+        """
+        self.client_factory = client_factory
+        self.fetch_fn = fetch_fn
+        self.on_result = on_result
+        self.num_fetchers = max(1, int(num_fetchers))
+        self.num_parsers = max(1, int(num_parsers))
+        self.max_pending = max_pending
+
+        self._urls = queue.Queue()
+        self._pages = queue.Queue(maxsize=max_pending)
+        self._results = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._outstanding = 0
+        self._idle = threading.Condition()
+        self._fetchers = []
+        self._clients = {}
+        self._ready = threading.Semaphore(0)
+        self._pool = None
+        self._dispatcher = None
+        self._writer = None
+        self.stats = {'fetched': 0, 'fetch_failed': 0, 'parsed': 0, 'parse_failed': 0}
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        """Khởi động parser process, writer, dispatcher và các thread fetch"""
+        self._pool = multiprocessing.get_context('spawn').Pool(self.num_parsers)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name='pipeline-writer')
+        self._writer.start()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True,
+                                            name='pipeline-dispatcher')
+        self._dispatcher.start()
+
+        for fetcher_id in range(1, self.num_fetchers + 1):
+            t = threading.Thread(target=self._fetch_loop, args=(fetcher_id,), daemon=True,
+                                 name=f"pipeline-fetcher-{fetcher_id}")
+            t.start()
+            self._fetchers.append(t)
+        for _ in range(self.num_fetchers):
+            self._ready.acquire()
+
+        if not self._clients:
+            self.close()
+            raise Exception("Không khởi tạo được client nào cho fetch pipeline")
+        print(f"🏭 Pipeline sẵn sàng: {len(self._clients)} fetcher, {self.num_parsers} parser process")
+
+    def submit(self, url):
+        with self._idle:
+            self._outstanding += 1
+        self._urls.put(url)
+
+    def join(self):
+        """Chờ đến khi mọi URL đã submit đi hết pipeline (đã gọi on_result)"""
+        with self._idle:
+            while self._outstanding:
+                self._idle.wait()
+
+    def close(self):
+        """Dừng lần lượt fetch -> parse -> writer, đóng client"""
+        for _ in self._fetchers:
+            self._urls.put(None)
+        for t in self._fetchers:
+            t.join()
+        self._fetchers = []
+        if self._dispatcher:
+            self._pages.put(None)
+            self._dispatcher.join()
+            self._dispatcher = None
+        if self._pool:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        if self._writer:
+            self._results.put(None)
+            self._writer.join()
+            self._writer = None
+
+    # ---------- Các giai đoạn ----------
+
+    def _fetch_loop(self, fetcher_id):
+        try:
+            client = self.client_factory()
+        except Exception as e:
+            print(f"⚠️ Fetcher {fetcher_id} không khởi tạo được client: {str(e)[:100]}")
+            self._ready.release()
+            return
+        self._clients[fetcher_id] = client
+        self._ready.release()
+
+        try:
+            while True:
+                url = self._urls.get()
+                if url is None:
+                    break
+                try:
+                    page = self.fetch_fn(client, url)
+                except Exception as e:
+                    print(f"    ❌ Fetcher {fetcher_id} lỗi với {url}: {e}")
+                    page = None
+                with self._stats_lock:
+                    self.stats['fetch_failed' if page is None else 'fetched'] += 1
+                if page is None:
+                    self._results.put((url, None, fetcher_id, False, None))
+                else:
+                    html, fetched_at = page
+                    self._pages.put((url, html, fetched_at, fetcher_id))  # chờ nếu parse đang chậm
+        finally:
+            close_client(client)
+            self._clients.pop(fetcher_id, None)
+
+    def _dispatch_loop(self):
+        while True:
+            item = self._pages.get()
+            if item is None:
+                break
+            url, html, fetched_at, fetcher_id = item
+            self._slots.acquire()  # giới hạn số trang đang parse / chờ ghi
+            self._pool.apply_async(
+                parse_book_page, ((url, html, fetched_at),),
+                callback=lambda result, fid=fetcher_id: self._results.put((result[0], result[1], fid, True, result[2])),
+                error_callback=lambda e, u=url, fid=fetcher_id: self._results.put((u, None, fid, True, str(e)))
+            )
+
+    def _write_loop(self):
+        while True:
+            item = self._results.get()
+            if item is None:
+                break
+            url, book, fetcher_id, parsed, error = item
+            if parsed:
+                self._slots.release()
+                if error:
+                    print(f"    ❌ Lỗi parse {url}: {error[:100]}")
+                with self._stats_lock:
+                    self.stats['parsed' if book else 'parse_failed'] += 1
+            try:
+                if self.on_result:
+                    self.on_result(url, book, fetcher_id)
+            except Exception as e:
+                print(f"    🔴 Lỗi xử lý kết quả {url}: {e}")
+            finally:
+                with self._idle:
+                    self._outstanding -= 1
+                    self._idle.notify_all()
@@ -0,0 +1,168 @@
+"""
+HTML CACHE - LƯU HTML THÔ CỦA TRANG CHI TIẾT ĐỂ PARSE LẠI OFFLINE
+    html_cache/
+        index.db                     # SQLite: (url, fetched_at) -> sha256, kích thước
+        blobs/ab/abcdef....html.gz   # nội dung gzip, đặt tên theo sha256 (trang giống hệt chỉ lưu 1 lần)
+
+- fetched_at dùng đúng định dạng time_collect: sách thu thập từ trang được gắn time_collect = fetched_at,
+  nên parse lại (reparse_cache.py) cho ra cùng khoá (url, time_collect) và upsert đè dòng staging cũ
+- Chính sách giữ: tối đa max_versions bản / URL và bỏ bản cũ hơn retention_days ngày
+  (luôn giữ bản mới nhất của mỗi URL); blob không còn được tham chiếu bị xoá
+"""
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'  # giống time_collect của new_book
+
+class HtmlCache:
+    def __init__(self, root='html_cache', retention_days=30, max_versions=3, compress_level=6):
+        self.root = root
+        self.retention_days = retention_days
+        self.max_versions = max_versions
+        self.compress_level = compress_level
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER,
+                PRIMARY KEY (url, fetched_at)
+            );
+            CREATE INDEX IF NOT EXISTS idx_pages_sha ON pages(sha256);
+            CREATE INDEX IF NOT EXISTS idx_pages_fetched ON pages(fetched_at);
+        ''')
+        self.conn.commit()
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, 'blobs', sha256[:2], f'{sha256}.html.gz')
+
+    def put(self, url, html, fetched_at=None):
+        """Lưu 1 trang; trả về fetched_at (chuỗi định dạng time_collect)"""
+        fetched_at = fetched_at or datetime.now().strftime(TIME_FORMAT)
+        data = html.encode('utf-8')
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with gzip.open(tmp_path, 'wb', compresslevel=self.compress_level) as f:
+                f.write(data)
+            os.replace(tmp_path, path)  # ghi xong mới đổi tên -> không có blob dở dang
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO pages (url, fetched_at, sha256, size) VALUES (?, ?, ?, ?)',
+                (url, fetched_at, sha256, len(data))
+            )
+            self.conn.commit()
+        return fetched_at
+
+    def entries(self, since=None, latest_only=False):
+        """List (url, fetched_at, blob_path) theo thời gian; since: 'YYYY-MM-DD[ HH:MM:SS]'"""
+        query = 'SELECT url, fetched_at, sha256 FROM pages'
+        params = []
+        if latest_only:
+            query += ' WHERE fetched_at = (SELECT MAX(fetched_at) FROM pages p2 WHERE p2.url = pages.url)'
+        if since:
+            query += ' AND' if latest_only else ' WHERE'
+            query += ' fetched_at >= ?'
+            params.append(since)
+        query += ' ORDER BY fetched_at'
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [(url, fetched_at, self.blob_path(sha256)) for url, fetched_at, sha256 in rows]
+
+    def evict(self):
+        """Áp dụng chính sách giữ; trả về (số bản ghi xoá, số blob xoá)"""
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime(TIME_FORMAT)
+        with self._lock:
+            cur = self.conn.execute('''
+                DELETE FROM pages WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, fetched_at,
+                               ROW_NUMBER() OVER (PARTITION BY url ORDER BY fetched_at DESC) AS rn
+                        FROM pages
+                    ) WHERE rn > 1 AND (rn > ? OR fetched_at < ?)
+                )
+            ''', (self.max_versions, cutoff))
+            deleted = cur.rowcount
+            self.conn.commit()
+            referenced = {row[0] for row in self.conn.execute('SELECT DISTINCT sha256 FROM pages')}
+
+        removed_blobs = 0
+        if deleted:
+            blobs_dir = os.path.join(self.root, 'blobs')
+            for prefix in os.listdir(blobs_dir):
+                for name in os.listdir(os.path.join(blobs_dir, prefix)):
+                    if name.endswith('.html.gz') and name[:-len('.html.gz')] not in referenced:
+                        os.remove(os.path.join(blobs_dir, prefix, name))
+                        removed_blobs += 1
+        return deleted, removed_blobs
+
+    def get_statistics(self):
+        with self._lock:
+            pages, urls, size = self.conn.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT url), COALESCE(SUM(size), 0) FROM pages'
+            ).fetchone()
+        return {'pages': pages, 'urls': urls, 'raw_mb': round(size / 1024 / 1024, 1)}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+def load_html(blob_path):
+    """Đọc 1 blob (dùng được trong process khác - không cần mở index)"""
+    with gzip.open(blob_path, 'rb') as f:
+        return f.read().decode('utf-8')
+
+# ---------- Cache đang dùng của crawler ----------
+# Các hàm fetch (get_book_details, get_book_details_http, ...) gọi cache_page() sau khi tải trang;
+# không bật cache thì cache_page() không làm gì
+
+_active_cache = None
+
+def set_active_cache(cache):
+    global _active_cache
+    _active_cache = cache
+
+def cache_enabled():
+    return _active_cache is not None
+
+def cache_page(url, html):
+    """Lưu HTML vào cache đang bật; trả về fetched_at để gắn vào time_collect (None nếu tắt / lỗi)"""
+    if _active_cache is None or not html:
+        return None
+    try:
+        return _active_cache.put(url, html)
+    except Exception as e:
+        print(f"    ⚠️ Lỗi lưu HTML cache: {e}")
+        return None
+
+def capture_page(url, html):
+    """Như cache_page nhưng luôn trả về thời điểm tải (cache tắt -> thời điểm hiện tại)"""
+    return cache_page(url, html) or datetime.now().strftime(TIME_FORMAT)
+
+def stamp_time_collect(book, fetched_at):
+    """Gắn time_collect = thời điểm lưu cache để parse lại cho ra cùng khoá staging"""
+    if book and fetched_at:
+        book['time_collect'] = fetched_at
+    return book
+
+
+if __name__ == '__main__':
+    cache = HtmlCache()
+    print(f"📦 HTML cache: {cache.get_statistics()}")
+    start = time.time()
+    deleted, removed = cache.evict()
+    print(f"🧹 Đã xoá {deleted} bản cũ, {removed} blob ({time.time() - start:.1f}s): {cache.get_statistics()}")
+    cache.close()
@@ -0,0 +1,73 @@
+"""
+HTTP ENGINE - THU THẬP KHÔNG CẦN TRÌNH DUYỆT
+Tải trang bằng requests (session keep-alive dùng lại kết nối) và parse bằng lxml
+Dùng cho các trang không cần JavaScript: nhẹ hơn Chrome rất nhiều về CPU và RAM
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from book_parser import parse_book_html, parse_listing_cards, parse_listing_urls
+from crawl_log import add_bytes, stage
+from html_cache import cache_page, capture_page, stamp_time_collect
+
+DEFAULT_HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/124.0 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'vi-VN,vi;q=0.9,en;q=0.8',
+}
+
+REQUEST_TIMEOUT = 30  # giống set_page_load_timeout(30) của Selenium
+
+def create_http_session(pool_size=10, max_retries=2):
+    """Tạo session keep-alive với connection pool và retry cho lỗi tạm thời"""
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET'],
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def fetch_html(session, url, timeout=REQUEST_TIMEOUT):
+    """GET 1 trang, trả về HTML (raise nếu HTTP lỗi)"""
+    with stage('navigate'):
+        response = session.get(url, timeout=timeout)
+    add_bytes(len(response.content))
+    response.raise_for_status()
+    if not response.encoding or response.encoding.lower() == 'iso-8859-1':
+        response.encoding = 'utf-8'
+    return response.text
+
+def get_book_details_http(session, url):
+    """Lấy chi tiết sách qua HTTP + lxml (cùng đầu ra với get_book_details)
+    Lỗi HTTP / timeout được raise để rate limiter điều chỉnh tốc độ"""
+    html = fetch_html(session, url)
+    fetched_at = cache_page(url, html)
+    with stage('extract'):
+        book = parse_book_html(html, url)
+    return stamp_time_collect(book, fetched_at)
+
+def fetch_book_page_http(session, url):
+    """Chỉ tải trang chi tiết, không parse (fetch pipeline): -> (html, fetched_at)"""
+    html = fetch_html(session, url)
+    return html, capture_page(url, html)
+
+def get_product_urls_http(session, listing_url):
+    """Lấy danh sách URL sản phẩm của 1 trang danh mục qua HTTP"""
+    html = fetch_html(session, listing_url)
+    with stage('extract'):
+        return parse_listing_urls(html, listing_url)
+
+def get_listing_cards_http(session, listing_url):
+    """Lấy thẻ sản phẩm (URL + giá, rating, lượt bán) của 1 trang danh mục qua HTTP"""
+    html = fetch_html(session, listing_url)
+    with stage('extract'):
+        return parse_listing_cards(html, listing_url)
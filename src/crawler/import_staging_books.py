@@ -1,85 +1,144 @@
-import psycopg2
-import pandas as pd
-from psycopg2 import sql
-
-# Cấu hình kết nối PostgreSQL
-PG_HOST = 'localhost'
-PG_PORT = 5432
-PG_USER = 'postgres'  # Thay bằng user của bạn
-PG_PASSWORD = '123456'  # Thay bằng password của bạn
-PG_DATABASE = 'fahasa_staging'
+"""
+IMPORT STAGING BOOKS - NẠP FILE CSV VÀO staging_books BẰNG COPY (STREAMING)
+    python import_staging_books.py                     # nạp CSV_PATH
+    python import_staging_books.py a.csv b.csv c.csv   # nạp nhiều file song song
+File được đọc từng khối và đẩy thẳng vào COPY ... FROM STDIN WITH (FORMAT csv):
+    - không đọc cả file vào bộ nhớ -> file nhiều GB vẫn dùng bộ nhớ cố định
+    - định dạng CSV chuẩn: tiêu đề có dấu '|', dấu phẩy, xuống dòng trong ngoặc kép vẫn đúng
+    - danh sách cột lấy từ dòng tiêu đề của file (không phụ thuộc thứ tự cột trong bảng)
+    - COPY vào bảng tạm, chèn sang staging_books với cột text đã gộp khoảng trắng (clean_text_sql)
+    - url đưa về dạng chuẩn của crawler (canonicalize_url) trước khi chèn -> không tách 1 sản phẩm thành 2 khoá
+    - ON CONFLICT DO NOTHING: (url, time_collect) đã có / các file trùng nhau -> bỏ qua dòng, không huỷ cả file
+Mỗi file chạy trên 1 kết nối riêng của pool
+"""
+
+import csv
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from psycopg2.extras import execute_values
+
+from insert_staging_book import STAGING_COLUMNS, TEXT_COLUMNS, clean_text_sql, create_staging_table
+
+# Kết nối PostgreSQL dùng chung (cấu hình qua biến môi trường DW_HOST, DW_USER, DW_PASS, STAGING_NAME...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import get_cursor
+from db.partitions import split_default
+from utils.url_utils import canonicalize_url
+
 CSV_PATH = 'd:/Project_DW/script/fahasa_complete_books.csv'
+COPY_CHUNK_SIZE = 1024 * 1024       # byte mỗi lần đọc file / gửi cho COPY
+PROGRESS_EVERY = 64 * 1024 * 1024   # in tiến độ mỗi 64MB
 
-# Câu lệnh tạo bảng staging_books
-CREATE_TABLE_SQL = '''
-CREATE TABLE IF NOT EXISTS staging_books (
-    title TEXT,
-    author TEXT,
-    publisher TEXT,
-    supplier TEXT,
-    category_1 TEXT,
-    category_2 TEXT,
-    category_3 TEXT,
-    original_price NUMERIC,
-    discount_price NUMERIC,
-    discount_percent NUMERIC,
-    rating NUMERIC,
-    rating_count INTEGER,
-    sold_count TEXT,
-    sold_count_numeric INTEGER,
-    publish_year INTEGER,
-    language TEXT,
-    page_count INTEGER,
-    weight NUMERIC,
-    dimensions TEXT,
-    url TEXT,
-    url_img TEXT,
-    time_collect TIMESTAMP
-);
-'''
+class ProgressReader:
+    """Bọc file nhị phân cho copy_expert: đếm byte đã gửi và in tiến độ"""
 
-def main():
-    # Kết nối PostgreSQL
-    conn = psycopg2.connect(
-        host=PG_HOST,
-        port=PG_PORT,
-        user=PG_USER,
-        password=PG_PASSWORD,
-        dbname=PG_DATABASE
-    )
-    cur = conn.cursor()
-    
-    # Tạo bảng nếu chưa có
-    cur.execute(CREATE_TABLE_SQL)
-    conn.commit()
-    print('✅ Đã tạo bảng staging_books (nếu chưa có)')
-
-    # Đọc dữ liệu từ CSV
-    df = pd.read_csv(CSV_PATH)
-    print(f'📥 Đã đọc {len(df)} dòng từ file CSV')
-
-    # Xóa dữ liệu cũ (nếu muốn làm sạch)
-    cur.execute('TRUNCATE TABLE staging_books;')
-    conn.commit()
-    print('🧹 Đã làm sạch bảng staging_books')
-
-    # Import dữ liệu vào PostgreSQL
-    # Sử dụng copy_from để import nhanh
-    import io
-    output = io.StringIO()
-    df.to_csv(output, sep='|', header=False, index=False)
-    output.seek(0)
-    cur.copy_from(output, 'staging_books', sep='|')
-    conn.commit()
-    print('🚀 Đã import dữ liệu vào staging_books thành công!')
+    def __init__(self, f, total, label):
+        self.f = f
+        self.total = total
+        self.label = label
+        self.sent = 0
+        self._next_report = PROGRESS_EVERY
+        self._start = time.time()
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.sent += len(data)
+        if self.sent >= self._next_report:
+            self._next_report += PROGRESS_EVERY
+            mb = self.sent / 1024 / 1024
+            print(f"    ⏳ {self.label}: {mb:.0f}/{self.total / 1024 / 1024:.0f}MB "
+                  f"({mb / max(time.time() - self._start, 0.001):.0f}MB/s)")
+        return data
+
+def read_csv_columns(f):
+    """Đọc dòng tiêu đề (bỏ BOM), kiểm tra cột thuộc staging_books; f đứng ở đầu dòng dữ liệu đầu tiên"""
+    header = f.readline().decode('utf-8-sig')
+    columns = [c.strip() for c in next(csv.reader(io.StringIO(header)))]
+    unknown = [c for c in columns if c not in STAGING_COLUMNS]
+    if unknown:
+        raise ValueError(f"Cột không có trong staging_books: {', '.join(unknown)}")
+    return columns
+
+def canonicalize_batch_urls(cur, table='import_batch'):
+    """Đổi url trong bảng tạm sang dạng chuẩn (canonicalize_url, xử lý trong Python theo URL khác nhau);
+    trả về số URL đã đổi"""
+    cur.execute(f"SELECT DISTINCT url FROM {table} WHERE url IS NOT NULL")
+    changes = [(url, canonicalize_url(url)) for (url,) in cur.fetchall()]
+    changes = [(url, canonical) for url, canonical in changes if canonical != url]
+    if changes:
+        execute_values(cur, f"""
+            UPDATE {table} b SET url = c.canonical
+            FROM (VALUES %s) AS c(url, canonical) WHERE b.url = c.url
+        """, changes, page_size=1000)
+    return len(changes)
+
+def copy_csv_file(path, chunk_size=COPY_CHUNK_SIZE):
+    """COPY 1 file CSV vào staging_books trên 1 kết nối riêng; trả về (số dòng đã nạp, số dòng trùng bỏ qua)"""
+    label = os.path.basename(path)
+    start = time.time()
+    with open(path, 'rb') as f, get_cursor('staging') as cur:
+        columns = read_csv_columns(f)
+        reader = ProgressReader(f, os.path.getsize(path), label)
+        # COPY vào bảng tạm rồi chèn với text đã chuẩn hoá (ETL join không TRIM())
+        cur.execute("CREATE TEMP TABLE import_batch (LIKE staging_books INCLUDING DEFAULTS) ON COMMIT DROP")
+        copy_sql = f"COPY import_batch ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        cur.copy_expert(copy_sql, reader, size=chunk_size)
+        if 'url' in columns:
+            canonicalize_batch_urls(cur)
+        cur.execute("SELECT COUNT(*) FROM import_batch")
+        copied = cur.fetchone()[0]
+        select = ', '.join(clean_text_sql(c) if c in TEXT_COLUMNS else c for c in columns)
+        cur.execute(f"INSERT INTO staging_books ({', '.join(columns)}) SELECT {select} FROM import_batch "
+                    f"ON CONFLICT DO NOTHING")
+        rows = cur.rowcount
+    skipped = copied - rows
+    print(f"    🚀 {label}: {rows} dòng, trùng {skipped}, {reader.sent / 1024 / 1024:.1f}MB "
+          f"trong {time.time() - start:.1f}s")
+    return rows, skipped
+
+def import_csv_files(paths, truncate=False, max_parallel=4):
+    """Nạp nhiều file song song (mỗi file 1 kết nối); lỗi 1 file không huỷ các file khác"""
+    create_staging_table()  # bảng phân vùng theo time_collect, partition cho các kỳ tới
+    if truncate:
+        with get_cursor('staging') as cur:
+            cur.execute('TRUNCATE TABLE staging_books;')
+            print('🧹 Đã làm sạch bảng staging_books')
+
+    total_rows, total_skipped, failed = 0, 0, []
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(paths)))) as executor:
+        futures = {executor.submit(copy_csv_file, path): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                rows, skipped = future.result()
+                total_rows += rows
+                total_skipped += skipped
+            except Exception as e:
+                failed.append(futures[future])
+                print(f"    🔴 Lỗi nạp {futures[future]}: {e}")
+    print(f"📥 Đã nạp {total_rows} dòng (trùng {total_skipped}) từ {len(paths) - len(failed)}/{len(paths)} file "
+          f"trong {time.time() - start:.1f}s")
+
+    # Dòng cũ hơn các partition đã có rơi vào staging_books_default -> chuyển sang partition đúng kỳ
+    with get_cursor('staging') as cur:
+        created = split_default(cur, 'staging_books', 'time_collect')
+    if created:
+        print(f'🧱 Tạo {len(created)} partition cho dữ liệu cũ: {", ".join(created)}')
 
     # Kiểm tra
-    cur.execute('SELECT COUNT(*) FROM staging_books;')
-    count = cur.fetchone()[0]
-    print(f'🔎 Số dòng trong staging_books: {count}')
+    with get_cursor('staging', commit=False) as cur:
+        cur.execute('SELECT COUNT(*) FROM staging_books;')
+        print(f'🔎 Số dòng trong staging_books: {cur.fetchone()[0]}')
+    return total_rows, failed
 
-    cur.close()
-    conn.close()
+def main():
+    paths = sys.argv[1:] or [CSV_PATH]
+    # Nạp lại từ đầu khi chỉ nạp file mặc định (như trước); nạp nhiều file thì nối thêm
+    import_csv_files(paths, truncate=not sys.argv[1:])
 
 if __name__ == '__main__':
     main()
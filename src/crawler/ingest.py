@@ -0,0 +1,231 @@
+"""
+INGEST - NẠP MỌI ĐỊNH DẠNG SNAPSHOT VÀO staging_books BẰNG 1 LỆNH
+    python ingest.py fahasa_all_books.json fahasa_complete_books.csv *.xlsx crawl_output/
+Định dạng nhận theo đuôi file (thư mục -> mọi file được hỗ trợ bên trong):
+    .json   mảng object, đọc tăng dần bằng json.JSONDecoder.raw_decode (không json.load cả file)
+    .jsonl  1 object / dòng (output store, xem output_store.py)
+    .csv    csv.DictReader, đọc từng dòng
+    .xlsx   openpyxl read_only, dòng đầu là tiêu đề
+    .parquet  landing zone (parquet_store.py), đọc theo row group
+Mỗi lô bản ghi được chuẩn hoá theo cột (normalize.py) về schema staging_books rồi ghi bằng COPY
+vào bảng tạm và INSERT ... ON CONFLICT DO NOTHING (các file trùng dữ liệu không gây lỗi); nhiều file chạy song song
+trên nhiều process, mỗi process 1 kết nối. Bộ nhớ chỉ phụ thuộc kích thước lô, không phụ thuộc file
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from multiprocessing import Pool
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from insert_staging_book import STAGING_COLUMNS, create_staging_table
+from normalize import TEXT_COLUMNS, TIME_FORMAT, normalize_frame
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import close_all, get_connection, get_cursor
+from db.partitions import split_default
+
+SUPPORTED_EXTENSIONS = ('.json', '.jsonl', '.csv', '.xlsx', '.parquet')
+JSON_CHUNK_SIZE = 1024 * 1024
+COPY_BATCH_ROWS = 50000
+
+# ---------- Đọc từng định dạng (generator, 1 bản ghi / lần) ----------
+
+def iter_json(path, chunk_size=JSON_CHUNK_SIZE):
+    """Mảng JSON [ {...}, {...} ] đọc theo khối: chỉ giữ khối hiện tại + bản ghi đang parse"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buf, pos, started, eof = '', 0, False, False
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos == len(buf):
+                if eof:
+                    break
+                chunk = f.read(chunk_size)
+                buf, pos, eof = chunk, 0, not chunk
+                continue
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError(f"{path}: JSON phải là mảng các object")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == ']':
+                break
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)  # bản ghi bị cắt ở cuối khối -> đọc thêm rồi parse lại
+                buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+                continue
+            yield record
+            pos = end
+
+def iter_jsonl(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def iter_csv(path):
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        yield from csv.DictReader(f)
+
+def iter_xlsx(path):
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(c).strip() if c is not None else '' for c in next(rows, ())]
+        for row in rows:
+            yield dict(zip(header, row))
+    finally:
+        workbook.close()
+
+def iter_parquet(path):
+    import pyarrow.parquet as pq  # pyarrow chỉ cần khi nạp file landing zone
+
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(columns=[c for c in STAGING_COLUMNS if c in parquet.schema_arrow.names]):
+        yield from batch.to_pylist()
+
+READERS = {'.json': iter_json, '.jsonl': iter_jsonl, '.csv': iter_csv, '.xlsx': iter_xlsx,
+           '.parquet': iter_parquet}
+
+def iter_records(path):
+    """Bản ghi của 1 file, chọn reader theo đuôi file"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in READERS:
+        raise ValueError(f"Định dạng không hỗ trợ: {path} (chọn: {', '.join(SUPPORTED_EXTENSIONS)})")
+    return READERS[ext](path)
+
+# ---------- Ghi theo lô bằng COPY ----------
+
+class CopyWriter:
+    """Gom batch_rows bản ghi, chuẩn hoá cả lô (normalize_frame), COPY vào bảng tạm rồi chèn vào
+    staging_books (ON CONFLICT DO NOTHING - trùng (url, time_collect) thì bỏ qua)"""
+
+    def __init__(self, conn, batch_rows=COPY_BATCH_ROWS, default_time=None):
+        self.conn = conn
+        self.batch_rows = batch_rows
+        self.default_time = default_time
+        self.written = 0
+        self.skipped = 0
+        self._records = []
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS ingest_batch
+                (LIKE staging_books INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+            """)
+        conn.commit()
+        columns = ', '.join(STAGING_COLUMNS)
+        # Ô rỗng không ngoặc kép = NULL; cột text giữ chuỗi rỗng như StagingWriter
+        self._copy_sql = (f"COPY ingest_batch ({columns}) FROM STDIN WITH "
+                          f"(FORMAT csv, FORCE_NOT_NULL ({', '.join(TEXT_COLUMNS)}))")
+        self._insert_sql = (f"INSERT INTO staging_books ({columns}) SELECT {columns} FROM ingest_batch "
+                            f"ON CONFLICT DO NOTHING")
+
+    def add(self, record):
+        self._records.append(record)
+        if len(self._records) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._records:
+            return
+        batch = normalize_frame(pd.DataFrame.from_records(self._records), self.default_time)
+        buffer = io.StringIO()
+        batch.to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        try:
+            with self.conn.cursor() as cur:
+                cur.copy_expert(self._copy_sql, buffer)
+                cur.execute(self._insert_sql)
+                inserted = cur.rowcount
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.written += inserted
+        self.skipped += len(self._records) - inserted
+        self._records = []
+
+# ---------- Điều phối ----------
+
+def ingest_file(path, batch_rows=COPY_BATCH_ROWS):
+    """Chạy trong process con: nạp 1 file, trả về dict thống kê"""
+    stats = {'path': path, 'read': 0, 'written': 0, 'skipped': 0, 'error': None}
+    start = time.time()
+    # Bản ghi thiếu time_collect -> thời điểm sửa file (lúc snapshot được ghi ra)
+    default_time = datetime.fromtimestamp(os.path.getmtime(path)).strftime(TIME_FORMAT)
+    try:
+        with get_connection('staging') as conn:
+            writer = CopyWriter(conn, batch_rows, default_time)
+            for record in iter_records(path):
+                writer.add(record)
+                stats['read'] += 1
+            writer.flush()
+            stats['written'], stats['skipped'] = writer.written, writer.skipped
+    except Exception as e:
+        stats['error'] = str(e)
+    finally:
+        close_all()
+    stats['seconds'] = round(time.time() - start, 1)
+    return stats
+
+def expand_paths(paths):
+    """File + mọi file được hỗ trợ trong các thư mục (đệ quy), lớn trước để chia việc đều"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, names in os.walk(path):
+                files.extend(os.path.join(dirpath, name) for name in names
+                             if name.lower().endswith(SUPPORTED_EXTENSIONS))
+        else:
+            files.append(path)
+    return sorted(dict.fromkeys(files), key=os.path.getsize, reverse=True)
+
+def ingest(paths, processes=None, batch_rows=COPY_BATCH_ROWS):
+    """Nạp nhiều file song song; trả về list thống kê từng file"""
+    files = expand_paths(paths)
+    if not files:
+        print("❌ Không có file nào để nạp")
+        return []
+    create_staging_table()
+    close_all()  # process con tự mở kết nối riêng, không dùng chung socket của process cha
+
+    processes = max(1, min(processes or os.cpu_count(), len(files)))
+    print(f"📥 Nạp {len(files)} file bằng {processes} process...")
+    results = []
+    start = time.time()
+    with Pool(processes) as pool:
+        for stats in pool.imap_unordered(ingest_file, files):
+            results.append(stats)
+            if stats['error']:
+                print(f"    🔴 {stats['path']}: {stats['error'][:200]}")
+            else:
+                print(f"    ✅ {stats['path']}: đọc {stats['read']}, ghi {stats['written']}, "
+                      f"trùng {stats['skipped']} ({stats['seconds']}s)")
+    # Snapshot cũ hơn các partition đã có rơi vào staging_books_default -> chuyển sang partition đúng kỳ
+    with get_cursor('staging') as cur:
+        created = split_default(cur, 'staging_books', 'time_collect')
+    if created:
+        print(f"🧱 Tạo {len(created)} partition cho dữ liệu cũ: {', '.join(created)}")
+    total_written = sum(s['written'] for s in results)
+    print(f"🎉 Đã ghi {total_written} dòng mới vào staging_books trong {time.time() - start:.1f}s")
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Cách dùng: python ingest.py <file hoặc thư mục> [...]")
+        sys.exit(1)
+    ingest(sys.argv[1:])
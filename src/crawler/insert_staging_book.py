@@ -1,83 +1,251 @@
-import psycopg2
-
-# Cấu hình kết nối PostgreSQL
-PG_HOST = 'localhost'
-PG_PORT = 5432
-PG_USER = 'postgres'
-PG_PASSWORD = '123456'
-PG_DATABASE = 'fahasa_staging'
-
-# Hàm kết nối
-
-def get_pg_connection():
-    return psycopg2.connect(
-        host=PG_HOST,
-        port=PG_PORT,
-        user=PG_USER,
-        password=PG_PASSWORD,
-        dbname=PG_DATABASE
-    )
+import os
+import sys
+import threading
+import time
+
+from psycopg2.extras import execute_values
+
+from book_parser import parse_dimensions
+
+# Kết nối PostgreSQL dùng chung (pool, cấu hình qua biến môi trường) - xem src/db/connection.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import acquire, get_cursor, release, test_connection
+from db.partitions import convert_to_partitioned, ensure_ahead, lock_partitions
+
+STAGING_DB = 'staging'
+
+# Cột của staging_books theo đúng thứ tự insert
+STAGING_COLUMNS = [
+    'title', 'author', 'publisher', 'supplier', 'category_1', 'category_2', 'category_3',
+    'original_price', 'discount_price', 'discount_percent', 'rating', 'rating_count',
+    'sold_count', 'sold_count_numeric', 'publish_year', 'language', 'page_count',
+    'weight', 'dimensions', 'url', 'url_img', 'time_collect', 'dimension_width', 'dimension_height'
+]
+
+# Cột text: luôn được chuẩn hoá khoảng trắng khi nạp (book_to_row, normalize.clean_text, clean_text_sql)
+# -> ETL join trực tiếp, không cần TRIM()
+TEXT_COLUMNS = [
+    'title', 'author', 'publisher', 'supplier', 'category_1', 'category_2', 'category_3',
+    'sold_count', 'language', 'dimensions', 'url', 'url_img'
+]
+
+# Giá trị mặc định khi book_data thiếu trường
+STAGING_DEFAULTS = {
+    'original_price': 0.0, 'discount_price': 0.0, 'discount_percent': 0.0,
+    'rating': 0.0, 'rating_count': 0, 'sold_count_numeric': 0,
+    'publish_year': 0, 'page_count': 0, 'weight': 0.0, 'time_collect': None,
+    'dimension_width': None, 'dimension_height': None
+}
+
+def book_to_row(book_data):
+    """dict sách -> tuple theo STAGING_COLUMNS (dimension_width/height tách từ dimensions)"""
+    if 'dimension_width' not in book_data:
+        width, height = parse_dimensions(book_data.get('dimensions'))
+        book_data = dict(book_data, dimension_width=width, dimension_height=height)
+    row = []
+    for col in STAGING_COLUMNS:
+        value = book_data.get(col, STAGING_DEFAULTS.get(col, ''))
+        if col in TEXT_COLUMNS and isinstance(value, str):
+            value = ' '.join(value.split())  # gộp khoảng trắng, bỏ đầu/cuối (như normalize.clean_text)
+        row.append(value)
+    return tuple(row)
+
+def clean_text_sql(column):
+    """Biểu thức SQL cùng quy tắc chuẩn hoá text, cho dữ liệu nạp thẳng bằng COPY"""
+    return f"btrim(regexp_replace({column}, '\\s+', ' ', 'g'))"
+
+def create_staging_table(conn=None):
+    """staging_books phân vùng RANGE (time_collect) - xem src/db/partitions.py
+    Bảng heap cũ được chuyển sang bảng phân vùng (giữ dữ liệu); luôn có partition cho PARTITIONS_AHEAD kỳ tới"""
+    sql = """
+    CREATE TABLE IF NOT EXISTS staging_books (
+        title TEXT, author TEXT, publisher TEXT, supplier TEXT,
+        category_1 TEXT, category_2 TEXT, category_3 TEXT,
+        original_price NUMERIC, discount_price NUMERIC, discount_percent NUMERIC,
+        rating NUMERIC, rating_count INTEGER, sold_count TEXT, sold_count_numeric INTEGER,
+        publish_year INTEGER, language TEXT, page_count INTEGER,
+        weight NUMERIC, dimensions TEXT, url TEXT, url_img TEXT,
+        time_collect TIMESTAMP DEFAULT NOW(),
+        dimension_width NUMERIC, dimension_height NUMERIC
+    ) PARTITION BY RANGE (time_collect);
+    ALTER TABLE staging_books
+        ADD COLUMN IF NOT EXISTS dimension_width NUMERIC,
+        ADD COLUMN IF NOT EXISTS dimension_height NUMERIC,
+        ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMP;
+    -- Thời điểm nạp (khác time_collect khi nạp muộn: ingest, import, reparse) -> run_etl tìm dòng cũ mới nạp
+    -- Dòng có trước khi thêm cột giữ NULL (đã được ETL theo time_collect)
+    ALTER TABLE staging_books ALTER COLUMN loaded_at SET DEFAULT NOW();
+    -- Giữ lịch sử theo thời điểm thu thập: mỗi (url, time_collect) 1 dòng
+    -- (change detector chỉ ghi dòng mới khi dữ liệu sản phẩm thay đổi)
+    ALTER TABLE staging_books DROP CONSTRAINT IF EXISTS staging_books_url_key;
+    """
+    partition_sql = """
+    CREATE TABLE IF NOT EXISTS staging_books_default PARTITION OF staging_books DEFAULT;
+    CREATE UNIQUE INDEX IF NOT EXISTS staging_books_url_time_key ON staging_books(url, time_collect);
+    CREATE INDEX IF NOT EXISTS staging_books_loaded_at_idx ON staging_books(loaded_at);
+    """
+
+    def run(cur):
+        lock_partitions(cur, 'staging_books')  # nhiều worker cùng khởi động -> tạo bảng / partition lần lượt
+        cur.execute(sql)
+        if convert_to_partitioned(cur, 'staging_books', 'time_collect'):
+            print("🧱 Đã chuyển staging_books sang bảng phân vùng theo time_collect")
+        cur.execute(partition_sql)
+        ensure_ahead(cur, 'staging_books', 'time_collect')
+
+    if conn is None:
+        with get_cursor(STAGING_DB) as cur:
+            run(cur)
+    else:
+        with conn.cursor() as cur:
+            run(cur)
+        conn.commit()
+    print("Bảng staging_books đã sẵn sàng!")
+
+_staging_table_ready = False
 
 # Hàm insert 1 book vào staging_books
 
 def insert_book_staging(book_data):
-    create_staging_table()
-    conn = get_pg_connection()
-    cur = conn.cursor()
-    insert_sql = '''
-        INSERT INTO staging_books (
-            title, author, publisher, supplier, category_1, category_2, category_3,
-            original_price, discount_price, discount_percent, rating, rating_count,
-            sold_count, sold_count_numeric, publish_year, language, page_count,
-            weight, dimensions, url, url_img, time_collect
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    global _staging_table_ready
+    if not _staging_table_ready:
+        create_staging_table()
+        _staging_table_ready = True
+    insert_sql = f'''
+        INSERT INTO staging_books ({', '.join(STAGING_COLUMNS)})
+        VALUES ({', '.join(['%s'] * len(STAGING_COLUMNS))})
     '''
-    cur.execute(insert_sql, (
-        book_data.get('title', ''),
-        book_data.get('author', ''),
-        book_data.get('publisher', ''),
-        book_data.get('supplier', ''),
-        book_data.get('category_1', ''),
-        book_data.get('category_2', ''),
-        book_data.get('category_3', ''),
-        book_data.get('original_price', 0.0),
-        book_data.get('discount_price', 0.0),
-        book_data.get('discount_percent', 0.0),
-        book_data.get('rating', 0.0),
-        book_data.get('rating_count', 0),
-        book_data.get('sold_count', ''),
-        book_data.get('sold_count_numeric', 0),
-        book_data.get('publish_year', 0),
-        book_data.get('language', ''),
-        book_data.get('page_count', 0),
-        book_data.get('weight', 0.0),
-        book_data.get('dimensions', ''),
-        book_data.get('url', ''),
-        book_data.get('url_img', ''),
-        book_data.get('time_collect', None)
-    ))
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_cursor(STAGING_DB) as cur:
+        cur.execute(insert_sql, book_to_row(book_data))
+
+class StagingWriter:
+    """Ghi staging_books theo lô trên 1 kết nối mượn từ pool, giữ suốt lần chạy
+
+    - add() chỉ đưa sách vào buffer (vài micro giây)
+    - flush bằng execute_values khi buffer đủ batch_size hoặc sau flush_interval giây
+    - trùng (url, time_collect) -> upsert (ON CONFLICT ... DO UPDATE) thay vì lỗi UNIQUE, loaded_at = lúc ghi đè
+    - close() (hoặc thoát khối with) flush phần còn lại
+    - có crawl_logger -> mỗi lần flush ghi 1 sự kiện 'batch' (thời gian ghi, số dòng) vào crawl_log_event
+    """
+
+    def __init__(self, batch_size=200, flush_interval=5.0, conflict_columns=('url', 'time_collect'),
+                 crawl_logger=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.conflict_columns = list(conflict_columns)
+        self.total_written = 0
+        self.crawl_logger = crawl_logger
+
+        self.conn = acquire(STAGING_DB)
+        create_staging_table(self.conn)
+
+        update_cols = [c for c in STAGING_COLUMNS if c not in self.conflict_columns]
+        self.upsert_sql = f'''
+            INSERT INTO staging_books ({', '.join(STAGING_COLUMNS)}) VALUES %s
+            ON CONFLICT ({', '.join(self.conflict_columns)}) DO UPDATE SET
+            {', '.join(f'{c} = EXCLUDED.{c}' for c in update_cols)}, loaded_at = EXCLUDED.loaded_at
+        '''
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True,
+                                         name='staging-writer-flush')
+        self._flusher.start()
+
+    def add(self, book_data):
+        """Đưa 1 sách vào buffer; tự flush khi đủ batch_size"""
+        with self._lock:
+            self._buffer.append(book_to_row(book_data))
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Ghi toàn bộ buffer xuống PostgreSQL trong 1 transaction"""
+        with self._lock:
+            if not self._buffer:
+                return 0
+            rows, self._buffer = self._buffer, []
+
+            # Cùng 1 khoá trong 1 câu upsert sẽ lỗi -> giữ bản ghi cuối cùng
+            key_idx = [STAGING_COLUMNS.index(c) for c in self.conflict_columns]
+            deduped = {}
+            for row in rows:
+                deduped[tuple(row[i] for i in key_idx)] = row
+            batch = list(deduped.values())
+
+            start = time.perf_counter()
+            try:
+                with self.conn.cursor() as cur:
+                    execute_values(cur, self.upsert_sql, batch, page_size=len(batch))
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                self._buffer = rows + self._buffer  # giữ lại để flush lần sau
+                self._log_batch(len(batch), start, error=e)
+                raise
+            self._log_batch(len(batch), start)
+            self.total_written += len(batch)
+            return len(batch)
+
+    def _log_batch(self, rows, start, error=None):
+        if self.crawl_logger:
+            self.crawl_logger.log_batch(rows, (time.perf_counter() - start) * 1000,
+                                        success=error is None, error=error)
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"    🔴 Lỗi flush staging_books: {e}")
+
+    def close(self):
+        """Dừng flush định kỳ, ghi phần còn lại và trả kết nối về pool"""
+        self._stop.set()
+        self._flusher.join()
+        try:
+            self.flush()
+        finally:
+            release(self.conn, STAGING_DB)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+# Hàm lấy bản ghi mới nhất của mỗi sản phẩm đã có trong staging_books
+# (dùng cho chế độ refresh: chỉ cập nhật giá/lượt bán từ trang danh mục)
+
+def load_known_products():
+    with get_cursor(STAGING_DB, commit=False) as cur:
+        cur.execute('''
+            SELECT DISTINCT ON (url)
+                title, author, publisher, supplier, category_1, category_2, category_3,
+                original_price, discount_price, discount_percent, rating, rating_count,
+                sold_count, sold_count_numeric, publish_year, language, page_count,
+                weight, dimensions, url, url_img
+            FROM staging_books
+            WHERE url IS NOT NULL
+            ORDER BY url, time_collect DESC NULLS LAST
+        ''')
+        columns = [desc[0] for desc in cur.description]
+        rows = cur.fetchall()
+    known = {}
+    for row in rows:
+        book = dict(zip(columns, row))
+        # NUMERIC -> float để ghi JSON được
+        for col in ('original_price', 'discount_price', 'discount_percent', 'rating', 'weight'):
+            if book[col] is not None:
+                book[col] = float(book[col])
+        known[book['url']] = book
+    return known
 
 # Hàm test kết nối PostgreSQL
 def test_pg_connection():
-    try:
-        conn = psycopg2.connect(
-            host=PG_HOST,
-            port=PG_PORT,
-            user=PG_USER,
-            password=PG_PASSWORD,
-            dbname=PG_DATABASE
-        )
-        cur = conn.cursor()
-        cur.execute('SELECT version();')
-        version = cur.fetchone()[0]
-        print(f'✅ Kết nối thành công! PostgreSQL version: {version}')
-        cur.close()
-        conn.close()
-    except Exception as e:
-        print(f'❌ Kết nối thất bại: {e}')
+    return test_connection(STAGING_DB)
 
 # Ví dụ sử dụng
 if __name__ == '__main__':
@@ -109,26 +277,3 @@ if __name__ == '__main__':
     }
     insert_book_staging(book)
     print('Đã insert 1 book mẫu vào staging_books!')
-
-def get_conn():
-    return psycopg2.connect(host=PG_HOST, port=PG_PORT, user=PG_USER, password=PG_PASSWORD, dbname=PG_DATABASE)
-
-def create_staging_table():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS staging_books (
-        title TEXT, author TEXT, publisher TEXT, supplier TEXT,
-        category_1 TEXT, category_2 TEXT, category_3 TEXT,
-        original_price NUMERIC, discount_price NUMERIC, discount_percent NUMERIC,
-        rating NUMERIC, rating_count INTEGER, sold_count TEXT, sold_count_numeric INTEGER,
-        publish_year INTEGER, language TEXT, page_count INTEGER,
-        weight NUMERIC, dimensions TEXT, url TEXT, url_img TEXT,
-        time_collect TIMESTAMP DEFAULT NOW(),
-        UNIQUE(url)
-    );
-    """)
-    conn.commit()
-    cur.close()
-    conn.close()
-    print("Bảng staging_books đã sẵn sàng!")
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+LEAN BROWSER - CHROME CHỈ TẢI NHỮNG GÌ CẦN ĐỂ LẤY DỮ LIỆU SÁCH
+Trang chi tiết tải kèm ảnh, font, video, tracker, quảng cáo mà extract không dùng
+(url_img chỉ cần thuộc tính src, không cần byte ảnh). Engine 'selenium_lean':
+    - headless mới (--headless=new), pageLoadStrategy 'eager': driver.get trả về ở DOMContentLoaded,
+      phần còn lại do wait_until_ready (dom_extract) chờ đúng selector cần
+    - chặn theo loại tài nguyên và domain bên thứ ba bằng DevTools (Network.setBlockedURLs)
+Kiểm tra tiết kiệm byte / thời gian và độ đầy đủ dữ liệu so với Chrome đầy đủ: compare_lean_profile.py
+"""
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+from browser_service import cached_driver_path
+
+# Loại tài nguyên không dùng tới (khớp theo đuôi URL)
+BLOCKED_RESOURCE_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico', '*.avif',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3',
+]
+
+# Tracker / quảng cáo / chat của bên thứ ba
+BLOCKED_DOMAIN_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*googleadservices.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*facebook.net*', '*facebook.com/tr*', '*connect.facebook.net*',
+    '*analytics.tiktok.com*', '*hotjar.com*', '*clarity.ms*', '*criteo.com*', '*criteo.net*',
+    '*useinsider.com*', '*accesstrade*', '*adtima*', '*zalo.me*', '*subiz*', '*onesignal*',
+]
+
+BLOCKED_URL_PATTERNS = BLOCKED_RESOURCE_PATTERNS + BLOCKED_DOMAIN_PATTERNS
+
+# Capability bật performance log (sự kiện Network.* của DevTools) - đo byte thật, xem compare_lean_profile.py
+PERFORMANCE_LOG_PREFS = {'performance': 'ALL'}
+
+def lean_chrome_options(headless=True, performance_log=False):
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument('--headless=new')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+    chrome_options.add_argument('--disable-extensions')
+    chrome_options.add_argument('--mute-audio')
+    chrome_options.add_argument('--window-size=1366,900')
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    chrome_options.page_load_strategy = 'eager'
+    if performance_log:
+        chrome_options.set_capability('goog:loggingPrefs', PERFORMANCE_LOG_PREFS)
+    return chrome_options
+
+def enable_resource_blocking(driver, patterns=BLOCKED_URL_PATTERNS):
+    """Chặn request khớp patterns cho mọi trang sau đó của driver (DevTools protocol)"""
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+
+def create_lean_driver(headless=True, performance_log=False):
+    """ChromeDriver headless, chặn tài nguyên không cần thiết"""
+    driver_path = cached_driver_path()
+    service = Service(driver_path) if driver_path else Service()
+    driver = webdriver.Chrome(service=service, options=lean_chrome_options(headless, performance_log))
+    enable_resource_blocking(driver)
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    driver.set_page_load_timeout(30)
+    return driver
@@ -0,0 +1,126 @@
+"""
+NORMALIZE - CHUẨN HOÁ DỮ LIỆU STAGING THEO CỘT (PANDAS / NUMPY, KHÔNG LẶP TỪNG DÒNG)
+Cùng quy tắc với các hàm từng dòng trong book_parser, áp dụng cho cả lô DataFrame:
+    - text: bỏ khoảng trắng đầu/cuối, gộp khoảng trắng liên tiếp (ETL không cần TRIM() khi join)
+    - giá: số giữ nguyên; chuỗi '52.500 đ' -> 52500.0, < 1000 coi là nghìn đồng (extract_price_smart)
+    - lượt bán: sold_count_numeric thiếu -> tính từ 'Đã bán 10k+' / '979' (parse_sold_count)
+    - trọng lượng: > 10 coi là gram -> kg
+    - kích thước: '19 x 13 x 0.7 cm' -> dimension_width = 19, dimension_height = 13 (cm)
+    - url: canonicalize_url như crawler (bỏ ?fhs_campaign=..., utm_*) -> snapshot cũ cùng khoá với dữ liệu mới
+Dùng trong ingest.py (mỗi lô COPY); benchmark so với cách iterrows: benchmark_normalize.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from book_parser import DIMENSIONS_PATTERN
+from insert_staging_book import STAGING_COLUMNS, STAGING_DEFAULTS, TEXT_COLUMNS
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.url_utils import canonicalize_url
+
+INT_COLUMNS = ['rating_count', 'sold_count_numeric', 'publish_year', 'page_count']
+FLOAT_COLUMNS = ['original_price', 'discount_price', 'discount_percent', 'rating', 'weight',
+                 'dimension_width', 'dimension_height']
+PRICE_COLUMNS = ['original_price', 'discount_price']
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SOLD_PATTERN = r'(?i)(?:đã bán\s*)?([\d.,]+)\s*(k\+?)?'
+
+def on_uniques(series, func):
+    """Chạy func trên các giá trị khác nhau của cột rồi ánh xạ lại theo mã factorize
+    Cột lặp nhiều (NXB, danh mục, giá '52.500 đ', 'Đã bán 10k+', kích thước) chỉ xử lý chuỗi 1 lần / giá trị"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    if len(uniques) == len(series):
+        return func(series)
+    result = func(pd.Series(uniques, dtype=object))
+    return pd.Series(result.to_numpy()[codes], index=series.index)
+
+def clean_text(series):
+    """Bỏ khoảng trắng thừa; NaN / None -> ''"""
+    return on_uniques(series, _clean_text)
+
+def _clean_text(series):
+    return series.fillna('').astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+
+def canonicalize_urls(series):
+    """URL sản phẩm -> dạng chuẩn của crawler (utils.url_utils.canonicalize_url)"""
+    return on_uniques(series, lambda values: values.map(canonicalize_url))
+
+def parse_prices(series):
+    """Giá dạng số giữ nguyên, dạng chuỗi xử lý như extract_price_smart; không đọc được -> 0"""
+    return on_uniques(series, _parse_prices)
+
+def _parse_prices(series):
+    numeric = pd.to_numeric(series, errors='coerce')
+    is_text = numeric.isna() & series.notna()
+    if is_text.any():
+        digits = series[is_text].astype(str).str.replace(r'\D', '', regex=True)
+        parsed = pd.to_numeric(digits, errors='coerce')
+        parsed = parsed.where(parsed >= 1000, parsed * 1000)
+        numeric[is_text] = parsed.where(parsed >= 1000, 0.0)
+    return numeric.fillna(0.0).astype('float64')
+
+def parse_sold_numeric(sold_text):
+    """'Đã bán 10k+' -> 10000, 'Đã bán 1.234' -> 1234; không khớp -> NaN"""
+    return on_uniques(sold_text, _parse_sold_numeric)
+
+def _parse_sold_numeric(sold_text):
+    parts = sold_text.str.extract(SOLD_PATTERN)
+    is_k = parts[1].notna()
+    thousands = pd.to_numeric(parts[0].str.replace(',', '.', regex=False), errors='coerce') * 1000
+    plain = pd.to_numeric(parts[0].str.replace(r'[.,]', '', regex=True), errors='coerce')
+    return np.floor(thousands.where(is_k, plain))
+
+def parse_weight(series):
+    """Trọng lượng (kg); giá trị > 10 coi là gram"""
+    weight = pd.to_numeric(series, errors='coerce')
+    is_text = weight.isna() & series.notna()
+    if is_text.any():
+        weight[is_text] = pd.to_numeric(
+            series[is_text].astype(str).str.replace(r'[^\d.]', '', regex=True), errors='coerce')
+    return weight.where(weight <= 10, (weight / 1000).round(3)).fillna(0.0)
+
+def split_dimensions(dimensions):
+    """'19 x 13 x 0.7 cm' -> (19.0, 13.0); không khớp -> NaN"""
+    return (on_uniques(dimensions, lambda values: _dimension_part(values, 0)),
+            on_uniques(dimensions, lambda values: _dimension_part(values, 1)))
+
+def _dimension_part(dimensions, index):
+    part = dimensions.str.extract(DIMENSIONS_PATTERN)[index]
+    return pd.to_numeric(part.str.replace(',', '.', regex=False), errors='coerce')
+
+def normalize_frame(df, default_time=None):
+    """DataFrame bản ghi thô (cột bất kỳ) -> DataFrame đúng STAGING_COLUMNS, đã chuẩn hoá
+    Cột số thiếu giá trị lấy STAGING_DEFAULTS; dimension_* không tách được để NaN (NULL)"""
+    out = pd.DataFrame(index=df.index)
+    for col in TEXT_COLUMNS:
+        out[col] = clean_text(df[col]) if col in df else ''
+    out['url'] = canonicalize_urls(out['url'])
+
+    for col in PRICE_COLUMNS:
+        out[col] = parse_prices(df[col]) if col in df else 0.0
+    for col in ('discount_percent', 'rating'):
+        out[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0) if col in df else 0.0
+    out['weight'] = parse_weight(df['weight']) if 'weight' in df else 0.0
+
+    for col in INT_COLUMNS:
+        values = pd.to_numeric(df[col], errors='coerce') if col in df else pd.Series(np.nan, index=df.index)
+        out[col] = values
+    missing_sold = out['sold_count_numeric'].isna() | (out['sold_count_numeric'] == 0)
+    if missing_sold.any():
+        out.loc[missing_sold, 'sold_count_numeric'] = parse_sold_numeric(out.loc[missing_sold, 'sold_count'])
+    for col in INT_COLUMNS:
+        out[col] = out[col].fillna(STAGING_DEFAULTS[col]).astype('int64')
+
+    out['dimension_width'], out['dimension_height'] = split_dimensions(out['dimensions'])
+
+    if 'time_collect' in df:
+        times = pd.to_datetime(df['time_collect'], errors='coerce')
+        out['time_collect'] = times.dt.strftime(TIME_FORMAT).where(times.notna(), default_time)
+    else:
+        out['time_collect'] = default_time
+    return out[STAGING_COLUMNS]
@@ -0,0 +1,110 @@
+"""
+OUTPUT STORE - LƯU KẾT QUẢ THU THẬP DẠNG APPEND-ONLY
+Mỗi lần chạy ghi 1 file JSON Lines riêng, chia thư mục theo ngày thu thập:
+
+    crawl_output/
+        manifest.jsonl                                  # 1 dòng / lần chạy
+        crawl_date=2025-11-11/run_20251111_203229.jsonl # 1 dòng / sách
+
+- Ghi 1 lần chạy chỉ tốn O(số sách mới): không đọc lại / ghi đè dữ liệu cũ
+- Sách được ghi ra đĩa ngay khi thu thập xong -> bộ nhớ không tăng theo lịch sử
+- Xuất Excel/CSV là bước riêng, chạy khi cần (xem export_books.py)
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+DEFAULT_OUTPUT_DIR = 'crawl_output'
+MANIFEST_FILE = 'manifest.jsonl'
+
+class RunWriter:
+    """Ghi sách của 1 lần chạy vào 1 file JSONL (append, thread-safe)"""
+
+    def __init__(self, root=DEFAULT_OUTPUT_DIR, run_id=None, flush_every=50):
+        self.root = root
+        self.started_at = datetime.now()
+        self.run_id = run_id or self.started_at.strftime('%Y%m%d_%H%M%S')
+        self.crawl_date = self.started_at.strftime('%Y-%m-%d')
+        self.rel_path = os.path.join(f'crawl_date={self.crawl_date}', f'run_{self.run_id}.jsonl')
+        self.path = os.path.join(root, self.rel_path)
+        self.flush_every = flush_every
+        self.rows = 0
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def write(self, book_data):
+        """Ghi 1 sách (1 dòng JSON)"""
+        line = json.dumps(book_data, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self.rows += 1
+            if self.rows % self.flush_every == 0:
+                self._file.flush()
+
+    def close(self, **extra):
+        """Đóng file và ghi 1 dòng vào manifest (file rỗng bị xoá, không ghi manifest)"""
+        with self._lock:
+            if self._closed:
+                return None
+            self._closed = True
+            self._file.close()
+        if self.rows == 0:
+            os.remove(self.path)
+            return None
+        entry = {
+            'run_id': self.run_id,
+            'crawl_date': self.crawl_date,
+            'path': self.rel_path.replace(os.sep, '/'),
+            'rows': self.rows,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        entry.update(extra)
+        with open(os.path.join(self.root, MANIFEST_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return entry
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def read_manifest(root=DEFAULT_OUTPUT_DIR):
+    """Danh sách các lần chạy đã ghi (theo thứ tự thời gian)"""
+    path = os.path.join(root, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def iter_books(root=DEFAULT_OUTPUT_DIR, since=None, until=None):
+    """Duyệt lần lượt từng sách của các lần chạy (lọc theo crawl_date 'YYYY-MM-DD')
+    Chỉ giữ 1 dòng trong bộ nhớ tại 1 thời điểm"""
+    for entry in read_manifest(root):
+        if since and entry['crawl_date'] < since:
+            continue
+        if until and entry['crawl_date'] > until:
+            continue
+        path = os.path.join(root, entry['path'])
+        if not os.path.exists(path):
+            print(f"⚠️  Thiếu file {entry['path']} trong manifest, bỏ qua")
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def import_legacy_json(json_path, root=DEFAULT_OUTPUT_DIR):
+    """Chuyển file JSON cũ (fahasa_all_books.json) thành 1 lần chạy trong output store"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        books = json.load(f)
+    writer = RunWriter(root, run_id='legacy_' + datetime.now().strftime('%Y%m%d_%H%M%S'))
+    for book in books:
+        writer.write(book)
+    return writer.close(source=os.path.basename(json_path))
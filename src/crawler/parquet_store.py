@@ -0,0 +1,191 @@
+"""
+PARQUET STORE - LANDING ZONE PARQUET CHO SNAPSHOT THU THẬP
+    landing/
+        collect_date=2025-11-11/run_20251111_203229.parquet   # 1 file / lần chạy / ngày thu thập
+
+- Schema Arrow cố định theo staging_books (STAGING_SCHEMA): số là số, time_collect là timestamp
+- Nén zstd, lưu theo cột -> nhỏ hơn và đọc nhanh hơn nhiều so với JSON / xlsx
+- Đọc (read_landing) chỉ lấy cột cần và lọc theo collect_date ngay ở tầng Parquet
+  (thư mục ngày nằm ngoài khoảng không bị mở), lọc thêm bằng biểu thức pyarrow.dataset
+    python parquet_store.py fahasa_all_books.json fahasa_complete_books.csv   # chuyển snapshot cũ
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from insert_staging_book import STAGING_COLUMNS, book_to_row
+
+DEFAULT_LANDING_DIR = 'landing'
+PARTITION_COLUMN = 'collect_date'
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+STAGING_SCHEMA = pa.schema([
+    ('title', pa.string()),
+    ('author', pa.string()),
+    ('publisher', pa.string()),
+    ('supplier', pa.string()),
+    ('category_1', pa.string()),
+    ('category_2', pa.string()),
+    ('category_3', pa.string()),
+    ('original_price', pa.float64()),
+    ('discount_price', pa.float64()),
+    ('discount_percent', pa.float64()),
+    ('rating', pa.float64()),
+    ('rating_count', pa.int32()),
+    ('sold_count', pa.string()),
+    ('sold_count_numeric', pa.int32()),
+    ('publish_year', pa.int32()),
+    ('language', pa.string()),
+    ('page_count', pa.int32()),
+    ('weight', pa.float64()),
+    ('dimensions', pa.string()),
+    ('url', pa.string()),
+    ('url_img', pa.string()),
+    ('time_collect', pa.timestamp('s')),
+    ('dimension_width', pa.float64()),
+    ('dimension_height', pa.float64()),
+])
+assert STAGING_SCHEMA.names == STAGING_COLUMNS, "STAGING_SCHEMA phải cùng thứ tự cột với STAGING_COLUMNS"
+
+PARTITIONING = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor='hive')
+
+def _parse_time(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(str(value)[:19], TIME_FORMAT)
+    except ValueError:
+        return None
+
+def _partition_path(root, collect_date, run_id):
+    return os.path.join(root, f'{PARTITION_COLUMN}={collect_date}', f'run_{run_id}.parquet')
+
+class ParquetRunWriter:
+    """Ghi sách của 1 lần chạy thành Parquet theo ngày thu thập (cùng API với output_store.RunWriter)
+    Mỗi batch_rows sách thành 1 row group; mỗi ngày thu thập 1 file (lần chạy qua nửa đêm -> 2 file)"""
+
+    def __init__(self, root=DEFAULT_LANDING_DIR, run_id=None, batch_rows=5000, compression='zstd'):
+        self.root = root
+        self.run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.batch_rows = batch_rows
+        self.compression = compression
+        self.rows = 0
+        self._buffer = []
+        self._writers = {}
+
+    def write(self, book_data):
+        self._buffer.append(book_to_row(book_data))
+        if len(self._buffer) >= self.batch_rows:
+            self.flush()
+
+    def write_table(self, table):
+        """Ghi 1 bảng Arrow đúng STAGING_SCHEMA, tách theo ngày của time_collect"""
+        dates = pc.strftime(table['time_collect'], format='%Y-%m-%d')
+        for collect_date in pc.unique(dates).to_pylist():
+            mask = pc.is_null(dates) if collect_date is None else pc.equal(dates, collect_date)
+            part = table.filter(mask)
+            key = collect_date or 'unknown'
+            writer = self._writers.get(key)
+            if writer is None:
+                path = _partition_path(self.root, key, self.run_id)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                writer = pq.ParquetWriter(path, STAGING_SCHEMA, compression=self.compression)
+                self._writers[key] = writer
+            writer.write_table(part)
+            self.rows += part.num_rows
+
+    def flush(self):
+        if not self._buffer:
+            return
+        columns = list(zip(*self._buffer))
+        self._buffer = []
+        time_idx = STAGING_COLUMNS.index('time_collect')
+        columns[time_idx] = [_parse_time(v) for v in columns[time_idx]]
+        self.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, STAGING_SCHEMA)],
+            schema=STAGING_SCHEMA))
+
+    def close(self):
+        """Ghi phần còn lại, đóng file; trả về list đường dẫn đã ghi"""
+        self.flush()
+        paths = []
+        for key, writer in self._writers.items():
+            writer.close()
+            paths.append(_partition_path(self.root, key, self.run_id))
+        self._writers = {}
+        return paths
+
+def landing_dataset(root=DEFAULT_LANDING_DIR):
+    return ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+
+def read_landing(root=DEFAULT_LANDING_DIR, columns=None, since=None, until=None, filter=None):
+    """DataFrame từ landing zone; since/until: 'YYYY-MM-DD' (theo thư mục collect_date)
+    columns: chỉ đọc các cột này; filter: biểu thức pyarrow.dataset, vd. ds.field('discount_price') > 100000"""
+    expression = filter
+    if since:
+        expression = _and(expression, ds.field(PARTITION_COLUMN) >= since)
+    if until:
+        expression = _and(expression, ds.field(PARTITION_COLUMN) <= until)
+    return landing_dataset(root).to_table(columns=columns, filter=expression).to_pandas()
+
+def _and(left, right):
+    return right if left is None else left & right
+
+def land_file(path, root=DEFAULT_LANDING_DIR, batch_rows=50000):
+    """Chuyển 1 snapshot cũ (JSON / JSONL / CSV / xlsx) sang Parquet; trả về số dòng"""
+    import pandas as pd
+
+    from ingest import iter_records
+    from normalize import normalize_frame
+
+    # Giữ đuôi file trong run_id: a.json / a.csv / a.xlsx không ghi đè cùng 1 file run_a.parquet
+    stem, ext = os.path.splitext(os.path.basename(path))
+    run_id = f"{stem}_{ext.lstrip('.')}" if ext else stem
+    default_time = datetime.fromtimestamp(os.path.getmtime(path)).strftime(TIME_FORMAT)
+    writer = ParquetRunWriter(root, run_id=run_id)
+    batch = []
+
+    def write_batch():
+        frame = normalize_frame(pd.DataFrame.from_records(batch), default_time)
+        frame['time_collect'] = pd.to_datetime(frame['time_collect'], errors='coerce')
+        writer.write_table(pa.Table.from_pandas(frame, schema=STAGING_SCHEMA, preserve_index=False))
+
+    for record in iter_records(path):
+        batch.append(record)
+        if len(batch) >= batch_rows:
+            write_batch()
+            batch = []
+    if batch:
+        write_batch()
+    writer.close()
+    return writer.rows
+
+def _dir_size(paths):
+    return sum(os.path.getsize(p) for p in paths)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Cách dùng: python parquet_store.py <file snapshot> [...]")
+        sys.exit(1)
+    LANDING_DIR = DEFAULT_LANDING_DIR
+
+    for source in sys.argv[1:]:
+        start = time.time()
+        rows = land_file(source, LANDING_DIR)
+        print(f"🪂 {source}: {rows} dòng -> {LANDING_DIR} ({time.time() - start:.1f}s)")
+
+    parquet_files = [f.path for f in landing_dataset(LANDING_DIR).get_fragments()]
+    source_mb = _dir_size(sys.argv[1:]) / 1024 / 1024
+    parquet_mb = _dir_size(parquet_files) / 1024 / 1024
+    start = time.time()
+    df = read_landing(LANDING_DIR)
+    print(f"📦 Nguồn {source_mb:.2f}MB | landing {parquet_mb:.2f}MB ({len(parquet_files)} file) | "
+          f"đọc lại {len(df)} dòng trong {time.time() - start:.2f}s")
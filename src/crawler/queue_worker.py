@@ -0,0 +1,178 @@
+"""
+QUEUE WORKER - WORKER THU THẬP CHẠY TRÊN WORK QUEUE (POSTGRESQL)
+Chạy bao nhiêu process tuỳ ý, trên 1 hay nhiều máy, cùng trỏ vào 1 database staging:
+    python queue_worker.py seed 50 24   # đưa 50 trang danh mục (24 sách/trang) vào hàng đợi
+    python queue_worker.py seed 5 24 all  # 5 trang của mọi danh mục lá (category_tree.py)
+    python queue_worker.py reset        # xoá toàn bộ hàng đợi (kể cả việc done/dead) trước đợt mới
+    python queue_worker.py              # worker: lấy trang danh mục / sản phẩm cho đến khi hết việc
+Seed lại đưa trang danh mục đã xong về pending; sản phẩm đã xong > 24h được trang danh mục đưa lại
+Mỗi worker có rate limiter riêng -> tổng tốc độ tăng theo số worker, cần chỉnh max_rate cho phù hợp
+"""
+
+import os
+import sys
+import time
+
+from category_tree import leaf_categories, load_category_tree
+from change_detector import ChangeDetector
+from crawl_log import LISTING as LOG_LISTING, PRODUCT as LOG_PRODUCT, CrawlLogger
+from fahasa_bulk_scraper import (CATEGORY_NAME, CATEGORY_URL, ENGINES, SESSION_MAX_PAGES, SESSION_MAX_RSS_MB,
+                                 listing_page_url)
+from http_engine import create_http_session, fetch_html
+from insert_staging_book import StagingWriter
+from output_store import DEFAULT_OUTPUT_DIR, RunWriter
+from rate_limiter import AdaptiveRateLimiter
+from session_manager import ManagedSession
+from work_queue import LISTING, PRODUCT, WorkQueue
+from worker_pool import close_client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.url_utils import canonicalize_url
+
+def seed_listing_pages(queue, max_pages, books_per_page, category_urls=(CATEGORY_URL,)):
+    """Đưa các trang danh mục 1..max_pages vào hàng đợi (trang đầu ưu tiên cao hơn)
+    Nhiều danh mục: cùng số trang -> cùng độ ưu tiên, worker lấy xoay vòng trang p của mọi danh mục"""
+    added = 0
+    for page in range(1, max_pages + 1):
+        urls = [listing_page_url(page, books_per_page, category_url) for category_url in category_urls]
+        added += queue.enqueue(LISTING, urls, priority=max_pages - page, requeue_after_hours=0)
+    total = max_pages * len(category_urls)
+    print(f"🌱 Đã thêm {added}/{total} trang danh mục vào hàng đợi: {queue.get_statistics()}")
+    return added
+
+def discover_leaf_urls():
+    """URL mọi danh mục lá dưới CATEGORY_URL (khám phá bằng HTTP hoặc đọc cache còn hạn)"""
+    session = create_http_session()
+    limiter = AdaptiveRateLimiter(initial_rate=0.5, min_rate=0.1, max_rate=2.0)
+    try:
+        tree = load_category_tree(lambda url: limiter.call(fetch_html, session, url), CATEGORY_URL, CATEGORY_NAME)
+    finally:
+        session.close()
+    return [leaf['url'] for leaf in leaf_categories(tree)]
+
+def run_worker(engine='http', batch_size=5, lease_seconds=300, poll_interval=10.0,
+               output_dir=DEFAULT_OUTPUT_DIR):
+    """Lấy việc cho đến khi hàng đợi không còn pending/leased
+
+    Ưu tiên sản phẩm trước trang danh mục để hàng đợi không phình to.
+    Lease được gia hạn trước mỗi sách nên batch_size * thời gian/sách có thể vượt lease_seconds.
+    """
+    create_client, fetch_listing, _, fetch_book = ENGINES[engine]
+    queue = WorkQueue(lease_seconds=lease_seconds)
+    limiter = AdaptiveRateLimiter(initial_rate=0.5, min_rate=0.1, max_rate=2.0)
+    print(f"👷 Worker {queue.worker_id} | ⚙️ Engine: {engine}")
+
+    client = ManagedSession(create_client, max_pages=SESSION_MAX_PAGES, max_rss_mb=SESSION_MAX_RSS_MB).start()
+    crawl_logger = CrawlLogger(engine, category='queue', page_range=queue.worker_id)
+    staging_writer = StagingWriter(batch_size=100, flush_interval=10.0, crawl_logger=crawl_logger)
+    change_detector = ChangeDetector()
+    run_writer = RunWriter(output_dir)
+    collected = 0
+    run_status, run_error = None, None
+
+    try:
+        while True:
+            items = queue.claim(PRODUCT, batch_size)
+            if items:
+                for i, (item_id, book_url, _, attempts) in enumerate(items):
+                    if i:
+                        queue.extend([item[0] for item in items[i:]])
+                    crawl_logger.begin(LOG_PRODUCT, book_url, attempt=attempts)
+                    try:
+                        book_data = limiter.call(client.call, fetch_book, book_url)
+                    except Exception as e:
+                        crawl_logger.end(success=False, error=e)
+                        print(f"    ❌ Lỗi tải trang: {str(e)[:100]} ({queue.fail(item_id, e)})")
+                        continue
+                    if not book_data:
+                        crawl_logger.end(success=False, error='Không lấy được dữ liệu hoặc không có giá')
+                        status = queue.fail(item_id, 'Không lấy được dữ liệu hoặc không có giá')
+                        print(f"    ❌ Không lấy được dữ liệu: {book_url} ({status})")
+                        continue
+                    # Gia hạn = kiểm tra còn giữ lease: đã bị thu hồi thì worker khác sẽ ghi, bỏ kết quả
+                    if not queue.extend([item_id]):
+                        crawl_logger.end(success=False, error='Lease đã bị thu hồi')
+                        print(f"    ⚠️ Lease đã bị thu hồi, bỏ qua kết quả: {book_url}")
+                        continue
+                    if change_detector.check(book_url, book_data):
+                        staging_writer.add(book_data)
+                    crawl_logger.end(success=True)
+                    run_writer.write(book_data)
+                    queue.complete(item_id)
+                    collected += 1
+                    print(f"    ✅ {book_data['title'][:50]}...")
+                continue
+
+            listings = queue.claim(LISTING, 1)
+            if listings:
+                item_id, listing_url, _, attempts = listings[0]
+                print(f"\n🌐 Trang danh mục: {listing_url}")
+                crawl_logger.begin(LOG_LISTING, listing_url, attempt=attempts)
+                try:
+                    product_urls = limiter.call(client.call, fetch_listing, listing_url)
+                except Exception as e:
+                    crawl_logger.end(success=False, error=e)
+                    print(f"❌ Lỗi tải trang danh mục: {e} ({queue.fail(item_id, e)})")
+                    continue
+                crawl_logger.end(success=bool(product_urls), found=len(product_urls or []))
+                if not product_urls:
+                    print(f"❌ Không tìm thấy sản phẩm ({queue.fail(item_id, 'Không tìm thấy sản phẩm')})")
+                    continue
+                urls = list(dict.fromkeys(canonicalize_url(u) for u in product_urls))
+                added = queue.enqueue(PRODUCT, urls, parent_url=listing_url)
+                queue.complete(item_id)
+                print(f"🔗 {added}/{len(urls)} sản phẩm mới vào hàng đợi")
+                continue
+
+            if not queue.has_work():
+                print("✅ Hàng đợi đã hết việc")
+                break
+            # Còn việc đang lease bởi worker khác hoặc chờ đến hạn retry
+            time.sleep(poll_interval)
+
+    except KeyboardInterrupt:
+        print("\n⚠️  Người dùng dừng worker (việc đang lease sẽ được thu hồi khi hết hạn)")
+        run_status, run_error = 'PARTIAL', 'Người dùng dừng worker'
+    except Exception as e:
+        run_status, run_error = 'FAILED', str(e)
+        raise
+    finally:
+        close_client(client)
+        staging_ok = False
+        try:
+            staging_writer.close()
+            staging_ok = True
+            print(f"🟢 staging_books: đã ghi {staging_writer.total_written} dòng")
+        except Exception as e:
+            print(f"🔴 Lỗi flush staging_books: {e}")
+        try:
+            change_detector.close(commit=staging_ok)
+            print(f"🔐 Thay đổi: {change_detector.changed} | Không đổi (heartbeat): {change_detector.unchanged}")
+        except Exception as e:
+            print(f"🔴 Lỗi ghi product_state: {e}")
+        try:
+            crawl_logger.close(run_status, run_error)
+        except Exception as e:
+            print(f"🔴 Lỗi ghi crawl_log: {e}")
+        run_writer.close(engine=engine, mode='queue', worker_id=queue.worker_id)
+        print(f"📊 Worker {queue.worker_id}: {collected} sách | 🚦 {limiter.metrics()} | 🧠 {client.stats}")
+        print(f"📋 Hàng đợi: {queue.get_statistics()}")
+
+
+if __name__ == "__main__":
+    # CẤU HÌNH WORKER
+    ENGINE = 'http'  # 'selenium', 'selenium_js', 'selenium_lean' hoặc 'http'
+    BATCH_SIZE = 5
+    LEASE_SECONDS = 300
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'seed':
+        max_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        books_per_page = int(sys.argv[3]) if len(sys.argv) > 3 else 24
+        category_urls = discover_leaf_urls() if len(sys.argv) > 4 and sys.argv[4] == 'all' else (CATEGORY_URL,)
+        seed_listing_pages(WorkQueue(), max_pages, books_per_page, category_urls)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'reset':
+        queue = WorkQueue()
+        queue.reset()
+        print(f"🧹 Đã xoá hàng đợi: {queue.get_statistics()}")
+    else:
+        run_worker(ENGINE, BATCH_SIZE, LEASE_SECONDS)
@@ -0,0 +1,119 @@
+"""
+ADAPTIVE RATE LIMITER - GIỚI HẠN TỐC ĐỘ THU THẬP THÍCH ỨNG
+Token bucket dùng chung cho mọi worker, thay cho time.sleep(random.uniform(...)) cố định
+Tốc độ tự điều chỉnh theo phản hồi của server (AIMD):
+    - phản hồi nhanh, liên tục thành công -> tăng dần tốc độ (cộng)
+    - phản hồi chậm -> giảm nhẹ
+    - lỗi HTTP / timeout -> giảm mạnh (nhân)
+"""
+
+import threading
+import time
+
+from requests.exceptions import Timeout as RequestsTimeout
+from selenium.common.exceptions import TimeoutException as SeleniumTimeout
+
+class AdaptiveRateLimiter:
+    def __init__(self, initial_rate=0.5, min_rate=0.1, max_rate=2.0, burst=2,
+                 increase_step=0.05, slow_factor=0.9, backoff_factor=0.5,
+                 target_latency=5.0, healthy_streak=5):
+        """
+        *_rate: số request/giây cho TOÀN BỘ crawler (mọi worker)
+        burst: số token tối đa tích luỹ được
+        target_latency: phản hồi chậm hơn ngưỡng này (giây) bị coi là server đang quá tải
+        healthy_streak: số lần thành công liên tiếp trước mỗi lần tăng tốc độ
+        """
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase_step = increase_step
+        self.slow_factor = slow_factor
+        self.backoff_factor = backoff_factor
+        self.target_latency = target_latency
+        self.healthy_streak = healthy_streak
+
+        self._lock = threading.Lock()
+        self._rate = min(max(initial_rate, min_rate), max_rate)
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._streak = 0
+        self._stats = {'requests': 0, 'successes': 0, 'errors': 0, 'timeouts': 0,
+                       'latency_total': 0.0, 'wait_total': 0.0}
+
+    @property
+    def current_rate(self):
+        """Tốc độ hiện tại (request/giây)"""
+        return self._rate
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._tokens = min(self.burst, self._tokens + elapsed * self._rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """Chờ đến khi có token; trả về số giây đã chờ"""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    waited = now - start
+                    self._stats['requests'] += 1
+                    self._stats['wait_total'] += waited
+                    return waited
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+    def _set_rate(self, rate):
+        self._rate = min(max(rate, self.min_rate), self.max_rate)
+
+    def record_success(self, latency):
+        """Ghi nhận 1 request thành công với độ trễ latency (giây)"""
+        with self._lock:
+            self._stats['successes'] += 1
+            self._stats['latency_total'] += latency
+            if latency > self.target_latency:
+                self._streak = 0
+                self._set_rate(self._rate * self.slow_factor)
+                return
+            self._streak += 1
+            if self._streak >= self.healthy_streak:
+                self._streak = 0
+                self._set_rate(self._rate + self.increase_step)
+
+    def record_error(self, timeout=False):
+        """Ghi nhận lỗi HTTP / timeout -> giảm tốc độ ngay"""
+        with self._lock:
+            self._stats['timeouts' if timeout else 'errors'] += 1
+            self._streak = 0
+            self._set_rate(self._rate * self.backoff_factor)
+
+    def call(self, fn, *args, **kwargs):
+        """Gọi fn sau khi lấy token, tự ghi nhận độ trễ / lỗi; exception được raise lại"""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except (RequestsTimeout, SeleniumTimeout):
+            self.record_error(timeout=True)
+            raise
+        except Exception:
+            self.record_error()
+            raise
+        self.record_success(time.monotonic() - start)
+        return result
+
+    def metrics(self):
+        """Số liệu hiện tại: tốc độ, số request, lỗi, độ trễ TB, tổng thời gian chờ token"""
+        with self._lock:
+            stats = dict(self._stats)
+            rate = self._rate
+        successes = stats.pop('successes')
+        latency_total = stats.pop('latency_total')
+        stats['rate'] = round(rate, 3)
+        stats['successes'] = successes
+        stats['avg_latency'] = round(latency_total / successes, 3) if successes else 0.0
+        stats['wait_total'] = round(stats['wait_total'], 1)
+        return stats
@@ -0,0 +1,96 @@
+"""
+REPARSE CACHE - PARSE LẠI HTML ĐÃ LƯU VÀ NẠP LẠI STAGING (KHÔNG CẦN CRAWL LẠI)
+Dùng sau khi sửa selector trong book_parser:
+    python reparse_cache.py                 # parse lại mọi bản trong cache
+    python reparse_cache.py 2025-11-01      # chỉ các trang lưu từ ngày này
+    python reparse_cache.py 2025-11-01 d:/crawl/category_tree.json   # cây danh mục của lần crawl
+Parse song song trên mọi nhân CPU (multiprocessing.Pool); mỗi sách giữ time_collect = fetched_at
+nên upsert (url, time_collect) ghi đè đúng dòng staging_books của lần crawl gốc
+
+Chỉ áp dụng selector lxml (book_parser.extract_raw_lxml - engine 'http' và FetchParsePipeline).
+Selector của engine Selenium (extract_book_selenium, dom_extract) chạy trên trình duyệt, không chạy
+lại trên HTML đã lưu -> sửa selector ở đó thì sửa tương ứng trong extract_raw_lxml rồi mới parse lại.
+
+Category: parse_book_html gán category_1/2/3 theo cây danh mục (category_tree.resolve_categories) như lúc
+crawl -> upsert không thay tên theo cây bằng text breadcrumb; chạy ở thư mục có category_tree.json
+hoặc truyền tree_path (không có cây thì mọi đường thu thập đều dùng breadcrumb)
+
+Kết quả đi qua ChangeDetector theo thứ tự fetched_at của từng URL: bản giống bản trước không tạo dòng
+staging (như lúc crawl), product_state nhận content hash theo parser mới
+"""
+
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from book_parser import parse_book_html
+from category_tree import DEFAULT_TREE_PATH, use_tree_path
+from html_cache import HtmlCache, load_html, stamp_time_collect
+from change_detector import ChangeDetector
+from insert_staging_book import StagingWriter
+
+def parse_entry(entry):
+    """Chạy trong process con: (url, fetched_at, blob_path) -> (url, fetched_at, sách hoặc None, lỗi)"""
+    url, fetched_at, blob_path = entry
+    try:
+        book = parse_book_html(load_html(blob_path), url)
+        return url, fetched_at, stamp_time_collect(book, fetched_at), None
+    except Exception as e:
+        return url, fetched_at, None, str(e)
+
+def reparse_cache(cache_dir='html_cache', since=None, latest_only=False, processes=None,
+                  chunksize=20, dry_run=False, tree_path=DEFAULT_TREE_PATH):
+    """Parse lại cache và upsert staging_books; trả về dict thống kê"""
+    # Đặt trước khi tạo Pool -> process con gán category theo cùng cây với lúc crawl
+    use_tree_path(tree_path)
+    if not os.path.exists(tree_path):
+        print(f"⚠️ Không có cây danh mục {tree_path}: category lấy từ breadcrumb")
+    cache = HtmlCache(cache_dir)
+    entries = cache.entries(since=since, latest_only=latest_only)
+    cache.close()
+    processes = processes or os.cpu_count()
+    print(f"🔁 Parse lại {len(entries)} trang bằng {processes} process...")
+
+    stats = {'pages': len(entries), 'parsed': 0, 'empty': 0, 'errors': 0, 'unchanged': 0}
+    writer = None if dry_run else StagingWriter(batch_size=500, flush_interval=30.0)
+    detector = None if dry_run else ChangeDetector()
+    start = time.time()
+    try:
+        with Pool(processes) as pool:
+            # imap giữ thứ tự fetched_at -> ChangeDetector so mỗi bản với bản trước đó của cùng URL
+            for i, (url, fetched_at, book, error) in enumerate(pool.imap(parse_entry, entries, chunksize), 1):
+                if error:
+                    stats['errors'] += 1
+                    print(f"    ❌ {url}: {error[:100]}")
+                elif book is None:
+                    stats['empty'] += 1
+                else:
+                    stats['parsed'] += 1
+                    if detector and not detector.check(url, book, seen_at=fetched_at):
+                        stats['unchanged'] += 1
+                    elif writer:
+                        writer.add(book)
+                if i % 1000 == 0:
+                    print(f"    ⏳ {i}/{len(entries)} trang ({i / (time.time() - start):.0f} trang/s)")
+    finally:
+        staging_ok = False
+        try:
+            if writer:
+                writer.close()
+                staging_ok = True
+        finally:
+            # product_state chỉ nhận hash mới khi staging đã flush thành công (như lúc crawl)
+            if detector:
+                detector.close(commit=staging_ok)
+    stats['seconds'] = round(time.time() - start, 1)
+    if writer:
+        stats['written'] = writer.total_written
+    return stats
+
+
+if __name__ == '__main__':
+    SINCE = sys.argv[1] if len(sys.argv) > 1 else None
+    TREE_PATH = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_TREE_PATH
+    stats = reparse_cache(since=SINCE, tree_path=TREE_PATH)
+    print(f"✅ Parse lại xong: {stats}")
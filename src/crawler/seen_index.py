@@ -0,0 +1,76 @@
+"""
+SEEN INDEX - TẬP URL ĐÃ THU THẬP (LƯU TRÊN ĐĨA)
+Kiểm tra TRƯỚC khi driver.get: URL đã crawl trong lần chạy này hoặc lần chạy trước
+(trong cửa sổ freshness) thì bỏ qua, không tải lại trang
+
+File: mỗi dòng "<khoá 64-bit hex>\t<epoch lần thấy cuối>", ghi nối tiếp (append-only);
+compact() gộp về 1 dòng/URL, sắp xếp theo khoá và bỏ các bản ghi đã hết hạn
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.url_utils import url_key
+
+class SeenIndex:
+    def __init__(self, path="seen_urls.tsv", fresh_hours=24):
+        self.path = path
+        self.fresh_seconds = fresh_hours * 3600
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._load()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    key_hex, ts = line.rstrip('\n').split('\t')
+                    key, ts = int(key_hex, 16), float(ts)
+                except ValueError:
+                    continue  # dòng hỏng do crash giữa chừng
+                if ts > self._seen.get(key, 0):
+                    self._seen[key] = ts
+        print(f"👁️ Seen index: {len(self._seen)} URL đã biết")
+
+    def is_fresh(self, url, now=None):
+        """URL đã được thu thập trong cửa sổ freshness?"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            ts = self._seen.get(url_key(url))
+        return ts is not None and now - ts < self.fresh_seconds
+
+    def add(self, url, now=None):
+        """Ghi nhận URL vừa thu thập xong"""
+        now = now if now is not None else time.time()
+        key = url_key(url)
+        with self._lock:
+            self._seen[key] = now
+            self._file.write(f"{key:016x}\t{now:.0f}\n")
+            self._file.flush()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def compact(self, now=None):
+        """Viết lại file: 1 dòng/URL, sắp xếp theo khoá, bỏ bản ghi hết hạn"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._seen = {k: ts for k, ts in self._seen.items() if now - ts < self.fresh_seconds}
+            self._file.close()
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for key in sorted(self._seen):
+                    f.write(f"{key:016x}\t{self._seen[key]:.0f}\n")
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        self.compact()
+        with self._lock:
+            self._file.close()
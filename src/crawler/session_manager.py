@@ -0,0 +1,131 @@
+"""
+SESSION MANAGER - VÒNG ĐỜI TRÌNH DUYỆT CHO CRAWL DÀI NGÀY
+ManagedSession bọc 1 client (WebDriver / HTTP session) và tự tạo lại client khi:
+    - đã tải max_pages trang (Chrome phình bộ nhớ theo số trang đã mở)
+    - RSS của cây process Chrome vượt max_rss_mb (đọc /proc, chỉ Linux; xem client_pid)
+    - trình duyệt crash hoặc trang bị treo (WebDriverException, gồm TimeoutException của
+      set_page_load_timeout) -> lỗi vẫn được raise để rate limiter / frontier ghi nhận và retry sau
+Mỗi session chỉ dùng trong 1 thread (worker pool / pipeline tạo 1 session cho mỗi worker)
+"""
+
+import os
+
+from selenium.common.exceptions import WebDriverException
+
+from worker_pool import close_client
+
+MAX_PAGES = 200
+MAX_RSS_MB = 1500
+RSS_CHECK_EVERY = 10  # đọc /proc mỗi N trang
+
+def _ppid_map():
+    """pid -> ppid của mọi process (/proc/<pid>/stat)"""
+    parents = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        fields = stat[stat.rfind(')') + 2:].split()  # tên process có thể chứa dấu cách
+        parents[int(name)] = int(fields[1])
+    return parents
+
+def _rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def process_tree_rss_mb(pid):
+    """Tổng RSS (MB) của process và mọi process con; None nếu không có /proc"""
+    if not pid or not os.path.isdir('/proc'):
+        return None
+    parents = _ppid_map()
+    tree, frontier = {pid}, [pid]
+    while frontier:
+        parent = frontier.pop()
+        for child, ppid in parents.items():
+            if ppid == parent and child not in tree:
+                tree.add(child)
+                frontier.append(child)
+    return sum(_rss_kb(p) for p in tree) / 1024
+
+def client_pid(client):
+    """pid gốc của cây process trình duyệt; None với HTTP session (bỏ qua kiểm tra RSS)
+
+    Chrome tự khởi động: chromedriver (Chrome là process con).
+    Chrome mượn của browser service (LeasedChrome): Chrome là con của service, không phải của
+    chromedriver gắn vào nó -> dùng pid Chrome do service trả về khi lease (service chạy cùng máy).
+    Service cũ không trả pid -> None, không đo RSS.
+    """
+    lease = getattr(client, 'lease', None)
+    if lease is not None:
+        return lease.get('pid')
+    service = getattr(client, 'service', None)
+    process = getattr(service, 'process', None)
+    return getattr(process, 'pid', None)
+
+class ManagedSession:
+    def __init__(self, client_factory, max_pages=MAX_PAGES, max_rss_mb=MAX_RSS_MB,
+                 rss_check_every=RSS_CHECK_EVERY):
+        self.client_factory = client_factory
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.rss_check_every = rss_check_every
+        self.client = None
+        self.pages = 0
+        self.stats = {'pages': 0, 'recycled': 0, 'restarted': 0, 'peak_rss_mb': 0}
+
+    def start(self):
+        """Tạo client ngay (để lỗi khởi tạo lộ ra lúc setup); trả về chính session"""
+        if self.client is None:
+            self.client = self.client_factory()
+            self.pages = 0
+        return self
+
+    def call(self, fn, *args):
+        """fn(client, *args) rồi kiểm tra giới hạn; trình duyệt lỗi -> bỏ client, raise lại lỗi"""
+        self.start()
+        try:
+            result = fn(self.client, *args)
+        except WebDriverException as e:
+            print(f"    🔁 Trình duyệt lỗi/treo, khởi động lại session: {str(e).strip()[:80]}")
+            self.stats['restarted'] += 1
+            self.reset()
+            raise
+        self.pages += 1
+        self.stats['pages'] += 1
+        self._check_limits()
+        return result
+
+    def _check_limits(self):
+        reason = None
+        if self.max_pages and self.pages >= self.max_pages:
+            reason = f"đã tải {self.pages} trang"
+        elif self.max_rss_mb and self.pages % self.rss_check_every == 0:
+            rss = process_tree_rss_mb(client_pid(self.client))
+            if rss is not None:
+                self.stats['peak_rss_mb'] = max(self.stats['peak_rss_mb'], round(rss))
+                if rss > self.max_rss_mb:
+                    reason = f"RSS {rss:.0f}MB > {self.max_rss_mb}MB"
+        if reason:
+            print(f"    ♻️ Tạo lại session ({reason})")
+            self.stats['recycled'] += 1
+            self.reset()
+
+    def reset(self):
+        """Đóng client hiện tại; lần gọi sau tạo client mới"""
+        if self.client is not None and hasattr(self.client, 'recycle_on_release'):
+            self.client.recycle_on_release = True  # browser service khởi động lại Chrome trước khi cho mượn tiếp
+        close_client(self.client)
+        self.client = None
+
+    def close(self):
+        self.reset()
@@ -0,0 +1,201 @@
+"""
+WORK QUEUE - HÀNG ĐỢI THU THẬP PHÂN TÁN TRÊN POSTGRESQL
+Nhiều process / nhiều máy cùng lấy việc từ bảng crawl_queue mà không trùng nhau:
+    - claim(): SELECT ... FOR UPDATE SKIP LOCKED -> mỗi dòng chỉ 1 worker giữ lease
+    - lease có hạn (lease_expires_at); worker crash -> lease hết hạn và được trả lại hàng đợi
+    - complete()/fail() chỉ có hiệu lực khi worker vẫn đang giữ lease (tránh ghi đè của worker khác)
+    - enqueue() URL đã done/dead quá requeue_after_hours -> đưa lại pending (đợt thu thập mới)
+Dùng chung database staging (src/db/connection.py)
+"""
+
+import os
+import socket
+import sys
+
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import get_cursor
+
+QUEUE_DB = 'staging'
+
+LISTING = 'listing'
+PRODUCT = 'product'
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+DEAD = 'dead'   # đã hết số lần thử
+
+def default_worker_id():
+    """Định danh worker: host:pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class WorkQueue:
+    def __init__(self, worker_id=None, lease_seconds=300, max_attempts=3, base_backoff=30,
+                 requeue_after_hours=24):
+        """
+        lease_seconds: thời gian giữ 1 việc; quá hạn mà chưa complete -> worker khác được lấy lại
+        max_attempts: số lần thử tối đa (tính cả lần lease hết hạn do worker crash)
+        base_backoff: giây chờ trước lần thử lại đầu, nhân đôi sau mỗi lần lỗi
+        requeue_after_hours: URL done/dead cũ hơn ngưỡng này được enqueue() đưa lại pending
+        """
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.requeue_after_hours = requeue_after_hours
+        self.create_table()
+
+    def create_table(self):
+        """Tạo bảng crawl_queue nếu chưa có"""
+        with get_cursor(QUEUE_DB) as cur:
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_queue (
+                    id BIGSERIAL PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    parent_url TEXT,
+                    priority INTEGER DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    available_at TIMESTAMPTZ DEFAULT NOW(),
+                    lease_owner TEXT,
+                    lease_expires_at TIMESTAMPTZ,
+                    last_error TEXT,
+                    created_at TIMESTAMPTZ DEFAULT NOW(),
+                    updated_at TIMESTAMPTZ DEFAULT NOW(),
+                    UNIQUE(kind, url)
+                );
+                CREATE INDEX IF NOT EXISTS idx_crawl_queue_claim
+                    ON crawl_queue(kind, priority DESC, id) WHERE status = 'pending';
+                CREATE INDEX IF NOT EXISTS idx_crawl_queue_lease
+                    ON crawl_queue(lease_expires_at) WHERE status = 'leased';
+            ''')
+
+    # ---------- Đưa việc vào hàng đợi ----------
+
+    def enqueue(self, kind, urls, parent_url=None, priority=0, requeue_after_hours=None):
+        """Thêm URL; trả về số dòng mới hoặc được đưa lại pending
+
+        URL đang pending/leased, hoặc done/dead chưa quá requeue_after_hours (mặc định của queue)
+        -> bỏ qua. requeue_after_hours=0: luôn thu thập lại URL đã xong (seed đợt mới)
+        """
+        if not urls:
+            return 0
+        if requeue_after_hours is None:
+            requeue_after_hours = self.requeue_after_hours
+        with get_cursor(QUEUE_DB) as cur:
+            requeue_before = cur.mogrify('NOW() - make_interval(secs => %s)',
+                                         (requeue_after_hours * 3600,)).decode()
+            rows = execute_values(cur, '''
+                INSERT INTO crawl_queue (kind, url, parent_url, priority) VALUES %s
+                ON CONFLICT (kind, url) DO UPDATE
+                SET status = 'pending', attempts = 0, available_at = NOW(),
+                    priority = EXCLUDED.priority,
+                    parent_url = COALESCE(EXCLUDED.parent_url, crawl_queue.parent_url),
+                    last_error = NULL, updated_at = NOW()
+                WHERE crawl_queue.status IN ('done', 'dead') AND crawl_queue.updated_at <= ''' + requeue_before + '''
+                RETURNING id
+            ''', [(kind, u, parent_url, priority) for u in urls], fetch=True)
+        return len(rows)
+
+    # ---------- Lấy việc (lease) ----------
+
+    def reclaim_expired(self):
+        """Lease hết hạn (worker crash / treo) -> trả lại pending, hoặc dead nếu hết lượt thử"""
+        with get_cursor(QUEUE_DB) as cur:
+            cur.execute('''
+                UPDATE crawl_queue
+                SET status = CASE WHEN attempts >= %s THEN %s ELSE %s END,
+                    lease_owner = NULL, lease_expires_at = NULL,
+                    last_error = 'lease hết hạn (' || lease_owner || ')', updated_at = NOW()
+                WHERE status = %s AND lease_expires_at < NOW()
+            ''', (self.max_attempts, DEAD, PENDING, LEASED))
+            reclaimed = cur.rowcount
+        if reclaimed:
+            print(f"♻️ Work queue: thu hồi {reclaimed} lease hết hạn")
+        return reclaimed
+
+    def claim(self, kind, limit=1):
+        """Lease tối đa limit việc loại kind; trả về list (id, url, parent_url, attempts)"""
+        self.reclaim_expired()
+        with get_cursor(QUEUE_DB) as cur:
+            cur.execute('''
+                WITH picked AS (
+                    SELECT id FROM crawl_queue
+                    WHERE kind = %s AND status = %s AND available_at <= NOW()
+                    ORDER BY priority DESC, id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE crawl_queue q
+                SET status = %s, lease_owner = %s,
+                    lease_expires_at = NOW() + make_interval(secs => %s),
+                    attempts = q.attempts + 1, updated_at = NOW()
+                FROM picked
+                WHERE q.id = picked.id
+                RETURNING q.id, q.url, q.parent_url, q.attempts
+            ''', (kind, PENDING, limit, LEASED, self.worker_id, self.lease_seconds))
+            return sorted(cur.fetchall())
+
+    def extend(self, item_ids):
+        """Gia hạn lease cho việc đang làm lâu (heartbeat); trả về số việc worker vẫn đang giữ"""
+        if not item_ids:
+            return 0
+        with get_cursor(QUEUE_DB) as cur:
+            cur.execute('''
+                UPDATE crawl_queue
+                SET lease_expires_at = NOW() + make_interval(secs => %s), updated_at = NOW()
+                WHERE id = ANY(%s) AND status = %s AND lease_owner = %s
+            ''', (self.lease_seconds, list(item_ids), LEASED, self.worker_id))
+            return cur.rowcount
+
+    # ---------- Kết quả ----------
+
+    def complete(self, item_id):
+        """Đánh dấu xong; False nếu lease đã bị worker khác lấy lại"""
+        with get_cursor(QUEUE_DB) as cur:
+            cur.execute('''
+                UPDATE crawl_queue
+                SET status = %s, lease_owner = NULL, lease_expires_at = NULL,
+                    last_error = NULL, updated_at = NOW()
+                WHERE id = %s AND status = %s AND lease_owner = %s
+            ''', (DONE, item_id, LEASED, self.worker_id))
+            return cur.rowcount == 1
+
+    def fail(self, item_id, error=''):
+        """Ghi lỗi: backoff lũy thừa rồi thử lại, hoặc dead khi hết lượt; trả về trạng thái mới"""
+        with get_cursor(QUEUE_DB) as cur:
+            cur.execute('''
+                UPDATE crawl_queue
+                SET status = CASE WHEN attempts >= %s THEN %s ELSE %s END,
+                    available_at = NOW() + make_interval(secs => %s * power(2, attempts - 1)),
+                    lease_owner = NULL, lease_expires_at = NULL,
+                    last_error = %s, updated_at = NOW()
+                WHERE id = %s AND status = %s AND lease_owner = %s
+                RETURNING status
+            ''', (self.max_attempts, DEAD, PENDING, self.base_backoff, str(error)[:500],
+                  item_id, LEASED, self.worker_id))
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    # ---------- Thống kê / quản lý ----------
+
+    def get_statistics(self):
+        """Số việc theo (kind, status)"""
+        with get_cursor(QUEUE_DB, commit=False) as cur:
+            cur.execute('SELECT kind, status, COUNT(*) FROM crawl_queue GROUP BY kind, status')
+            return {f"{kind}/{status}": count for kind, status, count in cur.fetchall()}
+
+    def has_work(self):
+        """Còn việc pending hoặc đang được lease (kể cả chưa đến hạn retry)?"""
+        with get_cursor(QUEUE_DB, commit=False) as cur:
+            cur.execute('SELECT EXISTS (SELECT 1 FROM crawl_queue WHERE status IN (%s, %s))',
+                        (PENDING, LEASED))
+            return cur.fetchone()[0]
+
+    def reset(self):
+        """Xoá toàn bộ hàng đợi (bắt đầu đợt thu thập mới)"""
+        with get_cursor(QUEUE_DB) as cur:
+            cur.execute('TRUNCATE crawl_queue RESTART IDENTITY')
@@ -0,0 +1,115 @@
+"""
+WORKER POOL - THU THẬP SONG SONG
+Nhiều worker (mỗi worker một trình duyệt riêng) cùng lấy URL sản phẩm từ một hàng đợi chung
+"""
+
+import queue
+import random
+import threading
+import time
+
+
+def close_client(client):
+    """Đóng WebDriver (quit) hoặc HTTP session (close)"""
+    if client is None:
+        return
+    try:
+        if hasattr(client, 'quit'):
+            client.quit()
+        else:
+            client.close()
+    except Exception:
+        pass
+
+class BrowserWorkerPool:
+    """Pool N worker, mỗi worker giữ một client riêng (WebDriver hoặc HTTP session)
+    và chạy task_fn(client, url)"""
+
+    def __init__(self, driver_factory, task_fn, num_workers=4, delay_range=(2, 4), on_result=None):
+        """
+        driver_factory: hàm tạo client mới (WebDriver / HTTP session), gọi trong thread của worker
+        task_fn: hàm xử lý 1 URL, ví dụ get_book_details(driver, url)
+        num_workers: số trình duyệt chạy song song
+        delay_range: khoảng nghỉ (giây) của MỖI worker sau mỗi URL - lịch sự với server
+        on_result: callback on_result(url, result, worker_id), được gọi tuần tự (có lock)
+        """
+        self.driver_factory = driver_factory
+        self.task_fn = task_fn
+        self.num_workers = max(1, int(num_workers))
+        self.delay_range = delay_range
+        self.on_result = on_result
+
+        self._tasks = queue.Queue()
+        self._result_lock = threading.Lock()
+        self._threads = []
+        self._drivers = {}
+        self._ready = threading.Semaphore(0)
+
+    def start(self):
+        """Khởi động các worker, chờ tất cả trình duyệt sẵn sàng"""
+        for worker_id in range(1, self.num_workers + 1):
+            t = threading.Thread(target=self._run, args=(worker_id,), daemon=True,
+                                 name=f"fahasa-worker-{worker_id}")
+            t.start()
+            self._threads.append(t)
+
+        for _ in range(self.num_workers):
+            self._ready.acquire()
+
+        if not self._drivers:
+            raise Exception("Không khởi tạo được trình duyệt nào cho worker pool")
+        print(f"👷 Worker pool sẵn sàng: {len(self._drivers)}/{self.num_workers} trình duyệt")
+
+    def submit(self, url):
+        """Đưa 1 URL vào hàng đợi chung"""
+        self._tasks.put(url)
+
+    def join(self):
+        """Chờ đến khi mọi URL đã submit được xử lý xong"""
+        self._tasks.join()
+
+    def close(self):
+        """Dừng worker và đóng toàn bộ trình duyệt"""
+        for _ in self._threads:
+            self._tasks.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def _run(self, worker_id):
+        try:
+            driver = self.driver_factory()
+        except Exception as e:
+            print(f"⚠️ Worker {worker_id} không khởi tạo được trình duyệt: {str(e)[:100]}")
+            self._ready.release()
+            return
+
+        self._drivers[worker_id] = driver
+        self._ready.release()
+
+        try:
+            while True:
+                url = self._tasks.get()
+                if url is None:
+                    self._tasks.task_done()
+                    break
+                try:
+                    try:
+                        result = self.task_fn(driver, url)
+                    except Exception as e:
+                        print(f"    ❌ Worker {worker_id} lỗi với {url}: {e}")
+                        result = None
+                    if self.on_result:
+                        # Lỗi ghi kết quả không được làm chết worker (pool co lại, join() chờ mãi)
+                        try:
+                            with self._result_lock:
+                                self.on_result(url, result, worker_id)
+                        except Exception as e:
+                            print(f"    🔴 Lỗi xử lý kết quả {url}: {e}")
+                    # Politeness riêng của từng worker
+                    time.sleep(random.uniform(*self.delay_range))
+                finally:
+                    self._tasks.task_done()
+        finally:
+            close_client(driver)
+            self._drivers.pop(worker_id, None)
@@ -0,0 +1,117 @@
+"""
+DB CONNECTION - KẾT NỐI POSTGRESQL DÙNG CHUNG
+Connection pool thread-safe (psycopg2 ThreadedConnectionPool) cho crawler, ETL, aggregation, export
+Cấu hình lấy từ biến môi trường, không hard-code mật khẩu trong từng script
+
+Biến môi trường:
+    DW_HOST, DW_PORT, DW_USER, DW_PASS   - máy chủ PostgreSQL (mặc định localhost:5432, postgres)
+    DW_NAME                              - database data warehouse (mặc định fahasa_dw)
+    STAGING_NAME                         - database staging (mặc định fahasa_staging)
+    DB_POOL_MIN, DB_POOL_MAX             - kích thước pool mỗi database (mặc định 1..10)
+
+Cách dùng:
+    from db.connection import get_connection, get_cursor
+
+    with get_cursor('dw') as cur:             # tự commit khi thoát, rollback khi lỗi
+        cur.execute('SELECT COUNT(*) FROM fact_book_sales')
+
+    with get_connection('staging') as conn:   # tự trả kết nối về pool
+        df = pd.read_sql('SELECT * FROM staging_books', conn)
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import ThreadedConnectionPool
+
+DB_HOST = os.getenv("DW_HOST", "localhost")
+DB_PORT = os.getenv("DW_PORT", "5432")
+DB_USER = os.getenv("DW_USER", "postgres")
+DB_PASS = os.getenv("DW_PASS", "123456")
+
+# Tên logic -> tên database
+DATABASES = {
+    'dw': os.getenv("DW_NAME", "fahasa_dw"),
+    'staging': os.getenv("STAGING_NAME", "fahasa_staging"),
+}
+
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db='dw'):
+    """Pool kết nối của 1 database (tạo lần đầu khi cần)"""
+    if db not in DATABASES:
+        raise ValueError(f"Database không hợp lệ: {db} (chọn: {', '.join(DATABASES)})")
+    with _pools_lock:
+        pool = _pools.get(db)
+        if pool is None or pool.closed:
+            pool = ThreadedConnectionPool(
+                POOL_MIN, POOL_MAX,
+                host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS,
+                dbname=DATABASES[db]
+            )
+            _pools[db] = pool
+        return pool
+
+def acquire(db='dw'):
+    """Mượn 1 kết nối dùng lâu dài (nhớ gọi release)"""
+    return get_pool(db).getconn()
+
+def release(conn, db='dw'):
+    """Trả kết nối về pool; transaction dở dang bị rollback"""
+    if conn.closed:
+        get_pool(db).putconn(conn, close=True)
+        return
+    if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    get_pool(db).putconn(conn)
+
+@contextmanager
+def get_connection(db='dw'):
+    """Kết nối từ pool, tự trả về khi thoát khối with"""
+    conn = acquire(db)
+    try:
+        yield conn
+    finally:
+        release(conn, db)
+
+@contextmanager
+def get_cursor(db='dw', commit=True):
+    """Cursor từ pool: commit khi thành công (nếu commit=True), rollback khi lỗi"""
+    with get_connection(db) as conn:
+        cur = conn.cursor()
+        try:
+            yield cur
+            if commit:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+def close_all():
+    """Đóng toàn bộ pool (gọi khi kết thúc chương trình)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            if not pool.closed:
+                pool.closeall()
+        _pools.clear()
+
+def test_connection(db='dw'):
+    """Kiểm tra kết nối, in version PostgreSQL"""
+    try:
+        with get_cursor(db, commit=False) as cur:
+            cur.execute('SELECT version();')
+            version = cur.fetchone()[0]
+        print(f'✅ Kết nối {DATABASES[db]} thành công! PostgreSQL version: {version}')
+        return True
+    except psycopg2.Error as e:
+        print(f'❌ Kết nối {DATABASES[db]} thất bại: {e}')
+        return False
@@ -0,0 +1,203 @@
+"""
+PARTITIONS - BẢNG PHÂN VÙNG THEO THỜI GIAN (RANGE) VÀ QUẢN LÝ PARTITION
+staging_books được khai báo PARTITION BY RANGE (time_collect), mỗi partition 1 ngày hoặc 1 tháng:
+    staging_books_p202511 / staging_books_p20251111   FOR VALUES FROM ('2025-11-01') TO ('2025-12-01')
+    staging_books_default                             dòng ngoài mọi partition (time_collect NULL, quá khứ xa)
+
+- ensure_partitions / ensure_ahead: tạo trước partition cho các kỳ sắp tới (crawler không bao giờ ghi vào default)
+- split_default: dữ liệu cũ nạp muộn (ingest, import) nằm trong default -> chuyển sang partition đúng kỳ
+- apply_retention: partition cũ hơn keep kỳ -> DETACH rồi đổi tên <partition>_archived (bảng thường để lưu trữ)
+  hoặc DROP. Dòng nạp muộn cho kỳ đã retention vẫn được giữ: split_default tạo lại partition của kỳ đó
+  (tên gốc đã trống) và lần retention sau lưu trữ nó thành <partition>_archived_2, ...
+- convert_to_partitioned: bảng heap cũ -> bảng phân vùng cùng cột, chép dữ liệu sang
+
+Truy vấn có điều kiện hằng trên time_collect (vd. run_etl.py) chỉ quét partition liên quan (partition pruning)
+
+    python partitions.py                 # chuyển bảng cũ nếu cần, tách default, tạo trước PARTITIONS_AHEAD kỳ
+    python partitions.py list            # danh sách partition, khoảng thời gian, dung lượng
+    python partitions.py retain 12       # DETACH partition cũ hơn 12 kỳ (đổi tên <partition>_archived)
+    python partitions.py retain 12 drop  # DROP partition cũ hơn 12 kỳ
+"""
+
+import os
+import re
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import get_cursor
+
+PARTITION_INTERVAL = os.getenv("STAGING_PARTITION_INTERVAL", "month")  # 'day' hoặc 'month'
+PARTITIONS_AHEAD = 3
+
+BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+# ---------- Kỳ (ngày / tháng) ----------
+
+def period_start(value, interval=PARTITION_INTERVAL):
+    """Ngày bắt đầu kỳ chứa value"""
+    if isinstance(value, datetime):
+        value = value.date()
+    if interval == 'day':
+        return value
+    if interval == 'month':
+        return value.replace(day=1)
+    raise ValueError(f"Kỳ partition không hợp lệ: {interval} (chọn: day, month)")
+
+def shift_period(start, n=1, interval=PARTITION_INTERVAL):
+    """Ngày bắt đầu kỳ cách start n kỳ (n âm = lùi lại)"""
+    if interval == 'day':
+        return start + timedelta(days=n)
+    months = start.year * 12 + start.month - 1 + n
+    return date(months // 12, months % 12 + 1, 1)
+
+def partition_name(table, start, interval=PARTITION_INTERVAL):
+    return f"{table}_p{start:%Y%m%d}" if interval == 'day' else f"{table}_p{start:%Y%m}"
+
+# ---------- Partition ----------
+
+def lock_partitions(cur, table):
+    """Khoá advisory theo bảng đến hết transaction: nhiều worker khởi động cùng lúc (hoặc sang kỳ mới)
+    tạo / chuyển partition lần lượt, không đụng nhau ("relation already exists")"""
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f'partitions:{table}',))
+
+def list_partitions(cur, table):
+    """[{'name', 'start', 'end', 'bytes'}] của bảng; partition default có start/end = None"""
+    cur.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), pg_total_relation_size(c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (table,))
+    partitions = []
+    for name, bound, size in cur.fetchall():
+        match = BOUND_PATTERN.search(bound or '')
+        start, end = (None, None) if not match else (
+            datetime.fromisoformat(match.group(1)).date(), datetime.fromisoformat(match.group(2)).date())
+        partitions.append({'name': name, 'start': start, 'end': end, 'bytes': size})
+    return partitions
+
+def archive_table(cur, name):
+    """Đổi tên bảng đã DETACH thành <name>_archived (hoặc _archived_2, ...) -> tên partition trống để tạo lại"""
+    archived, n = f"{name}_archived", 1
+    while True:
+        cur.execute("SELECT to_regclass(%s)", (archived,))
+        if cur.fetchone()[0] is None:
+            break
+        n += 1
+        archived = f"{name}_archived_{n}"
+    cur.execute(f"ALTER TABLE {name} RENAME TO {archived}")
+    return archived
+
+def create_partition(cur, table, key, start, interval=PARTITION_INTERVAL):
+    """Tạo partition cho kỳ bắt đầu từ start; dòng cùng kỳ đang nằm trong default được chuyển sang.
+    Tạo bảng thường rồi ATTACH (PARTITION OF báo lỗi nếu default đã có dòng thuộc kỳ)"""
+    name, end = partition_name(table, start, interval), shift_period(start, 1, interval)
+    cur.execute("SELECT to_regclass(%s)", (name,))
+    if cur.fetchone()[0] is not None:
+        # Kỳ chưa có partition mà tên đã có bảng -> bảng DETACH trước khi có archive_table, lưu trữ lại
+        print(f"🗄️ {name} đã bị DETACH, đổi tên thành {archive_table(cur, name)}")
+    cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+    cur.execute(f"""
+        WITH moved AS (
+            DELETE FROM {table}_default WHERE {key} >= %s AND {key} < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, (start, end))
+    cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+                (start.isoformat(), end.isoformat()))
+    return name
+
+def ensure_partitions(cur, table, key, first, last, interval=PARTITION_INTERVAL):
+    """Đảm bảo mọi kỳ từ kỳ chứa first đến kỳ chứa last đều có partition; trả về list partition mới tạo.
+    Kỳ trùng partition đã có (kể cả tạo theo kỳ khác) được bỏ qua"""
+    lock_partitions(cur, table)  # đọc danh sách partition sau khi có khoá -> thấy partition worker khác vừa tạo
+    existing = [(p['start'], p['end']) for p in list_partitions(cur, table) if p['start']]
+    created = []
+    start, last = period_start(first, interval), period_start(last, interval)
+    while start <= last:
+        end = shift_period(start, 1, interval)
+        if not any(s < end and start < e for s, e in existing):
+            created.append(create_partition(cur, table, key, start, interval))
+        start = end
+    return created
+
+def ensure_ahead(cur, table, key, ahead=PARTITIONS_AHEAD, interval=PARTITION_INTERVAL):
+    """Partition cho kỳ hiện tại và ahead kỳ tiếp theo"""
+    today = date.today()
+    return ensure_partitions(cur, table, key, today, shift_period(period_start(today, interval), ahead, interval),
+                             interval)
+
+def split_default(cur, table, key, interval=PARTITION_INTERVAL):
+    """Chuyển dòng có time trong default sang partition đúng kỳ (tạo partition nếu chưa có)"""
+    cur.execute(f"SELECT MIN({key}), MAX({key}) FROM {table}_default")
+    first, last = cur.fetchone()
+    if first is None:
+        return []
+    return ensure_partitions(cur, table, key, first, last, interval)
+
+def apply_retention(cur, table, keep, drop=False, interval=PARTITION_INTERVAL):
+    """Partition kết thúc trước kỳ hiện tại - keep kỳ: DETACH + đổi tên _archived (mặc định) hoặc DROP;
+    trả về list tên bảng lưu trữ / đã xoá"""
+    cutoff = shift_period(period_start(date.today(), interval), -keep, interval)
+    lock_partitions(cur, table)
+    removed = []
+    for partition in list_partitions(cur, table):
+        if partition['end'] and partition['end'] <= cutoff:
+            if drop:
+                cur.execute(f"DROP TABLE {partition['name']}")
+                removed.append(partition['name'])
+            else:
+                cur.execute(f"ALTER TABLE {table} DETACH PARTITION {partition['name']}")
+                removed.append(archive_table(cur, partition['name']))
+    return removed
+
+def convert_to_partitioned(cur, table, key, interval=PARTITION_INTERVAL):
+    """Bảng heap -> bảng phân vùng RANGE (key) cùng cột; chép dữ liệu vào partition theo kỳ rồi xoá heap.
+    Index của bảng cũ không được chép - tạo lại trên bảng mới sau khi gọi. Trả về False nếu không cần chuyển"""
+    lock_partitions(cur, table)
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    if not row or row[0] != 'r':
+        return False
+    heap = f"{table}_heap"
+    cur.execute(f"ALTER TABLE {table} RENAME TO {heap}")
+    cur.execute(f"CREATE TABLE {table} (LIKE {heap} INCLUDING DEFAULTS) PARTITION BY RANGE ({key})")
+    cur.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+    cur.execute(f"SELECT MIN({key}), MAX({key}) FROM {heap}")
+    first, last = cur.fetchone()
+    if first is not None:
+        ensure_partitions(cur, table, key, first, last, interval)
+    cur.execute(f"INSERT INTO {table} SELECT * FROM {heap}")
+    cur.execute(f"DROP TABLE {heap}")
+    return True
+
+def maintain(db, table, key, ahead=PARTITIONS_AHEAD, keep=None, drop=False, interval=PARTITION_INTERVAL):
+    """Bảo trì định kỳ (cron): tách default, tạo trước partition, áp dụng retention nếu có keep"""
+    with get_cursor(db) as cur:
+        created = split_default(cur, table, key, interval) + ensure_ahead(cur, table, key, ahead, interval)
+        removed = apply_retention(cur, table, keep, drop, interval) if keep is not None else []
+    return created, removed
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'crawler'))
+    from insert_staging_book import STAGING_DB, create_staging_table
+
+    TABLE, KEY = 'staging_books', 'time_collect'
+    command = sys.argv[1] if len(sys.argv) > 1 else 'maintain'
+
+    if command == 'list':
+        with get_cursor(STAGING_DB, commit=False) as cur:
+            for p in list_partitions(cur, TABLE):
+                span = f"{p['start']} -> {p['end']}" if p['start'] else 'DEFAULT'
+                print(f"   {p['name']:<32} {span:<26} {p['bytes'] / 1024 / 1024:8.1f}MB")
+    elif command == 'retain':
+        keep = int(sys.argv[2])
+        drop = len(sys.argv) > 3 and sys.argv[3] == 'drop'
+        _, removed = maintain(STAGING_DB, TABLE, KEY, keep=keep, drop=drop)
+        print(f"🗑️ {'Xoá' if drop else 'Tách (detach)'} {len(removed)} partition: {', '.join(removed) or '-'}")
+    else:
+        create_staging_table()  # chuyển heap cũ sang bảng phân vùng nếu cần
+        created, _ = maintain(STAGING_DB, TABLE, KEY)
+        print(f"🧱 Tạo {len(created)} partition mới: {', '.join(created) or '-'}")
@@ -1,119 +1,199 @@
 # src/etl/run_etl.py
-import psycopg2
-from psycopg2.extras import execute_values
+# Chỉ xử lý staging_books trong cửa sổ [since, until) của time_collect: điều kiện hằng trên khoá phân vùng
+# -> PostgreSQL chỉ quét các partition thuộc cửa sổ (src/db/partitions.py), chi phí theo lượng dữ liệu mới
+#   python run_etl.py                          # từ mốc lần chạy trước (etl_watermark) đến now - ETL_LAG_MINUTES
+#   python run_etl.py 2025-11-01 2025-12-01    # chạy lại 1 khoảng bất kỳ, không đổi mốc
+# Dòng time_collect cũ nạp muộn (backfill, reparse) được nhận ra qua loaded_at (mốc last_loaded_at) và chạy lại
+# theo cửa sổ riêng của chúng (late_windows) trong lần chạy tự động kế tiếp
+import os
+import sys
+from datetime import datetime, timedelta
+
+# === KẾT NỐI === (pool dùng chung, cấu hình qua biến môi trường DW_*)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import get_connection
+# staging_books trong dw phải cùng lược đồ với bảng crawler ghi (loaded_at, index, phân vùng theo time_collect)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'crawler'))
+from insert_staging_book import create_staging_table
+
+# Dòng staging được ghi theo lô (StagingWriter) sau thời điểm time_collect -> chừa khoảng trễ để không bỏ sót
+ETL_LAG_MINUTES = 30
+
+# Giá trị cửa sổ được psycopg2 chèn dạng hằng -> partition pruning ngay lúc lập kế hoạch
+IN_WINDOW = "time_collect >= %(since)s AND time_collect < %(until)s"
+
+def late_windows(cur, window):
+    """Dòng nạp sau lần chạy trước (loaded_at) nhưng có time_collect trước cửa sổ - ingest.py backfill,
+    import_staging_books.py, reparse_cache.py ghi đè - gom theo ngày thành các cửa sổ liền nhau để chạy lại"""
+    cur.execute("""
+        SELECT DISTINCT date_trunc('day', time_collect) FROM staging_books
+        WHERE loaded_at >= %(loaded_since)s AND loaded_at < %(loaded_until)s AND time_collect < %(since)s
+        ORDER BY 1
+    """, window)
+    windows = []
+    for (day,) in cur.fetchall():
+        end = min(day + timedelta(days=1), window['since'])
+        if windows and windows[-1]['until'] == day:
+            windows[-1]['until'] = end
+        else:
+            windows.append({'since': day, 'until': end})
+    return windows
+
+def load_window(cur, window):
+    """Nạp dim + fact từ các dòng staging_books có time_collect trong [since, until) của window"""
+    # Text trong staging đã được chuẩn hoá khi nạp (book_to_row, ingest.py, import_staging_books.py;
+    # dữ liệu cũ / \copy: sql/clean_staging_text.sql) -> so sánh trực tiếp, không TRIM() để join dùng được index
+    # === 1. DIM AUTHOR ===
+    print("DIM AUTHOR...")
+    cur.execute(f"""
+        INSERT INTO dim_author (author_name)
+        SELECT DISTINCT author FROM staging_books
+        WHERE author IS NOT NULL AND author != '' AND {IN_WINDOW}
+        ON CONFLICT (author_name) DO NOTHING;
+    """, window)
+
+    # === 2. DIM PUBLISHER ===
+    print("DIM PUBLISHER...")
+    cur.execute(f"""
+        INSERT INTO dim_publisher (publisher_name)
+        SELECT DISTINCT publisher FROM staging_books
+        WHERE publisher IS NOT NULL AND publisher != '' AND {IN_WINDOW}
+        ON CONFLICT (publisher_name) DO NOTHING;
+    """, window)
+
+    # === 3. DIM SUPPLIER ===
+    print("DIM SUPPLIER...")
+    cur.execute(f"""
+        INSERT INTO dim_supplier (supplier_name)
+        SELECT DISTINCT supplier FROM staging_books
+        WHERE supplier IS NOT NULL AND supplier != '' AND {IN_WINDOW}
+        ON CONFLICT (supplier_name) DO NOTHING;
+    """, window)
+
+    # === 4. DIM CATEGORY ===
+    print("DIM CATEGORY...")
+    cur.execute(f"""
+        INSERT INTO dim_category (category_1, category_2, category_3)
+        SELECT DISTINCT category_1, category_2, category_3
+        FROM staging_books
+        WHERE category_1 IS NOT NULL AND {IN_WINDOW}
+        ON CONFLICT (category_1, category_2, category_3) DO NOTHING;
+    """, window)
+
+    # === 5. DIM PRODUCT ===
+    print("DIM PRODUCT...")
+    cur.execute(f"""
+        INSERT INTO dim_product (title, language, page_count, weight, dimensions, publish_year, url, url_img)
+        SELECT title, language, page_count, weight, dimensions, publish_year, url, url_img
+        FROM staging_books
+        WHERE {IN_WINDOW}
+        ON CONFLICT (title, language, page_count, weight, dimensions, publish_year) DO NOTHING;
+    """, window)
+
+    # === 6. DIM DATE ===
+    print("DIM DATE...")
+    cur.execute(f"""
+        INSERT INTO dim_date (time_collect)
+        SELECT DISTINCT time_collect FROM staging_books WHERE {IN_WINDOW}
+        ON CONFLICT (time_collect) DO NOTHING;
+    """, window)
+
+    # === 7. FACT BOOK SALES ===
+    print("FACT BOOK SALES...")
+    # Chạy lại 1 cửa sổ không nhân đôi fact: xoá fact cũ của cùng các thời điểm thu thập trước khi ghi
+    cur.execute(f"""
+        DELETE FROM fact_book_sales
+        WHERE date_id IN (SELECT date_id FROM dim_date WHERE {IN_WINDOW});
+    """, window)
+    cur.execute("""
+        INSERT INTO fact_book_sales (
+            product_id, author_id, publisher_id, supplier_id, category_id, date_id,
+            original_price, discount_price, discount_percent, rating, rating_count, sold_count_numeric
+        )
+        SELECT
+            p.product_id,
+            a.author_id,
+            pub.publisher_id,
+            s.supplier_id,
+            c.category_id,
+            d.date_id,
+            sb.original_price,
+            sb.discount_price,
+            sb.discount_percent,
+            sb.rating,
+            sb.rating_count,
+            sb.sold_count_numeric
+        FROM staging_books sb
+        LEFT JOIN dim_product p ON (
+            p.title = sb.title AND
+            COALESCE(p.language, '') = COALESCE(sb.language, '') AND
+            COALESCE(p.page_count, 0) = COALESCE(sb.page_count, 0) AND
+            COALESCE(p.weight, 0) = COALESCE(sb.weight, 0) AND
+            COALESCE(p.dimensions, '') = COALESCE(sb.dimensions, '') AND
+            COALESCE(p.publish_year, 0) = COALESCE(sb.publish_year, 0)
+        )
+        LEFT JOIN dim_author a ON a.author_name = sb.author
+        LEFT JOIN dim_publisher pub ON pub.publisher_name = sb.publisher
+        LEFT JOIN dim_supplier s ON s.supplier_name = sb.supplier
+        LEFT JOIN dim_category c ON c.category_1 = sb.category_1 AND COALESCE(c.category_2, '') = COALESCE(sb.category_2, '') AND COALESCE(c.category_3, '') = COALESCE(sb.category_3, '')
+        LEFT JOIN dim_date d ON d.time_collect = sb.time_collect
+        WHERE sb.time_collect >= %(since)s AND sb.time_collect < %(until)s
+        ON CONFLICT DO NOTHING;
+    """, window)
 
-# === KẾT NỐI ===
-def get_conn():
-    return psycopg2.connect(
-        host='localhost', port=5432,
-        user='postgres', password='123456',
-        dbname='fahasa_dw'
-    )
 
 print("BẮT ĐẦU ETL...")
 
-conn = get_conn()
-cur = conn.cursor()
-print("→ Đảm bảo dim_date có đủ cột...")
-cur.execute("""
-    ALTER TABLE dim_date 
-    ADD COLUMN IF NOT EXISTS collect_date DATE,
-    ADD COLUMN IF NOT EXISTS collect_year INTEGER,
-    ADD COLUMN IF NOT EXISTS collect_month INTEGER,
-    ADD COLUMN IF NOT EXISTS collect_day INTEGER,
-    ADD COLUMN IF NOT EXISTS collect_hour INTEGER;
-""")
-conn.commit()
-# === 1. DIM AUTHOR ===
-print("DIM AUTHOR...")
-cur.execute("""
-    INSERT INTO dim_author (author_name)
-    SELECT DISTINCT TRIM(author) FROM staging_books WHERE author IS NOT NULL AND TRIM(author) != ''
-    ON CONFLICT (author_name) DO NOTHING;
-""")
-
-# === 2. DIM PUBLISHER ===
-print("DIM PUBLISHER...")
-cur.execute("""
-    INSERT INTO dim_publisher (publisher_name)
-    SELECT DISTINCT TRIM(publisher) FROM staging_books WHERE publisher IS NOT NULL AND TRIM(publisher) != ''
-    ON CONFLICT (publisher_name) DO NOTHING;
-""")
-
-# === 3. DIM SUPPLIER ===
-print("DIM SUPPLIER...")
-cur.execute("""
-    INSERT INTO dim_supplier (supplier_name)
-    SELECT DISTINCT TRIM(supplier) FROM staging_books WHERE supplier IS NOT NULL AND TRIM(supplier) != ''
-    ON CONFLICT (supplier_name) DO NOTHING;
-""")
-
-# === 4. DIM CATEGORY ===
-print("DIM CATEGORY...")
-cur.execute("""
-    INSERT INTO dim_category (category_1, category_2, category_3)
-    SELECT DISTINCT category_1, category_2, category_3
-    FROM staging_books
-    WHERE category_1 IS NOT NULL
-    ON CONFLICT (category_1, category_2, category_3) DO NOTHING;
-""")
-
-# === 5. DIM PRODUCT ===
-print("DIM PRODUCT...")
-cur.execute("""
-    INSERT INTO dim_product (title, language, page_count, weight, dimensions, publish_year, url, url_img)
-    SELECT title, language, page_count, weight, dimensions, publish_year, url, url_img
-    FROM staging_books
-    ON CONFLICT (title, language, page_count, weight, dimensions, publish_year) DO NOTHING;
-""")
-
-# === 6. DIM DATE ===
-print("DIM DATE...")
-cur.execute("""
-    INSERT INTO dim_date (time_collect)
-    SELECT DISTINCT time_collect FROM staging_books
-    ON CONFLICT (time_collect) DO NOTHING;
-""")
-
-# === 7. FACT BOOK SALES ===
-print("FACT BOOK SALES...")
-cur.execute("""
-    INSERT INTO fact_book_sales (
-        product_id, author_id, publisher_id, supplier_id, category_id, date_id,
-        original_price, discount_price, discount_percent, rating, rating_count, sold_count_numeric
-    )
-    SELECT
-        p.product_id,
-        a.author_id,
-        pub.publisher_id,
-        s.supplier_id,
-        c.category_id,
-        d.date_id,
-        sb.original_price,
-        sb.discount_price,
-        sb.discount_percent,
-        sb.rating,
-        sb.rating_count,
-        sb.sold_count_numeric
-    FROM staging_books sb
-    LEFT JOIN dim_product p ON (
-        p.title = sb.title AND
-        COALESCE(p.language, '') = COALESCE(sb.language, '') AND
-        COALESCE(p.page_count, 0) = COALESCE(sb.page_count, 0) AND
-        COALESCE(p.weight, 0) = COALESCE(sb.weight, 0) AND
-        COALESCE(p.dimensions, '') = COALESCE(sb.dimensions, '') AND
-        COALESCE(p.publish_year, 0) = COALESCE(sb.publish_year, 0)
-    )
-    LEFT JOIN dim_author a ON TRIM(a.author_name) = TRIM(sb.author)
-    LEFT JOIN dim_publisher pub ON TRIM(pub.publisher_name) = TRIM(sb.publisher)
-    LEFT JOIN dim_supplier s ON TRIM(s.supplier_name) = TRIM(sb.supplier)
-    LEFT JOIN dim_category c ON c.category_1 = sb.category_1 AND COALESCE(c.category_2, '') = COALESCE(sb.category_2, '') AND COALESCE(c.category_3, '') = COALESCE(sb.category_3, '')
-    LEFT JOIN dim_date d ON d.time_collect = sb.time_collect
-    ON CONFLICT DO NOTHING;
-""")
-
-conn.commit()
-cur.close()
-conn.close()
-
-print("ETL HOÀN TẤT! DỮ LIỆU ĐÃ VÀO DATA WAREHOUSE")
\ No newline at end of file
+with get_connection('dw') as conn:
+    # Bảng cũ trong dw: thêm loaded_at + index, chuyển sang bảng phân vùng (late_windows, partition pruning)
+    create_staging_table(conn)
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS etl_watermark (
+            table_name TEXT PRIMARY KEY,
+            last_until TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP DEFAULT NOW()
+        );
+        ALTER TABLE etl_watermark ADD COLUMN IF NOT EXISTS last_loaded_at TIMESTAMP;
+    """)
+    if len(sys.argv) > 2:
+        window = {'since': sys.argv[1], 'until': sys.argv[2]}
+        manual = True
+    else:
+        cur.execute("SELECT last_until, last_loaded_at FROM etl_watermark WHERE table_name = 'staging_books'")
+        row = cur.fetchone()
+        until = datetime.now() - timedelta(minutes=ETL_LAG_MINUTES)
+        window = {'since': row[0] if row else '-infinity', 'until': until,
+                  'loaded_since': row[1] if row and row[1] else '-infinity', 'loaded_until': until}
+        manual = False
+    print(f"→ Cửa sổ time_collect: [{window['since']}, {window['until']})")
+    windows = [window]
+    if not manual:
+        windows += late_windows(cur, window)
+
+    print("→ Đảm bảo dim_date có đủ cột...")
+    cur.execute("""
+        ALTER TABLE dim_date 
+        ADD COLUMN IF NOT EXISTS collect_date DATE,
+        ADD COLUMN IF NOT EXISTS collect_year INTEGER,
+        ADD COLUMN IF NOT EXISTS collect_month INTEGER,
+        ADD COLUMN IF NOT EXISTS collect_day INTEGER,
+        ADD COLUMN IF NOT EXISTS collect_hour INTEGER;
+    """)
+    conn.commit()
+    for w in windows:
+        if w is not window:
+            print(f"→ Cửa sổ nạp muộn: [{w['since']}, {w['until']})")
+        load_window(cur, w)
+
+    if not manual:
+        cur.execute("""
+            INSERT INTO etl_watermark (table_name, last_until, last_loaded_at)
+            VALUES ('staging_books', %(until)s, %(loaded_until)s)
+            ON CONFLICT (table_name) DO UPDATE SET last_until = EXCLUDED.last_until,
+                last_loaded_at = EXCLUDED.last_loaded_at, updated_at = NOW();
+        """, window)
+    conn.commit()
+    cur.close()
+
+print("ETL HOÀN TẤT! DỮ LIỆU ĐÃ VÀO DATA WAREHOUSE")
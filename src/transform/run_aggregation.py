@@ -1,22 +1,16 @@
 # /mnt/data/run_aggregation_fixed.py
 import os
-import psycopg2
-from psycopg2 import sql
+import sys
 
-print("BẮT ĐẦU TRANSFORM + TẠO DATA MART...")
+# Kết nối lấy từ pool dùng chung, cấu hình qua biến môi trường DW_* (xem src/db/connection.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import acquire, release
 
-# Lấy thông tin kết nối từ biến môi trường (an toàn hơn)
-DB_HOST = os.getenv("DW_HOST", "localhost")
-DB_PORT = os.getenv("DW_PORT", "5432")
-DB_USER = os.getenv("DW_USER", "postgres")
-DB_PASS = os.getenv("DW_PASS", "123456")
-DB_NAME = os.getenv("DW_NAME", "fahasa_dw")
+print("BẮT ĐẦU TRANSFORM + TẠO DATA MART...")
 
 conn = None
 try:
-    conn = psycopg2.connect(
-        host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, dbname=DB_NAME
-    )
+    conn = acquire('dw')
     # set autocommit False, sẽ commit thủ công
     conn.autocommit = False
     with conn.cursor() as cur:
@@ -115,6 +109,6 @@ except Exception as e:
     raise
 finally:
     if conn:
-        conn.close()
+        release(conn, 'dw')
 
 print("TRANSFORM + DATA MART HOÀN TẤT!")
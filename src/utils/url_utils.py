@@ -0,0 +1,37 @@
+"""
+URL UTILS - CHUẨN HOÁ URL SẢN PHẨM
+Cùng 1 cuốn sách có thể xuất hiện với nhiều URL (?fhs_campaign=CATEGORY, utm_*, #...)
+canonicalize_url đưa về 1 dạng duy nhất để dedup, làm khoá cache, so sánh giữa các lần chạy
+"""
+
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Tham số tracking không ảnh hưởng nội dung trang
+TRACKING_PARAMS = {'fhs_campaign', 'gclid', 'fbclid', 'ref', 'source', 'campaign'}
+TRACKING_PREFIXES = ('utm_',)
+
+def canonicalize_url(url):
+    """Chuẩn hoá URL: https, host chữ thường, bỏ tracking query, fragment và dấu / cuối"""
+    if not url:
+        return ''
+    parts = urlsplit(url.strip())
+    scheme = 'https' if parts.scheme in ('http', 'https', '') else parts.scheme
+    netloc = parts.netloc.lower()
+    if netloc == 'fahasa.com':
+        netloc = 'www.fahasa.com'
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query.sort()
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+def url_key(url):
+    """Khoá 64-bit (int) của URL đã chuẩn hoá - gọn để lưu trong seen-set"""
+    digest = hashlib.blake2b(canonicalize_url(url).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
@@ -1,15 +1,17 @@
 # src/visualize/debug_columns.py
+import os
+import sys
+
 import pandas as pd
-import psycopg2
+
+# Kết nối lấy từ pool dùng chung (src/db/connection.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import acquire, release
 
 
 def check_table_structure():
     """Kiểm tra cấu trúc bảng fahasa_sales_mart"""
-    conn = psycopg2.connect(
-        host='localhost', port=5432,
-        user='postgres', password='1234',
-        dbname='fahasa_dw'
-    )
+    conn = acquire('dw')
 
     # Kiểm tra cấu trúc bảng
     print("🔍 KIỂM TRA CẤU TRÚC BẢNG...")
@@ -33,7 +35,7 @@ def check_table_structure():
     print("\n📊 DỮ LIỆU MẪU:")
     print(sample_df.to_string(index=False))
 
-    conn.close()
+    release(conn, 'dw')
 
     return columns_df
 
@@ -1,22 +1,17 @@
 # src/visualize/export_powerbi.py
 import pandas as pd
-import psycopg2
 import os
+import sys
 from datetime import datetime
 
-
-def get_connection():
-    """Kết nối database"""
-    return psycopg2.connect(
-        host='localhost', port=5432,
-        user='postgres', password='123456',
-        dbname='fahasa_dw'
-    )
+# Kết nối lấy từ pool dùng chung (src/db/connection.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import acquire, get_connection, release
 
 
 def export_for_powerbi():
     """Export toàn bộ dữ liệu cho Power BI"""
-    conn = get_connection()
+    conn = acquire('dw')
 
     # Tạo thư mục export
     os.makedirs('powerbi_data', exist_ok=True)
@@ -123,7 +118,7 @@ def export_for_powerbi():
     top_books_df.to_csv(f'powerbi_data/fahasa_top_books_{timestamp}.csv',
                         index=False, encoding='utf-8-sig')
 
-    conn.close()
+    release(conn, 'dw')
 
     # THỐNG KÊ EXPORT
     print("\n✅ EXPORT HOÀN TẤT!")
@@ -149,6 +144,8 @@ def export_for_powerbi():
 
 def create_powerbi_guide(timestamp):
     """Tạo hướng dẫn sử dụng Power BI chi tiết"""
+    with get_connection('dw') as conn:
+        total_records = pd.read_sql("SELECT COUNT(*) FROM fahasa_sales_mart", conn).iloc[0, 0]
 
     guide = f"""
     🎨 HƯỚNG DẪN SỬ DỤNG POWER BI VỚI DỮ LIỆU FAHASA
@@ -235,7 +232,7 @@ def create_powerbi_guide(timestamp):
     📞 HỖ TRỢ:
     • File dữ liệu: powerbi_data/
     • Timestamp: {timestamp}
-    • Total records: {pd.read_sql("SELECT COUNT(*) FROM fahasa_sales_mart", get_connection()).iloc[0, 0]:,}
+    • Total records: {total_records:,}
     """
 
     with open(f'powerbi_data/powerbi_guide_{timestamp}.txt', 'w', encoding='utf-8') as f:
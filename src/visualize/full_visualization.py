@@ -1,9 +1,13 @@
 # src/visualize/full_visualization_actual.py
 import pandas as pd
-import psycopg2
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import sys
+
+# Kết nối lấy từ pool dùng chung (src/db/connection.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.connection import get_connection
 
 # Setup style
 plt.style.use('seaborn-v0_8')
@@ -12,25 +16,14 @@ plt.rcParams['font.family'] = 'DejaVu Sans'
 plt.rcParams['figure.figsize'] = (12, 8)
 
 
-def get_connection():
-    """Kết nối database"""
-    return psycopg2.connect(
-        host='localhost', port=5432,
-        user='postgres', password='1234',
-        dbname='fahasa_dw'
-    )
-
-
 def create_visualizations():
     """Tạo visualization với cấu trúc thực tế"""
-    conn = get_connection()
-
     print("📊 Đang tải dữ liệu từ fahasa_sales_mart...")
 
     # Lấy toàn bộ dữ liệu
     query = "SELECT * FROM fahasa_sales_mart"
-    sales_df = pd.read_sql(query, conn)
-    conn.close()
+    with get_connection('dw') as conn:
+        sales_df = pd.read_sql(query, conn)
 
     print(f"✅ Đã tải {len(sales_df)} dòng dữ liệu")
     print("📋 Các cột có sẵn:", sales_df.columns.tolist())
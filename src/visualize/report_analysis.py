@@ -1,8 +1,30 @@
 
+import os
+import sys
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+# Landing zone Parquet do crawler ghi (src/crawler/parquet_store.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'crawler'))
+from parquet_store import DEFAULT_LANDING_DIR, read_landing
+
+REPORT_COLUMNS = ['title', 'author', 'category_1', 'discount_price', 'discount_percent',
+                  'sold_count_numeric', 'url', 'time_collect']
+
+
+def get_data_for_visualization(landing_dir=DEFAULT_LANDING_DIR, since=None, until=None, top_n=10):
+    """Đọc thẳng landing zone (chỉ các cột báo cáo cần, lọc theo ngày thu thập ở tầng Parquet)
+    sales_df: bản ghi mới nhất của mỗi sách; top_df: top_n sách bán chạy nhất"""
+    df = read_landing(landing_dir, columns=REPORT_COLUMNS, since=since, until=until)
+    sales_df = (df.sort_values('time_collect')
+                  .drop_duplicates('url', keep='last')
+                  .rename(columns={'author': 'author_name'})
+                  .reset_index(drop=True))
+    top_df = sales_df.nlargest(top_n, 'sold_count_numeric')
+    return sales_df, top_df
+
 
 def generate_insights():
     sales_df, top_df = get_data_for_visualization()
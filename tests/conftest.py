@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Module crawler import lẫn nhau theo tên file (chạy từ src/crawler), db/utils theo gói trong src
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, os.path.join(ROOT, 'crawler'))
+sys.path.insert(0, ROOT)
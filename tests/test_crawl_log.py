@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+
+import crawl_log
+
+
+class FakeCursor:
+    """Cursor trả lần lượt các kết quả fetchone cho trước"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.description = []
+        self.queries = []
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql)
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+
+def use_cursor(monkeypatch, cursor):
+    @contextmanager
+    def fake_get_cursor(db, commit=True):
+        yield cursor
+    monkeypatch.setattr(crawl_log, 'get_cursor', fake_get_cursor)
+
+
+def test_stage_summary_empty_crawl_log(monkeypatch):
+    cursor = FakeCursor([(None,), None])
+    use_cursor(monkeypatch, cursor)
+    assert crawl_log.stage_summary() == (None, [])
+    assert len(cursor.queries) == 2
+
+
+def test_stage_summary_unknown_log_id(monkeypatch):
+    use_cursor(monkeypatch, FakeCursor([None]))
+    assert crawl_log.stage_summary(42) == (None, [])
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from ingest import iter_json
+
+RECORDS = [
+    {'title': 'Sách [1], {mở} "ngoặc"', 'price': 52500, 'url': 'https://www.fahasa.com/a.html'},
+    {'title': 'Tiếng Việt có dấu', 'price': 1.5, 'tags': ['a', 'b'], 'nested': {'x': None}},
+    {},
+    {'title': ' khoảng   trắng ', 'price': None},
+]
+
+
+@pytest.fixture
+def json_file(tmp_path):
+    path = tmp_path / 'books.json'
+    path.write_text(json.dumps(RECORDS, ensure_ascii=False, indent=2), encoding='utf-8')
+    return path
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 16, 1024])
+def test_iter_json_matches_json_load(json_file, chunk_size):
+    with open(json_file, encoding='utf-8') as f:
+        expected = json.load(f)
+    assert list(iter_json(str(json_file), chunk_size=chunk_size)) == expected
+
+
+def test_iter_json_compact_with_bom(tmp_path):
+    path = tmp_path / 'compact.json'
+    path.write_bytes(b'\xef\xbb\xbf' + json.dumps(RECORDS, ensure_ascii=False, separators=(',', ':')).encode())
+    assert list(iter_json(str(path), chunk_size=5)) == RECORDS
+
+
+def test_iter_json_empty_array(tmp_path):
+    path = tmp_path / 'empty.json'
+    path.write_text(' [ ] ', encoding='utf-8')
+    assert list(iter_json(str(path), chunk_size=1)) == []
+
+
+def test_iter_json_rejects_object(tmp_path):
+    path = tmp_path / 'object.json'
+    path.write_text('{"title": "a"}', encoding='utf-8')
+    with pytest.raises(ValueError):
+        list(iter_json(str(path)))
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark_normalize import check_same, make_rows, normalize_iterrows
+from book_parser import extract_price_smart, parse_dimensions, parse_sold_count
+from normalize import (_clean_text, _parse_prices, _parse_sold_numeric, canonicalize_urls, normalize_frame,
+                       split_dimensions)
+
+PRICE_TEXTS = ['52.500 đ', '52,500đ', '1.234.000 đ', '99 đ', '0 đ', 'Liên hệ', '', '  120.000 đ ']
+SOLD_TEXTS = ['Đã bán 10k+', 'Đã bán 1,5k+', 'đã bán 979', 'Đã bán 1.234', 'Đã bán  12', 'Còn hàng']
+DIMENSIONS = ['19 x 13 x 0.7 cm', '20,5 X 14,5 cm', '24×16', 'không rõ', '']
+
+
+def test_parse_prices_matches_extract_price_smart():
+    result = _parse_prices(pd.Series(PRICE_TEXTS, dtype=object))
+    assert result.tolist() == [extract_price_smart(text) for text in PRICE_TEXTS]
+
+
+def test_parse_prices_keeps_numbers():
+    # Số (kể cả chuỗi số từ CSV '52500.0') giữ nguyên, không qua quy tắc < 1000 của extract_price_smart
+    result = _parse_prices(pd.Series([52500, 52500.5, '52500.0', '500', None], dtype=object))
+    assert result.tolist() == [52500.0, 52500.5, 52500.0, 500.0, 0.0]
+
+
+def test_parse_sold_numeric_matches_parse_sold_count():
+    result = _parse_sold_numeric(pd.Series(SOLD_TEXTS, dtype=object)).fillna(0)
+    assert result.tolist() == [parse_sold_count(text)[1] for text in SOLD_TEXTS]
+
+
+def test_split_dimensions_matches_parse_dimensions():
+    width, height = split_dimensions(pd.Series(DIMENSIONS, dtype=object))
+    expected = [parse_dimensions(text) for text in DIMENSIONS]
+    assert np.allclose(width.astype(float), [w if w is not None else np.nan for w, _ in expected],
+                       equal_nan=True)
+    assert np.allclose(height.astype(float), [h if h is not None else np.nan for _, h in expected],
+                       equal_nan=True)
+
+
+def test_clean_text_matches_join_split():
+    texts = ['  Sách  mẫu ', 'a\tb\nc', '', 'Tiếng Việt']
+    assert _clean_text(pd.Series(texts)).tolist() == [' '.join(t.split()) for t in texts]
+
+
+def test_canonicalize_urls_drops_tracking_query():
+    urls = pd.Series(['https://www.fahasa.com/sach-a.html?fhs_campaign=CATEGORY',
+                      'http://fahasa.com/sach-a.html', 'https://www.fahasa.com/sach-a.html'])
+    assert canonicalize_urls(urls).nunique() == 1
+
+
+@pytest.mark.parametrize('rows', [1, 500])
+def test_normalize_frame_matches_iterrows(rows):
+    df = make_rows(rows)
+    assert check_same(normalize_frame(df), normalize_iterrows(df)) == []
+
+
+def test_normalize_frame_fills_missing_columns():
+    out = normalize_frame(pd.DataFrame({'title': [' A '], 'sold_count': ['Đã bán 2k+']}), '2025-11-11 00:00:00')
+    row = out.iloc[0]
+    assert row['title'] == 'A'
+    assert row['sold_count_numeric'] == 2000
+    assert row['original_price'] == 0.0
+    assert row['time_collect'] == '2025-11-11 00:00:00'
@@ -0,0 +1,34 @@
+from datetime import date, datetime
+
+import pytest
+
+from db.partitions import partition_name, period_start, shift_period
+
+
+def test_period_start():
+    assert period_start(datetime(2025, 11, 11, 20, 32), 'month') == date(2025, 11, 1)
+    assert period_start(datetime(2025, 11, 11, 20, 32), 'day') == date(2025, 11, 11)
+    assert period_start(date(2025, 11, 1), 'month') == date(2025, 11, 1)
+    with pytest.raises(ValueError):
+        period_start(date(2025, 11, 1), 'week')
+
+
+@pytest.mark.parametrize('start, n, expected', [
+    (date(2025, 11, 1), 1, date(2025, 12, 1)),
+    (date(2025, 12, 1), 1, date(2026, 1, 1)),
+    (date(2025, 1, 1), -1, date(2024, 12, 1)),
+    (date(2025, 3, 1), -14, date(2024, 1, 1)),
+    (date(2025, 11, 1), 0, date(2025, 11, 1)),
+])
+def test_shift_period_month(start, n, expected):
+    assert shift_period(start, n, 'month') == expected
+
+
+def test_shift_period_day():
+    assert shift_period(date(2025, 12, 31), 1, 'day') == date(2026, 1, 1)
+    assert shift_period(date(2024, 3, 1), -1, 'day') == date(2024, 2, 29)
+
+
+def test_partition_name():
+    assert partition_name('staging_books', date(2025, 11, 1), 'month') == 'staging_books_p202511'
+    assert partition_name('staging_books', date(2025, 11, 11), 'day') == 'staging_books_p20251111'